@@ -0,0 +1,95 @@
+"""
+Benchmark the per-request cost of identifying a user.
+
+This compares the two ways a request can be authenticated with
+Flask-Stormpath:
+
+    - The session path: decoding the signed Flask session cookie to find the
+      user's Account href.
+    - The token path: verifying a Stormpath access token locally.
+
+In both cases, the user is then looked up in a warm user cache, so no
+Stormpath API calls are made -- this measures our own overhead only.
+
+Usage::
+
+    $ python -m benchmarks.bench_auth
+"""
+
+
+from datetime import timedelta
+from time import time
+from timeit import repeat
+from uuid import uuid4
+
+from flask import Flask, session
+from jwt import encode
+
+from flask_stormpath.cache import UserCache
+from flask_stormpath.tokens import get_bearer_token, verify_access_token
+
+
+APPLICATION_HREF = 'https://api.stormpath.com/v1/applications/xxx'
+ACCOUNT_HREF = 'https://api.stormpath.com/v1/accounts/xxx'
+ITERATIONS = 10000
+
+
+def bootstrap():
+    """
+    Create a Flask app, a session cookie, an access token, and a warm user
+    cache.
+
+    :rtype: tuple
+    :returns: The app, session cookie, access token, secret, and user cache.
+    """
+    secret = uuid4().hex + uuid4().hex
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = secret
+
+    with app.test_request_context():
+        session['user_id'] = ACCOUNT_HREF
+        cookie = app.session_interface.get_signing_serializer(app).dumps(dict(session))
+
+    now = int(time())
+    token = encode({
+        'iat': now,
+        'iss': APPLICATION_HREF,
+        'sub': ACCOUNT_HREF,
+        'exp': now + 3600,
+    }, secret, algorithm='HS256', headers={'stt': 'access'})
+    if isinstance(token, bytes):
+        token = token.decode('utf-8')
+
+    cache = UserCache(max_size=1000, ttl=timedelta(minutes=5))
+    cache.set(ACCOUNT_HREF, object())
+
+    return app, cookie, token, secret, cache
+
+
+def main():
+    """Run the benchmark and print the results."""
+    app, cookie, token, secret, cache = bootstrap()
+
+    session_ctx = app.test_request_context(headers={'Cookie': '%s=%s' % (app.session_cookie_name, cookie)})
+    token_ctx = app.test_request_context(headers={'Authorization': 'Bearer ' + token})
+
+    def session_path():
+        data = app.session_interface.open_session(app, session_ctx.request)
+        assert cache.get(data['user_id']) is not None
+
+    def token_path():
+        claims = verify_access_token(get_bearer_token(token_ctx.request), secret, APPLICATION_HREF)
+        assert cache.get(claims['sub']) is not None
+
+    for name, func in (('session', session_path), ('token', token_path)):
+        best = min(repeat(func, number=ITERATIONS, repeat=5))
+        print('%-8s %8.1f us/request %10.0f requests/sec' % (
+            name,
+            best / ITERATIONS * 1e6,
+            ITERATIONS / best,
+        ))
+
+
+if __name__ == '__main__':
+    main()
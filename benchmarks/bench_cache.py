@@ -0,0 +1,132 @@
+"""
+Benchmark per-process caches against a cache shared by every worker.
+
+This simulates a pre-fork server: several worker processes serve requests for
+the same set of users.  Each request looks its user up in a cache, and on a
+miss, "fetches" the user from Stormpath (simulated by sleeping for the
+typical latency of a Stormpath API call) and caches it.
+
+With per-process caches, every worker fetches every user once.  With the shared
+(memory-mapped) cache, a user fetched by any worker is served to all of them.
+
+Usage::
+
+    $ python -m benchmarks.bench_cache
+"""
+
+
+from functools import partial
+from json import dumps
+from multiprocessing import Process, Queue
+from os.path import join
+from random import Random
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import sleep, time
+from timeit import repeat
+
+from flask_stormpath.shared_cache import MmapCache
+
+
+WORKERS = 16
+USERS = 500
+REQUESTS = 2000
+FETCH_LATENCY = 0.005
+ITERATIONS = 10000
+
+# A cached account is roughly this large.
+VALUE = dumps({
+    'href': 'https://api.stormpath.com/v1/accounts/xxx',
+    'username': 'rdegges',
+    'email': 'r@rdegges.com',
+    'givenName': 'Randall',
+    'surname': 'Degges',
+    'status': 'ENABLED',
+    'customData': {'href': 'https://api.stormpath.com/v1/accounts/xxx/customData'},
+}).encode('utf-8')
+
+
+class LocalCache(object):
+    """A per-process cache, with the same interface as MmapCache."""
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries[key] = value
+
+
+def worker(make_cache, seed, results):
+    """Serve REQUESTS requests for random users, and report the fetch count."""
+    cache = make_cache()
+    random = Random(seed)
+    fetches = 0
+
+    for _ in range(REQUESTS):
+        key = 'https://api.stormpath.com/v1/accounts/%d' % random.randrange(USERS)
+        if cache.get(key) is None:
+            sleep(FETCH_LATENCY)
+            cache.set(key, VALUE)
+            fetches += 1
+
+    results.put(fetches)
+
+
+def run(make_cache):
+    """
+    Run every worker concurrently.
+
+    :rtype: tuple
+    :returns: The total number of fetches, and the elapsed time.
+    """
+    results = Queue()
+    processes = [Process(target=worker, args=(make_cache, seed, results)) for seed in range(WORKERS)]
+
+    start = time()
+    for process in processes:
+        process.start()
+    fetches = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    return fetches, time() - start
+
+
+def main():
+    """Run the benchmark and print the results."""
+    directory = mkdtemp()
+    path = join(directory, 'cache')
+
+    try:
+        print('%d workers, %d users, %d requests per worker\n' % (WORKERS, USERS, REQUESTS))
+
+        for name, make_cache in (
+            ('local', LocalCache),
+            ('shared', partial(MmapCache, path, slots=4096, slot_size=1024)),
+        ):
+            fetches, elapsed = run(make_cache)
+            print('%-8s %6d fetches %8.2f s %10.0f requests/sec' % (
+                name,
+                fetches,
+                elapsed,
+                WORKERS * REQUESTS / elapsed,
+            ))
+
+        print('')
+
+        local = LocalCache()
+        local.set('key', VALUE)
+        shared = MmapCache(path, slots=4096, slot_size=1024)
+        shared.set('key', VALUE)
+
+        for name, func in (('local', lambda: local.get('key')), ('shared', lambda: shared.get('key'))):
+            best = min(repeat(func, number=ITERATIONS, repeat=5))
+            print('%-8s %8.2f us/hit' % (name, best / ITERATIONS * 1e6))
+    finally:
+        rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
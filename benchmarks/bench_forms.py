@@ -0,0 +1,69 @@
+"""
+Benchmark building and validating the registration form.
+
+This compares the two ways of building a registration form:
+
+    - Per request: `RegistrationForm(config=config)`, which evaluates the
+      `STORMPATH_ENABLE_*` / `STORMPATH_REQUIRE_*` settings and adds the
+      required validators to every form it creates.
+    - Per configuration: `get_registration_form(config)()`, which reuses a
+      form class built once for the app's settings.
+
+Usage::
+
+    $ python -m benchmarks.bench_forms
+"""
+
+
+from timeit import repeat
+
+from flask import Flask
+from werkzeug.datastructures import MultiDict
+
+from flask_stormpath.forms import RegistrationForm, get_registration_form
+from flask_stormpath.settings import init_settings
+
+
+ITERATIONS = 10000
+
+DATA = MultiDict({
+    'username': 'rdegges',
+    'given_name': 'Randall',
+    'surname': 'Degges',
+    'email': 'r@rdegges.com',
+    'password': 'woot1LoveCookies!',
+})
+
+
+def bootstrap():
+    """
+    Create a Flask app which requires a username, first name, and last name.
+
+    :rtype: obj
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'xxx'
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['STORMPATH_ENABLE_USERNAME'] = True
+    app.config['STORMPATH_REQUIRE_USERNAME'] = True
+    init_settings(app.config)
+
+    return app
+
+
+def main():
+    """Run the benchmark and print the results."""
+    app = bootstrap()
+    config = app.config
+
+    with app.test_request_context(method='POST'):
+        for name, func in (
+            ('per request', lambda: RegistrationForm(formdata=DATA, config=config).validate()),
+            ('per config', lambda: get_registration_form(config)(formdata=DATA).validate()),
+        ):
+            best = min(repeat(func, number=ITERATIONS, repeat=5))
+            print('%-12s %8.2f us/form %10.0f forms/sec' % (name, best / ITERATIONS * 1e6, ITERATIONS / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark how long importing Flask-Stormpath takes.
+
+This imports `flask_stormpath` in a fresh interpreter with `python -X
+importtime`, and reports the total import time, along with the slowest modules
+it pulled in (by their own import time, excluding their dependencies).
+
+This needs Python 3.7+ (for `-X importtime`).
+
+Usage::
+
+    $ python -m benchmarks.bench_import
+"""
+
+
+from subprocess import PIPE, Popen
+from sys import executable
+
+
+RUNS = 5
+SLOWEST = 15
+
+
+def import_times(module):
+    """
+    Import the given module in a fresh interpreter.
+
+    :param str module: The module to import.
+    :rtype: list
+    :returns: A list of (module, self, cumulative) tuples, in microseconds.
+    """
+    process = Popen((executable, '-X', 'importtime', '-c', 'import %s' % module), stdout=PIPE, stderr=PIPE)
+    stderr = process.communicate()[1].decode('utf-8')
+
+    times = []
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and 'self [us]' not in line:
+            own, cumulative, name = line[len('import time:'):].split('|')
+            times.append((name.strip(), int(own), int(cumulative)))
+
+    return times
+
+
+def main():
+    """Run the benchmark and print the results."""
+    runs = [import_times('flask_stormpath') for _ in range(RUNS)]
+    best = min(runs, key=lambda times: dict((name, cumulative) for name, own, cumulative in times)['flask_stormpath'])
+    total = dict((name, cumulative) for name, own, cumulative in best)
+
+    print('import flask_stormpath: %.1f ms (best of %d)\n' % (total['flask_stormpath'] / 1000.0, RUNS))
+    for name, own, cumulative in sorted(best, key=lambda times: -times[1])[:SLOWEST]:
+        print('%-40s %8.1f ms' % (name, own / 1000.0))
+
+
+if __name__ == '__main__':
+    main()
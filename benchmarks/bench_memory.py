@@ -0,0 +1,115 @@
+"""
+Benchmark how much memory cached users take.
+
+This builds a large number of users the way the user cache holds them -- as
+full User objects (as returned by the Stormpath SDK), and as compact
+UserSnapshot objects (the `STORMPATH_USER_CACHE_SNAPSHOTS` setting) -- and
+measures the memory each representation retains.
+
+No Stormpath API calls are made: the users are built from account data shaped
+like the Stormpath API's responses.
+
+This needs Python 3.4+ (for `tracemalloc`).
+
+Usage::
+
+    $ python -m benchmarks.bench_memory
+"""
+
+
+from gc import collect
+from tracemalloc import start, stop, take_snapshot
+
+from stormpath.client import Client
+
+from flask_stormpath.models import User, UserSnapshot
+
+
+USERS = 10000
+PROJECTED_USERS = 100000
+
+BASE_URL = 'https://api.stormpath.com/v1'
+
+
+def account_properties(i):
+    """Return account data shaped like a Stormpath API response."""
+    href = '%s/accounts/%024d' % (BASE_URL, i)
+
+    return {
+        'href': href,
+        'username': 'user%d' % i,
+        'email': 'user%d@example.com' % i,
+        'givenName': 'Given%d' % i,
+        'middleName': None,
+        'surname': 'Surname%d' % i,
+        'fullName': 'Given%d Surname%d' % (i, i),
+        'status': 'ENABLED',
+        'createdAt': '2016-09-21T17:05:31.113Z',
+        'modifiedAt': '2016-09-21T17:05:31.113Z',
+        'emailVerificationToken': None,
+        'customData': {'href': href + '/customData'},
+        'providerData': {'href': href + '/providerData'},
+        'directory': {'href': '%s/directories/xxx' % BASE_URL},
+        'tenant': {'href': '%s/tenants/xxx' % BASE_URL},
+        'groups': {'href': href + '/groups'},
+        'applications': {'href': href + '/applications'},
+        'groupMemberships': {'href': href + '/groupMemberships'},
+        'apiKeys': {'href': href + '/apiKeys'},
+        'accessTokens': {'href': href + '/accessTokens'},
+        'refreshTokens': {'href': href + '/refreshTokens'},
+    }
+
+
+def build_users(client):
+    """Build USERS full User objects."""
+    return [User(client, properties=account_properties(i)) for i in range(USERS)]
+
+
+def build_snapshots(client):
+    """Build USERS UserSnapshot objects (each from a full User, as the cache does)."""
+    return [UserSnapshot.from_user(User(client, properties=account_properties(i))) for i in range(USERS)]
+
+
+def measure(build):
+    """
+    Return the number of bytes retained by the result of `build()`.
+
+    :rtype: int
+    """
+    collect()
+    start()
+    before = take_snapshot()
+
+    result = build()
+    collect()
+
+    after = take_snapshot()
+    stop()
+
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del result
+
+    return size
+
+
+def main():
+    """Run the benchmark and print the results."""
+    client = Client(id='xxx', secret='xxx', base_url=BASE_URL)
+
+    print('%d users\n' % USERS)
+
+    for name, build in (
+        ('User', lambda: build_users(client)),
+        ('UserSnapshot', lambda: build_snapshots(client)),
+    ):
+        size = measure(build)
+        print('%-14s %8.0f bytes/user %10.1f MB per %d users' % (
+            name,
+            float(size) / USERS,
+            float(size) / USERS * PROJECTED_USERS / 1024 / 1024,
+            PROJECTED_USERS,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+Benchmark the per-request overhead of authenticating users.
+
+This serves requests through a Flask app using Flask-Stormpath, talking to a
+local fake Stormpath API (see :mod:`flask_stormpath.testing`) which adds the
+typical latency of a Stormpath API call to every call.  No network access (or
+Stormpath account) is needed.
+
+For each kind of request, it reports the throughput, latency percentiles, and
+the number of Stormpath API calls made per request:
+
+    - `anonymous`: A page which doesn't use the current user.
+    - `login_required`: A page protected by `login_required`.
+    - `groups_required`: A page protected by `groups_required`.
+    - `template`: A template which renders `user.email` (through
+      `user_context_processor`).
+    - `login`: POSTing the login form.
+    - `register`: POSTing the registration form.
+
+Each is run with our default settings, and with the user cache, group cache,
+and session snapshots enabled.  Requests are served one at a time, so timings
+reflect per-request overhead rather than concurrency.
+
+Usage::
+
+    $ python -m benchmarks.bench_requests
+"""
+
+
+from datetime import timedelta
+from time import time
+from uuid import uuid4
+
+from flask import Flask, render_template_string
+from stormpath.client import Client
+
+from flask_stormpath import StormpathManager, groups_required, login_required
+from flask_stormpath.testing import FakeStormpath
+
+
+REQUESTS = 200
+WARMUP = 10
+LATENCY = 0.02
+USERS = 20
+PASSWORD = 'woot1LoveCookies!'
+
+CONFIGS = (
+    ('default', {}),
+    ('cached', {
+        'STORMPATH_USER_CACHE_ENABLED': True,
+        'STORMPATH_USER_CACHE_TTL': timedelta(minutes=5),
+        'STORMPATH_GROUP_CACHE_ENABLED': True,
+        'STORMPATH_GROUP_CACHE_TTL': timedelta(minutes=5),
+        'STORMPATH_SESSION_SNAPSHOT_ENABLED': True,
+        'STORMPATH_SESSION_SNAPSHOT_MAX_AGE': timedelta(minutes=5),
+    }),
+)
+
+
+def bootstrap_stormpath(stormpath):
+    """
+    Create a Stormpath Application, with USERS users in an `admins` Group.
+
+    :param obj stormpath: The FakeStormpath API.
+    :rtype: tuple
+    :returns: The Application's name, and the users' emails.
+    """
+    client = Client(id='xxx', secret='xxx', base_url=stormpath.base_url)
+    application = client.applications.create({'name': 'bench-%s' % uuid4().hex}, create_directory=True)
+    admins = application.groups.create({'name': 'admins'})
+
+    emails = []
+    for i in range(USERS):
+        account = application.accounts.create({
+            'email': 'user%d@example.com' % i,
+            'password': PASSWORD,
+            'given_name': 'Given%d' % i,
+            'surname': 'Surname%d' % i,
+        })
+        account.add_group(admins)
+        emails.append(account.email)
+
+    return application.name, emails
+
+
+def bootstrap_flask_app(stormpath, name, settings):
+    """
+    Create a Flask app with a page for each kind of request.
+
+    :param obj stormpath: The FakeStormpath API.
+    :param str name: The Stormpath Application's name.
+    :param dict settings: Extra Flask-Stormpath settings.
+    :rtype: obj
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = uuid4().hex
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+    app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+    app.config['STORMPATH_APPLICATION'] = name
+    app.config['STORMPATH_BASE_URL'] = stormpath.base_url
+    app.config.update(settings)
+    StormpathManager(app)
+
+    @app.route('/anonymous')
+    def anonymous():
+        return 'ok'
+
+    @app.route('/login_required')
+    @login_required
+    def private():
+        return 'ok'
+
+    @app.route('/groups_required')
+    @groups_required(['admins'])
+    def admins():
+        return 'ok'
+
+    @app.route('/template')
+    @login_required
+    def template():
+        return render_template_string('Hello, {{ user.email }}!')
+
+    return app
+
+
+def percentile(timings, p):
+    """
+    Return the p-th percentile of a sorted list of timings.
+
+    :rtype: float
+    """
+    return timings[int(round(p / 100.0 * (len(timings) - 1)))]
+
+
+def measure(stormpath, request):
+    """
+    Make REQUESTS requests (after WARMUP requests), and time them.
+
+    :param obj stormpath: The FakeStormpath API.
+    :param func request: Makes a single request, given its number, and
+        returns the response.
+    :rtype: tuple
+    :returns: The requests/sec, the sorted timings, and the number of
+        Stormpath API calls per request.
+    """
+    for i in range(WARMUP):
+        request(i)
+
+    stormpath.reset_stats()
+    timings = []
+
+    start = time()
+    for i in range(REQUESTS):
+        before = time()
+        response = request(WARMUP + i)
+        timings.append(time() - before)
+        assert response.status_code < 400, response.status_code
+
+    elapsed = time() - start
+
+    return REQUESTS / elapsed, sorted(timings), float(stormpath.stats['calls']) / REQUESTS
+
+
+def scenarios(app, emails):
+    """
+    Return the requests to benchmark.
+
+    :rtype: list
+    :returns: A list of (name, request) tuples.
+    """
+    client = app.test_client()
+    client.post('/login', data={'login': emails[0], 'password': PASSWORD})
+
+    # Each login is made by a different user, from a new browser.
+    def login(i):
+        return app.test_client().post('/login', data={'login': emails[i % len(emails)], 'password': PASSWORD})
+
+    def register(i):
+        return app.test_client().post('/register', data={
+            'email': 'new-%s@example.com' % uuid4().hex,
+            'password': PASSWORD,
+            'given_name': 'Given',
+            'surname': 'Surname',
+        })
+
+    return [
+        ('anonymous', lambda i: client.get('/anonymous')),
+        ('login_required', lambda i: client.get('/login_required')),
+        ('groups_required', lambda i: client.get('/groups_required')),
+        ('template', lambda i: client.get('/template')),
+        ('login', login),
+        ('register', register),
+    ]
+
+
+def main():
+    """Run the benchmark and print the results."""
+    stormpath = FakeStormpath(latency=LATENCY)
+    stormpath.start()
+
+    try:
+        name, emails = bootstrap_stormpath(stormpath)
+
+        print('%d requests each, %.0f ms per Stormpath API call\n' % (REQUESTS, LATENCY * 1000))
+        print('%-8s %-16s %10s %9s %9s %9s %11s' % ('config', 'request', 'req/sec', 'p50 ms', 'p90 ms', 'p99 ms', 'calls/req'))
+
+        for config, settings in CONFIGS:
+            app = bootstrap_flask_app(stormpath, name, settings)
+
+            for scenario, request in scenarios(app, emails):
+                throughput, timings, calls = measure(stormpath, request)
+                print('%-8s %-16s %10.1f %9.2f %9.2f %9.2f %11.2f' % (
+                    config,
+                    scenario,
+                    throughput,
+                    percentile(timings, 50) * 1000,
+                    percentile(timings, 90) * 1000,
+                    percentile(timings, 99) * 1000,
+                    calls,
+                ))
+    finally:
+        stormpath.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -22,11 +22,14 @@ __license__ = 'Apache'
 __copyright__ = '(c) 2012 - 2015 Stormpath, Inc.'
 
 
+from datetime import timedelta
+
 from flask import (
     Blueprint,
     __version__ as flask_version,
     _app_ctx_stack as stack,
     current_app,
+    has_request_context,
 )
 
 from flask_login import (
@@ -36,32 +39,79 @@ from flask_login import (
     login_required,
     login_user,
     logout_user,
+    user_logged_in,
+    user_logged_out,
 )
 
+from jinja2 import TemplateNotFound
+
+from json import dump, load
+from os import fdopen, getpid, rename
+from os.path import abspath, dirname
+from random import random
+from tempfile import mkstemp
+from threading import RLock
+
 from stormpath.client import Client
 from stormpath.error import Error as StormpathError
 
 from werkzeug.local import LocalProxy
 
+from .breaker import CLOSED, OPEN, CircuitBreaker, is_outage
+from .cache import SingleFlight, UserCache
 from .context_processors import user_context_processor
-from .decorators import groups_required
-from .models import User
-from .settings import check_settings, init_settings
-from .views import (
-    google_login,
-    facebook_login,
-    forgot,
-    forgot_change,
-    login,
-    logout,
-    register,
-)
+from .decorators import groups_required, token_required, user_context_exempt
+from .dispatch import SignalDispatcher
+from .errors import ConfigurationError
+from .invalidation import InvalidationBus, UnixDatagramTransport
+from .models import User, UserSnapshot, _user_changed, get_expansion
+from .refresh import Refresher
+from .sessions import clear_snapshot, load_snapshot, save_snapshot
+from .settings import Settings, check_settings, init_settings
+from .transport import PooledHTTPAdapter
 
 
 # A proxy for the current user.
 user = LocalProxy(lambda: _get_user())
 
 
+class _LazyView(object):
+    """
+    One of our built-in views, which is only imported the first time it's
+    called.
+
+    Our views depend on WTForms, and on the social login SDKs, so they're kept
+    out of the import of Flask-Stormpath itself, which lets apps (and the CLI
+    tools and workers built on them) which never serve these routes start up
+    faster.
+
+    :param str name: The name of the view function in
+        `flask_stormpath.views`.
+    """
+    def __init__(self, name):
+        self.__name__ = name
+        self.__module__ = 'flask_stormpath.views'
+        self._view = None
+
+    def __call__(self, *args, **kwargs):
+        if self._view is None:
+            from . import views
+            self._view = getattr(views, self.__name__)
+
+        return self._view(*args, **kwargs)
+
+
+# Our built-in views (still importable as, eg: `from flask_stormpath import
+# login`).
+google_login = _LazyView('google_login')
+facebook_login = _LazyView('facebook_login')
+forgot = _LazyView('forgot')
+forgot_change = _LazyView('forgot_change')
+login = _LazyView('login')
+logout = _LazyView('logout')
+register = _LazyView('register')
+
+
 class StormpathManager(object):
     """
     This object is used to hold the settings used to communicate with
@@ -76,6 +126,30 @@ class StormpathManager(object):
         :param obj app: (optional) The Flask app.
         """
         self.app = app
+        self.user_cache = None
+        self.group_cache = None
+        self.breaker = None
+        self.refresher = None
+        self.refresh_ahead = None
+        self.user_snapshots = False
+        self.invalidation_bus = None
+        self.signal_dispatcher = None
+
+        # A mapping of Group names to the hrefs of every Group with that name,
+        # used by the `groups_required` decorator.
+        self.group_hrefs_by_name = {}
+
+        # A mapping of unknown Group names to when they should be searched for
+        # again.
+        self.unknown_group_names = {}
+
+        # This lock ensures our Stormpath Client and Application are only ever
+        # created once per process.
+        self._lock = RLock()
+
+        # Concurrent loads of the same user are coalesced into a single
+        # Stormpath API call.
+        self.user_fetches = SingleFlight()
 
         # If the user specifies an app, let's configure go ahead and handle all
         # configuration stuff for the user's app.
@@ -103,9 +177,26 @@ class StormpathManager(object):
         # configured.
         check_settings(app.config)
 
+        # Compile our settings, so our views don't have to look them up in the
+        # app config on every request.  They're stored on the app, as a single
+        # StormpathManager can be used by several apps.
+        app.stormpath_settings = Settings(app.config)
+
         # Initialize the Flask-Login extension.
         self.init_login(app)
 
+        # Initialize our circuit breaker (if enabled).
+        self.init_breaker(app)
+
+        # Initialize our user and group membership caches (if enabled).
+        self.init_cache(app)
+
+        # Initialize our invalidation bus (if enabled).
+        self.init_invalidation(app)
+
+        # Initialize the dispatcher which runs asynchronous signal receivers.
+        self.init_dispatch(app)
+
         # Initialize all URL routes / views.
         self.init_routes(app)
 
@@ -122,6 +213,74 @@ class StormpathManager(object):
         # necessary!
         self.app = app
 
+        # If requested, do all of our expensive setup work now, so the first
+        # request served doesn't have to.
+        if app.config['STORMPATH_EAGER_INIT']:
+            self.warm(app)
+
+    def reload_settings(self, app=None, **overrides):
+        """
+        Change settings after this extension has been initialized.
+
+        The given settings (if any) are applied to the app config, every
+        setting is checked again, and our compiled :class:`Settings` are
+        rebuilt.  If the new settings are invalid, a ConfigurationError is
+        raised, and nothing is changed.
+
+        Settings used to build our routes, caches, circuit breaker, and other
+        components are only read when those are initialized, so changing them
+        here has no effect until they're re-initialized.
+
+        :param obj app: (optional) The Flask app.  Defaults to the app this
+            extension was initialized with.
+        :param overrides: The settings to change, eg:
+            `STORMPATH_REDIRECT_URL='/dashboard'`.
+        """
+        app = app or self.app
+
+        config = dict(app.config)
+        config.update(overrides)
+        check_settings(config)
+
+        app.config.update(overrides)
+        app.stormpath_settings = Settings(app.config)
+
+    def warm(self, app=None):
+        """
+        Do all the expensive setup work which is otherwise done lazily by the
+        first request(s) we serve.
+
+        This will:
+
+            - Create the Stormpath Client (and its connection pool).
+            - Resolve the Stormpath Application, which opens a persistent
+              connection to Stormpath.
+            - Load and compile all of the Flask-Stormpath templates.
+
+        This is called automatically by :meth:`init_app` if
+        `STORMPATH_EAGER_INIT` is enabled.  If you're using a pre-fork server,
+        you can also call it from a post-fork hook to warm up each worker.
+
+        :param obj app: (optional) The Flask app.  Defaults to the app this
+            extension was initialized with.
+        """
+        app = app or self.app
+
+        with app.app_context():
+            self.client
+
+            # Accessing an attribute forces the Application to be loaded.
+            self.application.name
+
+            # Jinja caches compiled templates, so loading them once is all it
+            # takes.  Templates for views which aren't used may not exist.
+            for key in sorted(app.config):
+                if key.startswith('STORMPATH_') and key.endswith('_TEMPLATE'):
+                    try:
+                        app.jinja_env.get_template(app.config[key])
+                    except TemplateNotFound:
+                        pass
+
     def init_login(self, app):
         """
         Initialize the Flask-Login extension.
@@ -134,16 +293,320 @@ class StormpathManager(object):
         app.config['REMEMBER_COOKIE_DURATION'] = app.config['STORMPATH_COOKIE_DURATION']
         app.config['REMEMBER_COOKIE_DOMAIN'] = app.config['STORMPATH_COOKIE_DOMAIN']
 
-        app.login_manager = LoginManager(app)
+        # We provide our own (lazy) `current_user` template variable in
+        # `user_context_processor`, so we don't want Flask-Login's, which
+        # loads the user on every template render.
+        app.login_manager = LoginManager(app, add_context_processor=False)
         app.login_manager.user_callback = self.load_user
         app.stormpath_manager = self
 
+        # If token authentication is enabled, let API clients authenticate by
+        # sending a Stormpath access token instead of a session cookie.
+        if app.config['STORMPATH_ENABLE_TOKEN_AUTH']:
+            app.login_manager.request_callback = self.load_user_from_request
+
         if app.config['STORMPATH_ENABLE_LOGIN']:
             app.login_manager.login_view = 'stormpath.login'
 
         # Make this Flask session expire automatically.
         app.config['PERMANENT_SESSION_LIFETIME'] = app.config['STORMPATH_COOKIE_DURATION']
 
+        # If session snapshots are enabled, store a snapshot of the user's
+        # account in their session whenever they log in, and remove it when
+        # they log out.
+        if app.config['STORMPATH_SESSION_SNAPSHOT_ENABLED']:
+            user_logged_in.connect(self.on_user_logged_in, app)
+            user_logged_out.connect(self.on_user_logged_out, app)
+
+        # Seed our caches with users as they log in (or register), so the page
+        # they're redirected to doesn't have to fetch them again.
+        user_logged_in.connect(self.cache_user, app)
+
+    def on_user_logged_in(self, sender, user):
+        """
+        Store a snapshot of the user who just logged in in their session.
+
+        :param obj sender: The Flask app.
+        :param obj user: The User who logged in.
+        """
+        save_snapshot(user)
+
+    def cache_user(self, sender, user):
+        """
+        Store the user who just logged in in the user cache (and their group
+        memberships in the group cache).
+
+        Group memberships are taken from the account's groups (which are free
+        if `STORMPATH_EXPAND` includes `groups`, and otherwise cost a single
+        API call).  If they can't be fetched, they're left to be fetched by
+        the first request which needs them.
+
+        :param obj sender: The Flask app.
+        :param obj user: The User who logged in.
+        """
+        href = getattr(user, 'href', None)
+        if not href:
+            return
+
+        if self.group_cache is not None:
+            try:
+                hrefs = self.call_api(user.get_group_hrefs)
+            except Exception as err:
+                if not (isinstance(err, StormpathError) or is_outage(err)):
+                    raise
+            else:
+                self.group_cache.set(href, hrefs)
+
+        if self.user_cache is not None:
+            self._store_user(href, user)
+
+    def on_user_logged_out(self, sender, user):
+        """
+        Remove the snapshot of the user who just logged out from their session.
+
+        :param obj sender: The Flask app.
+        :param obj user: The User who logged out.
+        """
+        clear_snapshot()
+
+    def init_cache(self, app):
+        """
+        Initialize the user and group membership caches.
+
+        If the user has enabled the user cache, loaded users will be kept in
+        local memory across requests.  Likewise, if the user has enabled the
+        group cache, each user's group memberships will be kept in local memory
+        across requests.  Cached entries are automatically invalidated whenever
+        a user is updated or deleted.
+
+        :param obj app: The Flask app.
+        """
+        # If the circuit breaker is enabled, we always keep the last known good
+        # users and memberships around (even if the caches themselves are
+        # disabled), so we've got something to serve while Stormpath is
+        # unavailable.
+        breaker_enabled = app.config['STORMPATH_CIRCUIT_BREAKER_ENABLED']
+        stale_ttl = app.config['STORMPATH_CIRCUIT_BREAKER_MAX_STALENESS'] if breaker_enabled else None
+
+        if app.config['STORMPATH_USER_CACHE_ENABLED'] or breaker_enabled:
+            self.user_cache = UserCache(
+                max_size = app.config['STORMPATH_USER_CACHE_SIZE'],
+                ttl = app.config['STORMPATH_USER_CACHE_TTL'] if app.config['STORMPATH_USER_CACHE_ENABLED'] else timedelta(0),
+                stale_ttl = stale_ttl,
+            )
+        self.user_snapshots = app.config['STORMPATH_USER_CACHE_SNAPSHOTS']
+
+        # Cached users are refreshed in the background, either when they're
+        # about to expire (if refresh-ahead is enabled), or when a stale copy
+        # is served because Stormpath is unavailable.
+        self.refresher = Refresher(threads=app.config['STORMPATH_REFRESH_THREADS'])
+        self.refresh_ahead = None
+        if self.user_cache is not None and app.config['STORMPATH_USER_CACHE_REFRESH_AHEAD']:
+            self.refresh_ahead = (
+                app.config['STORMPATH_USER_CACHE_REFRESH_AHEAD'].total_seconds(),
+                app.config['STORMPATH_USER_CACHE_REFRESH_JITTER'].total_seconds() if app.config['STORMPATH_USER_CACHE_REFRESH_JITTER'] else 0,
+            )
+
+        if app.config['STORMPATH_GROUP_CACHE_ENABLED'] or breaker_enabled:
+            self.group_cache = UserCache(
+                max_size = app.config['STORMPATH_GROUP_CACHE_SIZE'],
+                ttl = app.config['STORMPATH_GROUP_CACHE_TTL'] if app.config['STORMPATH_GROUP_CACHE_ENABLED'] else timedelta(0),
+                stale_ttl = stale_ttl,
+            )
+
+        if self.user_cache is not None or self.group_cache is not None:
+            _user_changed.connect(self.invalidate_user)
+
+    def init_breaker(self, app):
+        """
+        Initialize the circuit breaker which guards our Stormpath API calls (if
+        enabled).
+
+        :param obj app: The Flask app.
+        """
+        self.breaker = None
+
+        if app.config['STORMPATH_CIRCUIT_BREAKER_ENABLED']:
+            self.breaker = CircuitBreaker(
+                window = app.config['STORMPATH_CIRCUIT_BREAKER_WINDOW'],
+                min_calls = app.config['STORMPATH_CIRCUIT_BREAKER_MIN_CALLS'],
+                error_rate = app.config['STORMPATH_CIRCUIT_BREAKER_ERROR_RATE'],
+                slow_call = app.config['STORMPATH_CIRCUIT_BREAKER_SLOW_CALL'],
+                reset_timeout = app.config['STORMPATH_CIRCUIT_BREAKER_RESET_TIMEOUT'],
+            )
+
+    def call_api(self, func, *args, **kwargs):
+        """
+        Call a function which makes Stormpath API calls, through the circuit
+        breaker (if enabled).
+
+        If the circuit breaker is open, this will raise a
+        :class:`flask_stormpath.breaker.CircuitOpenError` (which is a
+        `StormpathError`) instead of calling `func`.
+
+        :param function func: The function to call.
+        :returns: The result of `func`.
+        """
+        if self.breaker is None:
+            return func(*args, **kwargs)
+
+        return self.breaker.call(func, *args, **kwargs)
+
+    def invalidate_user(self, sender, user=None):
+        """
+        Remove a user from the user and group membership caches.
+
+        This is called whenever a user is updated or deleted, so that we never
+        serve stale account data after a change.  It's connected to an
+        internal signal whose sender is the User, rather than to
+        `user_updated` and `user_deleted`, so their payloads are only built
+        when the app itself listens for them.
+
+        :param obj sender: The signal sender (the User).
+        :param dict user: (optional) User data, as sent along with
+            `user_updated` and `user_deleted`.
+        """
+        href = user.get('href') if user else getattr(sender, 'href', None)
+        if not href:
+            return
+
+        self.invalidate_href(href)
+
+    def invalidate_href(self, account_href):
+        """
+        Remove the user with the given Account href from the user and group
+        membership caches.
+
+        :param str account_href: The Account href.
+        """
+        for cache in (self.user_cache, self.group_cache):
+            if cache is not None:
+                cache.delete(account_href)
+
+    def init_invalidation(self, app):
+        """
+        Initialize the invalidation bus (if enabled).
+
+        The bus broadcasts the hrefs of users who are updated, deleted, or
+        logged out to every other process, and removes the users other
+        processes broadcast from our caches.
+
+        :param obj app: The Flask app.
+        """
+        self.invalidation_bus = None
+
+        if not app.config['STORMPATH_INVALIDATION_ENABLED']:
+            return
+
+        self.invalidation_bus = self._create_invalidation_bus(app)
+
+        _user_changed.connect(self.broadcast_user)
+        user_logged_out.connect(self.broadcast_user, app)
+
+        # Each (forked) worker process needs to start listening for
+        # invalidations before serving its first request.
+        app.before_request(self.start_invalidation)
+
+    def _create_invalidation_bus(self, app):
+        """
+        Create a new invalidation bus.
+
+        :param obj app: The Flask app.
+        :rtype: obj
+        """
+        transport = app.config['STORMPATH_INVALIDATION_TRANSPORT']
+
+        return InvalidationBus(
+            transport = transport() if transport else UnixDatagramTransport(app.config['STORMPATH_INVALIDATION_SOCKET_DIR']),
+            callback = self._on_remote_invalidation,
+            batch_interval = app.config['STORMPATH_INVALIDATION_BATCH_INTERVAL'],
+            max_batch = app.config['STORMPATH_INVALIDATION_MAX_BATCH'],
+            queue_size = app.config['STORMPATH_INVALIDATION_QUEUE_SIZE'],
+        )
+
+    def start_invalidation(self):
+        """
+        Start listening on the invalidation bus (if we aren't already).
+        """
+        ctx = stack.top.app
+        self._check_fork(ctx)
+        self.invalidation_bus.start()
+
+    def broadcast_user(self, sender, user=None):
+        """
+        Broadcast a user's href on the invalidation bus.
+
+        This is called whenever a user is updated or deleted (with the User as
+        the sender), and connected to the `user_logged_out` signal.
+
+        :param obj sender: The signal sender.
+        :param user: (optional) The User who logged out, or user data as sent
+            along with `user_updated` and `user_deleted`.
+        """
+        if isinstance(user, dict):
+            href = user.get('href')
+        elif user is not None:
+            href = getattr(user, 'href', None)
+
+            # Logging out doesn't change a user, so we drop them from our own
+            # caches here, too.
+            if href and self.invalidation_bus is not None:
+                self.invalidate_href(href)
+        else:
+            href = getattr(sender, 'href', None)
+
+        if not href or self.invalidation_bus is None:
+            return
+
+        self.invalidation_bus.publish(href)
+
+    def _on_remote_invalidation(self, account_href):
+        """
+        Handle an href broadcast by another process: remove the user from our
+        caches, and from the Stormpath Client's resource cache.
+
+        :param str account_href: The Account href.
+        """
+        self.invalidate_href(account_href)
+
+        # The Stormpath Client caches the resources it fetches, too.
+        client = getattr(self.app, 'stormpath_client', None)
+        cache_del = getattr(getattr(client, 'data_store', None), '_cache_del', None)
+        if cache_del is not None:
+            cache_del(account_href)
+
+    def init_dispatch(self, app):
+        """
+        Initialize the dispatcher which runs receivers connected with
+        :meth:`connect_async`.
+
+        Its worker threads are only started once the first signal is sent.
+
+        :param obj app: The Flask app.
+        """
+        self.signal_dispatcher = SignalDispatcher(
+            threads = app.config['STORMPATH_SIGNAL_THREADS'],
+            queue_size = app.config['STORMPATH_SIGNAL_QUEUE_SIZE'],
+            policy = app.config['STORMPATH_SIGNAL_BACKPRESSURE'],
+        )
+
+    def connect_async(self, signal, receiver, sender=None):
+        """
+        Connect a receiver to one of our signals (`user_created`,
+        `user_updated`, or `user_deleted`), so it's run by a background thread
+        instead of inside the request which sent the signal.
+
+        Signals about the same user are delivered in the order they were sent.
+        Receivers connected with `signal.connect` are still run synchronously.
+
+        :param obj signal: The signal.
+        :param function receiver: The receiver.
+        :param obj sender: (optional) Only receive signals from this sender.
+        :rtype: function
+        :returns: `receiver`.
+        """
+        return self.signal_dispatcher.connect(signal, receiver, sender)
+
     def init_routes(self, app):
         """
         Initialize our built-in routes.
@@ -211,37 +674,144 @@ class StormpathManager(object):
         """
         Lazily load the Stormpath Client object we need to access the raw
         Stormpath SDK.
+
+        The Client is only ever created once per process, even if several
+        threads ask for it at the same time.
         """
         ctx = stack.top.app
         if ctx is not None:
-            if not hasattr(ctx, 'stormpath_client'):
+            self._check_fork(ctx)
 
-                # Create our custom user agent.  This allows us to see which
-                # version of this SDK are out in the wild!
-                user_agent = 'stormpath-flask/%s flask/%s' % (__version__, flask_version)
-
-                # If the user is specifying their credentials via a file path,
-                # we'll use this.
-                if self.app.config['STORMPATH_API_KEY_FILE']:
-                    ctx.stormpath_client = Client(
-                        api_key_file_location = self.app.config['STORMPATH_API_KEY_FILE'],
-                        user_agent = user_agent,
-                        cache_options = self.app.config['STORMPATH_CACHE'],
-                    )
-
-                # If the user isn't specifying their credentials via a file
-                # path, it means they're using environment variables, so we'll
-                # try to grab those values.
-                else:
-                    ctx.stormpath_client = Client(
-                        id = self.app.config['STORMPATH_API_KEY_ID'],
-                        secret = self.app.config['STORMPATH_API_KEY_SECRET'],
-                        user_agent = user_agent,
-                        cache_options = self.app.config['STORMPATH_CACHE'],
-                    )
+            if not hasattr(ctx, 'stormpath_client'):
+                with self._lock:
+                    if not hasattr(ctx, 'stormpath_client'):
+                        self._create_client(ctx)
 
             return ctx.stormpath_client
 
+    def _create_client(self, ctx):
+        """
+        Create our Stormpath Client, and store it on the Flask app.
+
+        This must be called while holding our lock.
+
+        :param obj ctx: The Flask app.
+        """
+        # Create our custom user agent.  This allows us to see which
+        # version of this SDK are out in the wild!
+        user_agent = 'stormpath-flask/%s flask/%s' % (__version__, flask_version)
+        options = {
+            'user_agent': user_agent,
+            'cache_options': self.app.config['STORMPATH_CACHE'],
+        }
+
+        # If we're talking to another Stormpath API (a local stand-in, for
+        # instance), point the client at it.
+        if self.app.config['STORMPATH_BASE_URL']:
+            options['base_url'] = self.app.config['STORMPATH_BASE_URL']
+
+        # If the user is specifying their credentials via a file path,
+        # we'll use this.
+        if self.app.config['STORMPATH_API_KEY_FILE']:
+            client = Client(
+                api_key_file_location = self.app.config['STORMPATH_API_KEY_FILE'],
+                **options
+            )
+
+        # If the user isn't specifying their credentials via a file
+        # path, it means they're using environment variables, so we'll
+        # try to grab those values.
+        else:
+            client = Client(
+                id = self.app.config['STORMPATH_API_KEY_ID'],
+                secret = self.app.config['STORMPATH_API_KEY_SECRET'],
+                **options
+            )
+
+        # Replace the client's default HTTP transport with a tuned,
+        # pooled one, so connections to Stormpath are reused across
+        # requests.
+        transport = PooledHTTPAdapter(
+            pool_size = self.app.config['STORMPATH_HTTP_POOL_SIZE'],
+            keep_alive = self.app.config['STORMPATH_HTTP_KEEP_ALIVE'],
+            connect_timeout = self.app.config['STORMPATH_HTTP_CONNECT_TIMEOUT'],
+            read_timeout = self.app.config['STORMPATH_HTTP_READ_TIMEOUT'],
+        )
+        session = client.data_store.executor.session
+        session.mount('https://', transport)
+        session.mount('http://', transport)
+
+        # The client is stored last, so other threads never see a client which
+        # isn't fully configured.
+        ctx.stormpath_pid = getpid()
+        ctx.stormpath_transport = transport
+        ctx.stormpath_client = client
+
+    def _check_fork(self, ctx):
+        """
+        Reset our state if we're running in a process forked from the one
+        which created our Stormpath Client.
+
+        Pre-fork servers (gunicorn, uWSGI, etc.) may create the Client in the
+        master process.  Sharing its pooled connections (and locks) with worker
+        processes isn't safe, so each worker gets its own.
+
+        :param obj ctx: The Flask app.
+        """
+        pid = getattr(ctx, 'stormpath_pid', None)
+        if pid is not None and pid != getpid():
+            self.reset(ctx)
+
+    def reset(self, ctx=None):
+        """
+        Throw away our Stormpath Client, Application, and caches, so they're
+        lazily recreated the next time they're needed.
+
+        This is called automatically in forked child processes.
+
+        :param obj ctx: (optional) The Flask app.  Defaults to the app this
+            extension was initialized with.
+        """
+        ctx = ctx or self.app
+
+        # Our lock (and our caches' locks) may have been held by another thread
+        # when we were forked, so we replace them instead of acquiring them.
+        self._lock = RLock()
+        self.user_fetches = SingleFlight()
+        for attr in ('stormpath_pid', 'stormpath_transport', 'stormpath_client', 'stormpath_application'):
+            if hasattr(ctx, attr):
+                delattr(ctx, attr)
+
+        self.user_cache = None
+        self.group_cache = None
+        self.init_breaker(ctx)
+        self.init_cache(ctx)
+
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.close()
+            self.invalidation_bus = self._create_invalidation_bus(ctx)
+
+    @property
+    def http_stats(self):
+        """
+        Return connection statistics for the Stormpath Client's HTTP
+        transport: the number of connections opened, and the number of requests
+        which reused an already open connection.
+        """
+        if self.client is not None:
+            return stack.top.app.stormpath_transport.stats
+
+    @property
+    def settings(self):
+        """
+        Return the compiled :class:`Settings` of the current app (or, outside
+        of an app context, of the app this extension was initialized with).
+        """
+        ctx = stack.top
+        app = ctx.app if ctx is not None else self.app
+
+        return getattr(app, 'stormpath_settings', None)
+
     @property
     def login_view(self):
         """
@@ -262,34 +832,323 @@ class StormpathManager(object):
         """
         Lazily load the Stormpath Application object we need to handle user
         authentication, etc.
+
+        The Application is only ever resolved once per process, even if several
+        threads ask for it at the same time.
+
+        This will raise a ConfigurationError if the Application can't be
+        found.
         """
         ctx = stack.top.app
         if ctx is not None:
-            if not hasattr(ctx, 'stormpath_application'):
-                applications =  self.client.applications.search(
-                    self.app.config['STORMPATH_APPLICATION']
-                )
-                if applications is None:
-                    raise Exception('Failed to find ' + self.app.config['STORMPATH_APPLICATION'] + ' application. Please add it in the Stormpath console.')
+            self._check_fork(ctx)
 
-                ctx.stormpath_application = applications[0]
+            if not hasattr(ctx, 'stormpath_application'):
+                with self._lock:
+                    if not hasattr(ctx, 'stormpath_application'):
+                        ctx.stormpath_application = self._resolve_application()
 
             return ctx.stormpath_application
 
+    def _resolve_application(self):
+        """
+        Find our Stormpath Application.
+
+        If `STORMPATH_APPLICATION_HREF` is set (or we've cached the href of our
+        Application in the `STORMPATH_APPLICATION_HREF_CACHE` file), we'll
+        fetch the Application directly.  Otherwise, we'll search for it by
+        name, and cache its href for next time.
+
+        :rtype: obj
+        :returns: The Stormpath Application.
+        """
+        name = self.app.config['STORMPATH_APPLICATION']
+        href = self.app.config['STORMPATH_APPLICATION_HREF']
+
+        if href:
+            try:
+                return self._get_application(href)
+            except StormpathError as err:
+                raise ConfigurationError('Failed to load the %s application: %s' % (href, err))
+
+        href = self._read_application_href(name)
+        if href:
+            try:
+                return self._get_application(href)
+            except StormpathError:
+                # Our cached href is stale (the Application may have been
+                # deleted and re-created), so we'll search for it instead.
+                pass
+
+        applications = [a for a in self.client.applications.search({'name': name}) if a.name == name]
+        if not applications:
+            raise ConfigurationError('Failed to find the %s application.  Please add it in the Stormpath console.' % name)
+
+        self._write_application_href(name, applications[0].href)
+
+        return applications[0]
+
+    def _get_application(self, href):
+        """
+        Fetch a Stormpath Application by href.
+
+        This will raise a StormpathError if the Application doesn't exist.
+
+        :param str href: The Application href.
+        :rtype: obj
+        :returns: The Stormpath Application, fully loaded.
+        """
+        application = self.client.applications.get(href)
+
+        # Accessing an attribute forces the Application to be loaded.
+        application.name
+
+        return application
+
+    def _read_application_href(self, name):
+        """
+        Read the cached href of the named Application from the
+        `STORMPATH_APPLICATION_HREF_CACHE` file.
+
+        :param str name: The Application name.
+        :rtype: str
+        :returns: The Application href, or None if it isn't cached.
+        """
+        path = self.app.config['STORMPATH_APPLICATION_HREF_CACHE']
+        if not path:
+            return None
+
+        try:
+            with open(path) as f:
+                cached = load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not isinstance(cached, dict) or cached.get('name') != name:
+            return None
+
+        return cached.get('href')
+
+    def _write_application_href(self, name, href):
+        """
+        Cache the href of the named Application in the
+        `STORMPATH_APPLICATION_HREF_CACHE` file (if configured).
+
+        The file is replaced atomically, so concurrent workers never read a
+        partially written file.  Failing to write the file isn't fatal.
+
+        :param str name: The Application name.
+        :param str href: The Application href.
+        """
+        path = self.app.config['STORMPATH_APPLICATION_HREF_CACHE']
+        if not path:
+            return
+
+        try:
+            fd, temp_path = mkstemp(dir=dirname(abspath(path)))
+            with fdopen(fd, 'w') as f:
+                dump({'name': name, 'href': href}, f)
+            rename(temp_path, path)
+        except (IOError, OSError):
+            pass
+
+    def fetch_user(self, account_href):
+        """
+        Given an Account href, return the associated User account object (or
+        None), either from the user cache (if enabled), or from Stormpath.
+
+        :returns: The User object or None.
+        """
+        if self.user_cache is not None:
+            user = self.user_cache.get(account_href)
+            if user is not None:
+                if self.refresh_ahead is not None:
+                    self._refresh_ahead(account_href)
+
+                return self._copy_user(user)
+
+            # If Stormpath is (or was recently) unavailable, don't make anyone
+            # wait on it if we've got a stale copy of this user.
+            if self.breaker is not None and self.breaker.state != CLOSED:
+                user = self.user_cache.get(account_href, stale=True)
+                if user is not None:
+                    self._refresh_user(account_href)
+                    return self._copy_user(user)
+
+        # Concurrent requests for the same user share a single API call, but
+        # each gets its own copy of the user.
+        return self._copy_user(self.user_fetches.do(account_href, lambda: self._fetch_user(account_href)))
+
+    def _get_account(self, account_href):
+        """
+        Fetch a User account object from Stormpath.
+
+        This will raise a StormpathError if something goes wrong.
+
+        :param str account_href: The Account href.
+        :returns: The User object.
+        """
+        user = self.client.accounts.get(account_href, expand=get_expansion())
+        user._ensure_data()
+        user.__class__ = User
+
+        return user
+
+    def _fetch_user(self, account_href):
+        """
+        Fetch a User account object (or None) from Stormpath, and cache it in
+        the user cache (if enabled).
+
+        If the circuit breaker is enabled and Stormpath is unavailable, the last
+        known good copy of the user is returned instead (if we have one).
+
+        :param str account_href: The Account href.
+        :returns: The User object or None.
+        """
+        try:
+            user = self.call_api(self._get_account, account_href)
+        except Exception as err:
+            if self.breaker is None or not is_outage(err):
+                if isinstance(err, StormpathError):
+                    return None
+                raise
+
+            user = self.user_cache.get(account_href, stale=True)
+            if user is not None:
+                self._refresh_user(account_href)
+
+            return self._copy_user(user)
+
+        if self.user_cache is not None:
+            self._store_user(account_href, user)
+
+        return user
+
+    def _store_user(self, account_href, user):
+        """
+        Store a user in the user cache: either a copy of the User, or (if the
+        `STORMPATH_USER_CACHE_SNAPSHOTS` setting is enabled) a compact snapshot
+        of it, which includes their group memberships if they're in the group
+        cache.
+
+        :param str account_href: The Account href.
+        :param obj user: The User.
+        """
+        if self.user_snapshots and isinstance(user, User):
+            group_hrefs = self.group_cache.get(account_href) if self.group_cache is not None else None
+            user = UserSnapshot.from_user(user, group_hrefs)
+        else:
+            user = self._copy_user(user)
+
+        self.user_cache.set(account_href, user)
+
+    def _copy_user(self, user):
+        """
+        Return a copy of a user going into (or coming out of) the user cache.
+        Cached users are shared by every request, so each request gets its own
+        copy, which it can modify (or promote) without affecting the others.
+
+        :param obj user: The User or UserSnapshot (or None).
+        """
+        if isinstance(user, (User, UserSnapshot)):
+            return user.copy()
+
+        return user
+
+    def _refresh_ahead(self, account_href):
+        """
+        Refresh a cached user in the background if they're about to expire.
+
+        Each read compares the user's remaining time to live against the
+        refresh-ahead window plus a random jitter, so users cached at the same
+        time aren't all refreshed at once.
+
+        :param str account_href: The Account href.
+        """
+        remaining = self.user_cache.time_to_live(account_href)
+        ahead, jitter = self.refresh_ahead
+
+        if remaining is not None and remaining <= ahead + random() * jitter:
+            self._refresh_user(account_href)
+
+    def _refresh_user(self, account_href):
+        """
+        Re-fetch a user in the background, and update the user cache if it
+        succeeds.
+
+        Nothing happens if the circuit breaker is open, or if the user is
+        already being refreshed.
+
+        :param str account_href: The Account href.
+        """
+        if self.breaker is not None and self.breaker.state == OPEN:
+            return
+
+        if self.refresher.is_pending(account_href):
+            return
+
+        app = stack.top.app
+
+        def refresh():
+            with app.app_context():
+                user = self.call_api(self._get_account, account_href)
+
+            if self.user_cache is not None:
+                self._store_user(account_href, user)
+
+        self.refresher.schedule(account_href, refresh)
+
     @staticmethod
     def load_user(account_href):
         """
         Given an Account href (a valid Stormpath Account URL), return the
         associated User account object (or None).
 
+        If session snapshots are enabled, we'll rebuild a read-only User from
+        the user's session while the snapshot is fresh.  Otherwise, the User is
+        loaded via :meth:`fetch_user`.
+
         :returns: The User object or None.
         """
-        user = current_app.stormpath_manager.client.accounts.get(account_href)
+        manager = current_app.stormpath_manager
+        settings = current_app.stormpath_settings
+        use_snapshots = settings.session_snapshot_enabled and has_request_context()
 
-        try:
-            user._ensure_data()
-            user.__class__ = User
+        if use_snapshots:
+            snapshot = load_snapshot(account_href, settings.session_snapshot_max_age)
+            if snapshot is not None:
+                return User.from_snapshot(snapshot)
+
+        user = manager.fetch_user(account_href)
 
-            return user
-        except StormpathError:
+        # Our snapshot was either missing or stale, so refresh it.
+        if use_snapshots and user is not None:
+            save_snapshot(user)
+
+        return user
+
+    @staticmethod
+    def load_user_from_request(request):
+        """
+        Given a Flask request carrying a Stormpath access token (as a bearer
+        token in the `Authorization` header), return the associated User
+        account object (or None).
+
+        The access token is verified locally, so no Stormpath API call is
+        needed to validate it.  The User itself is loaded via
+        :meth:`fetch_user`.
+
+        :returns: The User object or None.
+        """
+        from .tokens import get_bearer_token, verify_access_token
+
+        token = get_bearer_token(request)
+        if token is None:
+            return None
+
+        manager = current_app.stormpath_manager
+        claims = verify_access_token(token, manager.client.auth.secret, manager.application.href)
+        if claims is None:
             return None
+
+        return manager.fetch_user(claims['sub'])
@@ -0,0 +1,219 @@
+"""A circuit breaker which guards our calls to the Stormpath API."""
+
+
+from collections import deque
+from threading import Lock
+from time import time
+
+from stormpath.error import Error as StormpathError
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(StormpathError):
+    """
+    This exception is raised instead of calling Stormpath while the circuit
+    breaker is open.
+
+    It's a Stormpath error (with a 503 status), so code which already handles
+    Stormpath errors handles it too.
+    """
+    def __init__(self):
+        super(CircuitOpenError, self).__init__({
+            'status': 503,
+            'message': 'Authentication is temporarily unavailable.  Please try again in a few moments.',
+            'developerMessage': 'The Stormpath circuit breaker is open, so this call was not attempted.',
+        })
+
+
+def is_outage(error):
+    """
+    Return True if the given exception suggests Stormpath is unavailable (as
+    opposed to, say, an invalid password or a missing account).
+
+    :param obj error: The exception.
+    :rtype: bool
+    """
+    if isinstance(error, StormpathError):
+        status = getattr(error, 'status', None)
+        return status is None or status == 429 or status >= 500
+
+    return isinstance(error, (IOError, OSError))
+
+
+class CircuitBreaker(object):
+    """
+    A thread-safe circuit breaker.
+
+    While the breaker is closed, calls go through, and the outcome of the most
+    recent calls is tracked.  A call fails if it raises an outage error (see
+    :func:`is_outage`), or if it takes longer than `slow_call`.  Once the
+    error rate of the recent calls reaches `error_rate`, the breaker opens,
+    and calls are rejected (with a :class:`CircuitOpenError`) without being
+    attempted.
+
+    After `reset_timeout`, the breaker is half-open: a single trial call is let
+    through.  If it succeeds the breaker closes, otherwise it opens again.
+
+    :param int window: The number of recent calls to track.
+    :param int min_calls: The minimum number of tracked calls needed before
+        the breaker can open.
+    :param float error_rate: The fraction of failed calls (between 0 and 1)
+        which opens the breaker.
+    :param obj slow_call: (optional) A `timedelta` object.  Calls which take
+        longer than this are counted as failures.
+    :param obj reset_timeout: A `timedelta` object which controls how long the
+        breaker stays open before letting a trial call through.
+    """
+    def __init__(self, window, min_calls, error_rate, slow_call, reset_timeout):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call.total_seconds() if slow_call else None
+        self.reset_timeout = reset_timeout.total_seconds()
+
+        self.rejected = 0
+        self.opened = 0
+
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = Lock()
+
+    @property
+    def state(self):
+        """
+        Return the breaker's state: 'closed', 'open', or 'half-open'.
+
+        :rtype: str
+        """
+        with self._lock:
+            if self._state == OPEN and self._opened_at + self.reset_timeout <= time():
+                return HALF_OPEN
+
+            return self._state
+
+    @property
+    def stats(self):
+        """
+        Return the breaker's state and statistics.
+
+        :rtype: dict
+        :returns: The breaker's state, the number of tracked calls (and how
+            many of them failed), the number of rejected calls, and the
+            number of times the breaker has opened.
+        """
+        state = self.state
+
+        with self._lock:
+            return {
+                'state': state,
+                'calls': len(self._outcomes),
+                'failures': self._outcomes.count(False),
+                'rejected': self.rejected,
+                'opened': self.opened,
+            }
+
+    def trip(self):
+        """Open the breaker, regardless of the recent error rate."""
+        with self._lock:
+            self._open()
+
+    def reset(self):
+        """Close the breaker, and forget about all recent calls."""
+        with self._lock:
+            self._state = CLOSED
+            self._trial_in_flight = False
+            self._outcomes.clear()
+
+    def _open(self):
+        """Open the breaker.  This must be called while holding our lock."""
+        if self._state != OPEN:
+            self.opened += 1
+
+        self._state = OPEN
+        self._opened_at = time()
+        self._trial_in_flight = False
+
+    def _before_call(self):
+        """
+        Decide whether a call may go through.
+
+        This will raise a CircuitOpenError if it may not.
+
+        :rtype: bool
+        :returns: True if the call is a half-open trial call.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return False
+
+            if self._state == OPEN and self._opened_at + self.reset_timeout <= time():
+                self._state = HALF_OPEN
+
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            self.rejected += 1
+
+        raise CircuitOpenError()
+
+    def _after_call(self, success, trial):
+        """
+        Record the outcome of a call.
+
+        :param bool success: Did the call succeed?
+        :param bool trial: Was the call a half-open trial call?
+        """
+        with self._lock:
+            if trial:
+                if success:
+                    self._state = CLOSED
+                    self._trial_in_flight = False
+                    self._outcomes.clear()
+                else:
+                    self._open()
+
+                return
+
+            if self._state != CLOSED:
+                return
+
+            self._outcomes.append(success)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._outcomes.count(False) >= self.error_rate * calls:
+                self._open()
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call `func` through the breaker.
+
+        This will raise a CircuitOpenError if the breaker is open.  Any
+        exception raised by `func` is re-raised.
+
+        :param function func: The function to call.
+        :returns: The result of `func`.
+        """
+        trial = self._before_call()
+        start = time()
+
+        # The outcome is always recorded (even if we're interrupted by
+        # something like a KeyboardInterrupt, which counts as a failure), so a
+        # half-open trial call can never be left in flight.
+        success = False
+        try:
+            result = func(*args, **kwargs)
+            success = self.slow_call is None or time() - start <= self.slow_call
+        except Exception as err:
+            # Errors like an invalid password or a missing account don't mean
+            # Stormpath is unavailable.
+            success = not is_outage(err)
+            raise
+        finally:
+            self._after_call(success, trial)
+
+        return result
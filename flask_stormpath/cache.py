@@ -0,0 +1,204 @@
+"""In-process caches used to avoid redundant Stormpath API calls."""
+
+
+from collections import OrderedDict
+from sys import exc_info
+from threading import Event, Lock
+from time import time
+
+from six import reraise
+
+
+class UserCache(object):
+    """
+    A thread-safe, size-bounded LRU cache with a per-entry TTL.
+
+    This is used to hold loaded :class:`flask_stormpath.models.User` objects
+    (keyed by their Stormpath Account href) across requests, so that
+    :meth:`flask_stormpath.StormpathManager.load_user` doesn't need to hit the
+    Stormpath API on every authenticated request.
+
+    :param int max_size: The maximum number of entries to hold.  Once this
+        limit is reached, the least recently used entry is evicted.
+    :param obj ttl: A `timedelta` object which controls how long an entry is
+        considered fresh.
+    :param obj stale_ttl: (optional) A `timedelta` object which controls how
+        long an entry is kept around (for stale reads) once it's no longer
+        fresh.
+    """
+    def __init__(self, max_size, ttl, stale_ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl.total_seconds()
+        self.stale_ttl = stale_ttl.total_seconds() if stale_ttl else 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, stale=False):
+        """
+        Return the cached value for `key`, or None if there is no fresh entry.
+
+        :param str key: The cache key (an Account href).
+        :param bool stale: (optional) If True, return the cached value even if
+            it's no longer fresh (as long as it hasn't been discarded).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            now = time()
+            if expires_at <= now:
+                if expires_at + self.stale_ttl <= now:
+                    del self._entries[key]
+                elif stale:
+                    self.stale_hits += 1
+                    return value
+
+                self.misses += 1
+                return None
+
+            # Mark this entry as the most recently used one.
+            del self._entries[key]
+            self._entries[key] = entry
+            self.hits += 1
+
+            return value
+
+    def time_to_live(self, key):
+        """
+        Return how long (in seconds) the entry for `key` will stay fresh.
+
+        This doesn't count as a cache hit or miss.
+
+        :param str key: The cache key (an Account href).
+        :rtype: float
+        :returns: The remaining time, or None if there is no fresh entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            remaining = entry[1] - time()
+
+            return remaining if remaining > 0 else None
+
+    def set(self, key, value):
+        """
+        Store `value` under `key`, evicting the least recently used entry if
+        the cache is full.
+
+        :param str key: The cache key (an Account href).
+        :param obj value: The value to cache.
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_size:
+                self._entries.popitem(last=False)
+
+            self._entries[key] = (value, time() + self.ttl)
+
+    def delete(self, key):
+        """
+        Remove `key` from the cache (if present).
+
+        :param str key: The cache key (an Account href).
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+
+class _Call(object):
+    """A single in-flight call, shared by every caller waiting on it."""
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent calls for the same key into a single call.
+
+    If a call for a key is already in flight when another thread asks for the
+    same key, that thread waits for the in-flight call to finish and shares its
+    result (or exception) instead of making its own.
+
+    This is used to ensure a burst of concurrent requests from the same user
+    only loads their account from Stormpath once.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.collapsed = 0
+
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self, key, func):
+        """
+        Call `func`, unless a call for `key` is already in flight, in which
+        case wait for it and return its result.
+
+        :param str key: The key to coalesce calls on (an Account href).
+        :param function func: A function which takes no arguments.
+        :returns: The result of `func`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                reraise(*call.error)
+
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception:
+            call.error = exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    @property
+    def stats(self):
+        """
+        Return coalescing statistics.
+
+        :rtype: dict
+        :returns: The number of calls made, and the number of calls which were
+            collapsed into an in-flight call.
+        """
+        with self._lock:
+            return {'calls': self.calls, 'collapsed': self.collapsed}
@@ -1,13 +1,36 @@
 """Custom context processors to make template development simpler."""
 
 
-from flask import current_app
+from flask import current_app, has_request_context, request
 from flask_login import _get_user
+from werkzeug.local import LocalProxy
+
+
+def _is_exempt():
+    """
+    Return True if the current request's endpoint has opted out of the `user`
+    template variable.
+
+    An endpoint can opt out by being listed in the
+    `STORMPATH_USER_CONTEXT_EXEMPT` setting, or by decorating its view with
+    :func:`flask_stormpath.decorators.user_context_exempt`.
+
+    :rtype: bool
+    """
+    if not has_request_context() or request.endpoint is None:
+        return False
+
+    if request.endpoint in current_app.stormpath_settings.user_context_exempt:
+        return True
+
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, '_stormpath_user_context_exempt', False)
 
 
 def user_context_processor():
     """
-    Insert a special variable named `user` into all templates.
+    Insert a special variable named `user` (and its alias, `current_user`)
+    into all templates.
 
     This makes it easy for developers to add users and their data into
     templates without explicitly passing the user each each time.
@@ -23,5 +46,18 @@ def user_context_processor():
     a Stormpath Account behind the scenes.  See the Python SDK documentation
     for more information about Account objects:
     https://github.com/stormpath/stormpath-sdk-python
+
+    The `user` variable is a lazy proxy: the user is only loaded the first time
+    a template actually uses it.  For endpoints which have opted out (see the
+    `STORMPATH_USER_CONTEXT_EXEMPT` setting and the `user_context_exempt`
+    decorator), `user` is always an anonymous user, so the user is never
+    loaded at all.
     """
-    return {'user': _get_user()}
+    if _is_exempt():
+        user = current_app.login_manager.anonymous_user()
+    else:
+        user = LocalProxy(_get_user)
+
+    # Flask-Login's `current_user` template variable is provided here as well,
+    # so it's just as lazy.
+    return {'user': user, 'current_user': user}
@@ -5,9 +5,142 @@ simpler.
 
 
 from functools import wraps
+from time import time
 
-from flask import current_app
+from flask import _request_ctx_stack, abort, current_app, g, request
 from flask_login import current_user
+from six import string_types
+from stormpath.error import Error as StormpathError
+
+from .breaker import is_outage
+from .expressions import all_of, any_of, compile_expression, member_of
+
+
+def _normalize_group(group):
+    """
+    Turn a Group object, Group href, or Group name into a string (either a
+    Group href, or a Group name).
+
+    :param group: A Group object, Group href, or Group name.
+    :rtype: str
+    """
+    if isinstance(group, string_types):
+        return group
+
+    return group.href
+
+
+def _is_group_href(group):
+    """
+    Return True if the given (normalized) group is a Group href.
+
+    :param str group: A Group href or Group name.
+    :rtype: bool
+    """
+    return '/groups/' in group
+
+
+def _resolve_group(group):
+    """
+    Resolve a (normalized) group into the hrefs of every matching Group.
+
+    Group names are resolved by searching our Stormpath Application's groups
+    the first time they're seen.  The result is memoized on the
+    StormpathManager, so each name is only ever searched for once per
+    process.  Names which don't match any groups are remembered for
+    STORMPATH_UNKNOWN_GROUP_TTL, as the group may be created later.
+
+    If Stormpath is unavailable, the request is aborted with a 503.
+
+    :param str group: A Group href or Group name.
+    :rtype: frozenset
+    :returns: The matching Group hrefs (empty if there are none).
+    """
+    if _is_group_href(group):
+        return frozenset([group])
+
+    manager = current_app.stormpath_manager
+    hrefs = manager.group_hrefs_by_name.get(group)
+    if hrefs is not None:
+        return hrefs
+
+    if manager.unknown_group_names.get(group, 0) > time():
+        return frozenset()
+
+    try:
+        hrefs = manager.call_api(lambda: frozenset(
+            match.href for match in manager.application.groups.search({'name': group})
+            if match.name == group
+        ))
+    except StormpathError as err:
+        if not is_outage(err):
+            raise
+
+        abort(503)
+
+    if hrefs:
+        manager.group_hrefs_by_name[group] = hrefs
+        manager.unknown_group_names.pop(group, None)
+    else:
+        ttl = current_app.stormpath_settings.unknown_group_ttl
+        manager.unknown_group_names[group] = time() + ttl.total_seconds()
+
+    return hrefs
+
+
+def _get_member_hrefs():
+    """
+    Return the hrefs of every Group the current user is a member of.
+
+    The user's memberships are only fetched once per request.  If the group
+    cache is enabled, they're also cached across requests.
+
+    If the circuit breaker is enabled and Stormpath is unavailable, the last
+    known memberships are used instead.  If there aren't any, the request is
+    aborted with a 503.
+
+    :rtype: frozenset
+    :returns: The Group hrefs.
+    """
+    href = current_user.href
+    member_hrefs = getattr(g, '_stormpath_member_hrefs', None)
+    if member_hrefs is not None and member_hrefs[0] == href:
+        return member_hrefs[1]
+
+    manager = current_app.stormpath_manager
+    cache = manager.group_cache
+    hrefs = cache.get(href) if cache is not None else None
+    if hrefs is None:
+        try:
+            hrefs = manager.call_api(current_user.get_group_hrefs)
+        except Exception as err:
+            if manager.breaker is None or not is_outage(err):
+                raise
+
+            hrefs = cache.get(href, stale=True)
+            if hrefs is None:
+                abort(503)
+        else:
+            if cache is not None:
+                cache.set(href, hrefs)
+
+    g._stormpath_member_hrefs = (href, hrefs)
+
+    return hrefs
+
+
+def _is_member(predicate):
+    """
+    Check the current user's group memberships against a compiled group
+    predicate.
+
+    :param function predicate: A predicate built by
+        :mod:`flask_stormpath.expressions`.
+    :rtype: bool
+    """
+    member_hrefs = _get_member_hrefs()
+
+    return predicate(lambda group: not _resolve_group(group).isdisjoint(member_hrefs))
 
 
 def groups_required(groups, all=True):
@@ -22,6 +155,10 @@ def groups_required(groups, all=True):
         - A Group name (as a string).
         - A Group href (as a string).
 
+        This can also be a Group expression (as a string) which combines Group
+        names or hrefs with `and`, `or`, `not`, and parentheses.  Group names
+        containing spaces must be quoted.
+
     :param bool all: (optional) Should we ensure the user is a member of every
         group listed?  Default: True.  If this is set to False, we'll let the
         user into the view if the user is part of at least one of the specified
@@ -33,7 +170,26 @@ def groups_required(groups, all=True):
         def private_view():
             '''Only admins and developers will be able to visit this page.'''
             return 'hi!'
+
+        @groups_required('admins or (developers and not "contractors team")')
+        def another_private_view():
+            '''Admins and non-contractor developers can visit this page.'''
+            return 'hi!'
+
+    Group expressions are compiled once, when the decorator is applied, and
+    evaluated with short-circuiting.  The `all` flag is ignored for Group
+    expressions.
+
+    The user's group memberships are fetched at most once per request (and, if
+    the group cache is enabled, cached across requests), and group names are
+    only resolved once per process, so checking memberships is cheap.
     """
+    if isinstance(groups, string_types):
+        predicate = compile_expression(groups)
+    else:
+        predicates = [member_of(_normalize_group(group)) for group in groups]
+        predicate = all_of(predicates) if all else any_of(predicates)
+
     def decorator(func):
 
         @wraps(func)
@@ -47,14 +203,11 @@ def groups_required(groups, all=True):
             elif not current_user.is_authenticated:
                 return current_app.login_manager.unauthorized()
 
-            # If the user authenticated, and the all flag is set, we need to
-            # see if the user is a member of *ALL* groups.
-            if all and not current_user.has_groups(groups):
-                return current_app.login_manager.unauthorized()
-
-            # If the all flag is NOT set, we need to make sure the user is a
-            # member of at least one group.
-            elif not current_user.has_groups(groups, all=False):
+            # If the user authenticated, we need to see if the user's group
+            # memberships satisfy our requirements: membership in *ALL* groups
+            # (if the all flag is set), at least one group (if the all flag is
+            # NOT set), or the given Group expression.
+            elif not _is_member(predicate):
                 return current_app.login_manager.unauthorized()
 
             # Lastly, if the user has successfully passsed all authentication /
@@ -64,3 +217,63 @@ def groups_required(groups, all=True):
         return wrapper
 
     return decorator
+
+
+def token_required(func):
+    """
+    This decorator requires that a request carry a valid Stormpath OAuth
+    access token (as a bearer token in the `Authorization` header) before it
+    is granted access.
+
+    The access token is verified locally (signature, expiration time, and
+    claims), so no Stormpath API call is needed to validate it.  If the token
+    is missing or invalid, a 401 UNAUTHORIZED response is returned.
+
+    Once the token has been verified, the token's user is available as
+    `current_user` for the rest of the request (no session is created).
+
+    Usage::
+
+        @token_required
+        def api_view():
+            '''Only API clients with a valid access token can get here.'''
+            return jsonify(email=current_user.email)
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+
+        # If authentication stuff is disabled, do nothing.
+        if current_app.login_manager._login_disabled:
+            return func(*args, **kwargs)
+
+        user = current_app.stormpath_manager.load_user_from_request(request)
+        if user is None:
+            abort(401)
+
+        # Make this user the current user for the rest of this request.
+        _request_ctx_stack.top.user = user
+
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def user_context_exempt(func):
+    """
+    This decorator opts a view out of the `user` template variable, so that
+    rendering its templates never loads the current user.
+
+    This is useful for static or marketing pages which share a base template
+    with the rest of your site, but never need to know who the user is.  In
+    these views, `user` is always an anonymous user.
+
+    Usage::
+
+        @app.route('/pricing')
+        @user_context_exempt
+        def pricing():
+            return render_template('pricing.html')
+    """
+    func._stormpath_user_context_exempt = True
+
+    return func
@@ -0,0 +1,273 @@
+"""
+Asynchronous delivery of our user signals.
+
+Receivers connected to `user_created`, `user_updated`, and `user_deleted` the
+usual way (`signal.connect(receiver)`) run synchronously, inside the request
+which created, updated, or deleted the user.  Receivers connected through a
+:class:`SignalDispatcher` are instead run by a small pool of background
+threads, so slow receivers (syncing a CRM, sending email, etc.) don't slow
+requests down.
+"""
+
+
+from os import getpid
+from threading import Condition, Lock, Thread
+from time import time
+from zlib import crc32
+
+from flask import _app_ctx_stack as stack
+from six.moves.queue import Full, Queue
+
+
+# What to do with a signal when its worker's queue is full.
+BLOCK = 'block'
+DROP = 'drop'
+CALLER = 'caller'
+
+BACKPRESSURE_POLICIES = (BLOCK, DROP, CALLER)
+
+
+def get_key(kwargs):
+    """
+    Return the ordering key of a signal: the href of the user it's about.
+
+    :param dict kwargs: The signal's keyword arguments.
+    :rtype: str
+    """
+    user = kwargs.get('user')
+    if isinstance(user, dict):
+        return user.get('href') or ''
+
+    return getattr(user, 'href', None) or ''
+
+
+class SignalDispatcher(object):
+    """
+    Run signal receivers in a pool of background threads.
+
+    Signals about the same user (the same Account href) are always delivered
+    by the same thread, in the order they were sent.  Each thread has its own
+    bounded queue; when a signal's queue is full, `policy` decides what
+    happens:
+
+        - `block`: Wait for room in the queue.
+        - `drop`: Drop the signal (it's counted, but never delivered).
+        - `caller`: Run the receiver right away, in the sending thread.  This
+          may deliver the signal before earlier signals about the same user.
+
+    Receivers are called inside an app context, if the signal was sent inside
+    one.  Exceptions raised by receivers are counted, and otherwise ignored.
+
+    The worker threads are only started once the first signal is dispatched,
+    so creating a dispatcher in a process which later forks is safe.
+
+    :param int threads: The number of worker threads.
+    :param int queue_size: The maximum number of signals waiting to be
+        delivered, split evenly between the threads.
+    :param str policy: The backpressure policy: `block`, `drop`, or `caller`.
+    """
+    def __init__(self, threads, queue_size, policy=BLOCK):
+        self.threads = threads
+        self.queue_size = queue_size
+        self.policy = policy
+
+        self.dispatched = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.inline = 0
+
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._receivers = {}
+        self._queues = []
+        self._pid = None
+        self._unfinished = 0
+        self._lock_pid = getpid()
+        self._lock = Lock()
+        self._done = Condition(self._lock)
+
+    def connect(self, signal, receiver, sender=None):
+        """
+        Connect `receiver` to `signal`, so it's run in the background.
+
+        :param obj signal: A blinker signal (`user_created`, etc.).
+        :param function receiver: The receiver, which is called just like a
+            synchronous one: `receiver(sender, user=...)`.
+        :param obj sender: (optional) Only receive signals from this sender.
+        :rtype: function
+        :returns: `receiver`, so this can be used as a decorator.
+        """
+        def deliver(sender, **kwargs):
+            self.dispatch(receiver, sender, kwargs)
+
+        self._receivers[(signal, receiver)] = deliver
+
+        if sender is None:
+            signal.connect(deliver, weak=False)
+        else:
+            signal.connect(deliver, sender=sender, weak=False)
+
+        return receiver
+
+    def disconnect(self, signal, receiver):
+        """
+        Disconnect a receiver connected with :meth:`connect`.
+
+        :param obj signal: The blinker signal.
+        :param function receiver: The receiver.
+        """
+        deliver = self._receivers.pop((signal, receiver), None)
+        if deliver is not None:
+            signal.disconnect(deliver)
+
+    def _check_fork(self):
+        """
+        Replace our lock if we were forked since it was created.  This must be
+        called before taking our lock.
+
+        One of our parent's threads may have been holding the lock when we
+        were forked, and as that thread didn't survive the fork, the lock
+        would never be released.
+        """
+        if self._lock_pid != getpid():
+            self._lock_pid = getpid()
+            self._lock = Lock()
+            self._done = Condition(self._lock)
+
+    def _start(self):
+        """
+        Start our worker threads, if they aren't running in this process.  This
+        must be called while holding our lock.
+        """
+        if self._pid == getpid():
+            return
+
+        # Threads (and signals queued for them) don't survive a fork.
+        self._queues = []
+        self._unfinished = 0
+
+        for _ in range(self.threads):
+            queue = Queue(max(1, self.queue_size // self.threads))
+            worker = Thread(target=self._work, args=(queue,))
+            worker.daemon = True
+            worker.start()
+            self._queues.append(queue)
+
+        self._pid = getpid()
+
+    def dispatch(self, receiver, sender, kwargs):
+        """
+        Queue a signal to be delivered to `receiver` in the background.
+
+        :param function receiver: The receiver.
+        :param obj sender: The signal's sender.
+        :param dict kwargs: The signal's keyword arguments.
+        """
+        ctx = stack.top
+        item = (receiver, sender, kwargs, ctx.app if ctx is not None else None, time())
+
+        self._check_fork()
+        with self._lock:
+            self._start()
+            queue = self._queues[crc32(get_key(kwargs).encode('utf-8')) % len(self._queues)]
+            self.dispatched += 1
+            self._unfinished += 1
+
+        try:
+            queue.put(item, block=self.policy == BLOCK)
+            return
+        except Full:
+            pass
+
+        with self._lock:
+            self._unfinished -= 1
+            if self.policy == DROP:
+                self.dropped += 1
+                self._done.notify_all()
+                return
+
+            self.inline += 1
+
+        self._deliver(*item)
+
+    def _work(self, queue):
+        """Deliver queued signals, forever."""
+        while True:
+            item = queue.get()
+            self._deliver(*item)
+
+            with self._lock:
+                self._unfinished -= 1
+                self._done.notify_all()
+
+    def _deliver(self, receiver, sender, kwargs, app, dispatched_at):
+        """Call a receiver (inside an app context, if needed)."""
+        try:
+            if app is None or (stack.top is not None and stack.top.app is app):
+                receiver(sender, **kwargs)
+            else:
+                with app.app_context():
+                    receiver(sender, **kwargs)
+            failed = False
+        except Exception:
+            failed = True
+
+        latency = time() - dispatched_at
+
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.delivered += 1
+
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+
+    def join(self, timeout=None):
+        """
+        Wait until every queued signal has been delivered.
+
+        :param float timeout: (optional) The maximum number of seconds to wait.
+        :rtype: bool
+        :returns: True if every signal was delivered, False if we timed out.
+        """
+        deadline = None if timeout is None else time() + timeout
+
+        self._check_fork()
+        with self._lock:
+            while self._unfinished and self._pid == getpid():
+                remaining = None if deadline is None else deadline - time()
+                if remaining is not None and remaining <= 0:
+                    return False
+
+                self._done.wait(remaining)
+
+        return True
+
+    @property
+    def stats(self):
+        """
+        Return statistics about the signals we've dispatched.
+
+        :rtype: dict
+        :returns: The number of signals dispatched, delivered, failed (whose
+            receiver raised an exception), dropped, and delivered inline (by
+            the `caller` policy), the number still queued, and the average and
+            maximum time (in seconds) between a signal being sent and its
+            receiver returning.
+        """
+        self._check_fork()
+        with self._lock:
+            finished = self.delivered + self.failed
+
+            return {
+                'dispatched': self.dispatched,
+                'delivered': self.delivered,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'inline': self.inline,
+                'queued': sum(queue.qsize() for queue in self._queues) if self._pid == getpid() else 0,
+                'latency_avg': self._latency_total / finished if finished else 0.0,
+                'latency_max': self._latency_max,
+            }
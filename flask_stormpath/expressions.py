@@ -0,0 +1,196 @@
+"""
+Helpers for compiling boolean Group expressions.
+
+A Group expression combines Group names (or hrefs) with `and`, `or`, `not`,
+and parentheses, for instance::
+
+    admins or (developers and not "contractors team")
+
+Expressions are compiled once into a predicate: a function which takes a
+`has_group(group)` callable and returns True or False, short-circuiting as soon
+as the result is known.
+"""
+
+
+from re import compile as compile_regex
+
+from .errors import ConfigurationError
+
+
+TOKEN_REGEX = compile_regex(r'''\s*(?:(\()|(\))|"([^"]*)"|'([^']*)'|([^\s()"']+))''')
+KEYWORDS = ('and', 'or', 'not')
+
+
+def _tokenize(expression):
+    """
+    Split an expression into a list of tokens.
+
+    Each token is a tuple of (kind, value), where kind is either '(', ')',
+    'and', 'or', 'not', or 'group'.
+
+    :param str expression: The expression.
+    :rtype: list
+    """
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+
+    while position < len(expression):
+        match = TOKEN_REGEX.match(expression, position)
+        if not match:
+            raise ConfigurationError('Invalid group expression: %r.' % expression)
+
+        position = match.end()
+        lparen, rparen, double_quoted, single_quoted, word = match.groups()
+
+        if lparen:
+            tokens.append(('(', lparen))
+        elif rparen:
+            tokens.append((')', rparen))
+        elif word is not None and word.lower() in KEYWORDS:
+            tokens.append((word.lower(), word))
+        else:
+            tokens.append(('group', next(v for v in (double_quoted, single_quoted, word) if v is not None)))
+
+    return tokens
+
+
+def all_of(predicates):
+    """
+    Return a predicate which is True if *every* given predicate is True.
+
+    :param list predicates: The predicates to combine.
+    :rtype: function
+    """
+    predicates = tuple(predicates)
+
+    def predicate(has_group):
+        for p in predicates:
+            if not p(has_group):
+                return False
+        return True
+
+    return predicate
+
+
+def any_of(predicates):
+    """
+    Return a predicate which is True if *any* given predicate is True.
+
+    :param list predicates: The predicates to combine.
+    :rtype: function
+    """
+    predicates = tuple(predicates)
+
+    def predicate(has_group):
+        for p in predicates:
+            if p(has_group):
+                return True
+        return False
+
+    return predicate
+
+
+def none_of(p):
+    """
+    Return a predicate which negates the given predicate.
+
+    :param function p: The predicate to negate.
+    :rtype: function
+    """
+    return lambda has_group: not p(has_group)
+
+
+def member_of(group):
+    """
+    Return a predicate which is True if the user is a member of `group`.
+
+    :param str group: A Group name or href.
+    :rtype: function
+    """
+    return lambda has_group: has_group(group)
+
+
+class _Parser(object):
+    """
+    A tiny recursive descent parser for Group expressions.
+
+    The grammar (from lowest to highest precedence) is::
+
+        or_expr  := and_expr ('or' and_expr)*
+        and_expr := not_expr ('and' not_expr)*
+        not_expr := 'not' not_expr | atom
+        atom     := '(' or_expr ')' | group
+    """
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def error(self):
+        raise ConfigurationError('Invalid group expression: %r.' % self.expression)
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+
+    def take(self, kind):
+        if self.peek() != kind:
+            self.error()
+
+        token = self.tokens[self.position]
+        self.position += 1
+
+        return token[1]
+
+    def parse(self):
+        predicate = self.or_expr()
+        if self.peek() is not None:
+            self.error()
+
+        return predicate
+
+    def or_expr(self):
+        predicates = [self.and_expr()]
+        while self.peek() == 'or':
+            self.take('or')
+            predicates.append(self.and_expr())
+
+        return predicates[0] if len(predicates) == 1 else any_of(predicates)
+
+    def and_expr(self):
+        predicates = [self.not_expr()]
+        while self.peek() == 'and':
+            self.take('and')
+            predicates.append(self.not_expr())
+
+        return predicates[0] if len(predicates) == 1 else all_of(predicates)
+
+    def not_expr(self):
+        if self.peek() == 'not':
+            self.take('not')
+            return none_of(self.not_expr())
+
+        return self.atom()
+
+    def atom(self):
+        if self.peek() == '(':
+            self.take('(')
+            predicate = self.or_expr()
+            self.take(')')
+            return predicate
+
+        return member_of(self.take('group'))
+
+
+def compile_expression(expression):
+    """
+    Compile a Group expression into a predicate.
+
+    This will raise a ConfigurationError if the expression is invalid.
+
+    :param str expression: The Group expression.
+    :rtype: function
+    :returns: A predicate which takes a `has_group(group)` callable.
+    """
+    return _Parser(expression).parse()
@@ -39,18 +39,71 @@ class RegistrationForm(Form):
         super(RegistrationForm, self).__init__(formdata, obj, prefix, csrf_context, secret_key, csrf_enabled, *args,
                                                **kwargs)
 
+        # Passing `config` is supported for backwards compatibility only: it
+        # re-evaluates the settings for every form.  Prefer the classes built
+        # (once) by `get_registration_form`.
         if config:
-            if config['STORMPATH_ENABLE_USERNAME'] and config['STORMPATH_REQUIRE_USERNAME']:
-                self.username.validators.append(InputRequired('Username is required.'))
+            for name, label, message in REGISTRATION_FIELDS:
+                if _is_required(config, name):
+                    field = getattr(self, name)
+                    field.validators = list(field.validators) + [InputRequired(message)]
 
-            if config['STORMPATH_ENABLE_GIVEN_NAME'] and config['STORMPATH_REQUIRE_GIVEN_NAME']:
-                self.given_name.validators.append(InputRequired('First name is required.'))
 
-            if config['STORMPATH_ENABLE_MIDDLE_NAME'] and config['STORMPATH_REQUIRE_MIDDLE_NAME']:
-                self.middle_name.validators.append(InputRequired('Middle name is required.'))
+# The optional registration fields, along with their labels, and the error
+# shown when a required one is left empty.
+REGISTRATION_FIELDS = (
+    ('username', 'Username', 'Username is required.'),
+    ('given_name', 'First Name', 'First name is required.'),
+    ('middle_name', 'Middle Name', 'Middle name is required.'),
+    ('surname', 'Last Name', 'Surname is required.'),
+)
 
-            if config['STORMPATH_ENABLE_SURNAME'] and config['STORMPATH_REQUIRE_SURNAME']:
-                self.surname.validators.append(InputRequired('Surname is required.'))
+# RegistrationForm subclasses, keyed by the names of the fields they require.
+_registration_forms = {}
+
+
+def _is_required(config, name):
+    """
+    Return True if the given registration field is enabled and required.
+
+    :param dict config: The Flask app config.
+    :param str name: The field name (`given_name`, etc.).
+    :rtype: bool
+    """
+    setting = name.upper()
+
+    return bool(config['STORMPATH_ENABLE_%s' % setting] and config['STORMPATH_REQUIRE_%s' % setting])
+
+
+def get_registration_form(config):
+    """
+    Return the registration form class for the given configuration.
+
+    Each class is a subclass of :class:`RegistrationForm` whose required
+    fields (as configured by the `STORMPATH_ENABLE_*` and
+    `STORMPATH_REQUIRE_*` settings) carry an `InputRequired` validator.
+    Classes are built once, and shared by every app with the same settings, so
+    creating a form doesn't evaluate any settings, or modify any validators.
+
+    :param dict config: The Flask app config.
+    :rtype: class
+    """
+    required = tuple(name for name, label, message in REGISTRATION_FIELDS if _is_required(config, name))
+
+    form = _registration_forms.get(required)
+    if form is None:
+        fields = {}
+        for name, label, message in REGISTRATION_FIELDS:
+            if name in required:
+                field = StringField(label, validators=[InputRequired(message)])
+
+                # Keep the field in its original position.
+                field.creation_counter = getattr(RegistrationForm, name).creation_counter
+                fields[name] = field
+
+        form = _registration_forms[required] = type('RegistrationForm', (RegistrationForm,), fields)
+
+    return form
 
 
 class LoginForm(Form):
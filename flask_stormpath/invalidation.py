@@ -0,0 +1,371 @@
+"""
+An invalidation bus, which tells other processes to drop cached users.
+
+When a user is updated, deleted, or logged out in one process, their Account
+href is published on the bus.  Hrefs are batched, and broadcast to every other
+process listening on the same transport, which removes the user from its
+caches.
+
+A transport is any object with the following methods:
+
+    - `open()`: Start sending and receiving messages.
+    - `send(data)`: Broadcast a message (bytes) to every *other* listener.
+      Returns the number of listeners the message couldn't be delivered to.
+    - `receive(timeout)`: Return the next message (bytes) sent by another
+      listener, or None if there wasn't one within `timeout` seconds.
+    - `close()`: Stop sending and receiving messages.
+
+A transport may also have a `max_message_size` attribute: the size (in bytes)
+of the largest message it can send.  Batches are split to fit.
+
+Two transports are included: :class:`UnixDatagramTransport`, which connects
+processes on the same host, and :class:`LocalTransport`, an in-process stand-in
+which is handy for testing.  To broadcast across hosts, implement a transport on
+top of your message broker of choice.
+"""
+
+
+from errno import EAGAIN, ECONNREFUSED, ENOBUFS, ENOENT, EWOULDBLOCK
+from json import dumps, loads
+from os import geteuid, getpid, listdir, lstat, makedirs, remove
+from os.path import isdir, join
+from stat import S_ISDIR, S_IWGRP, S_IWOTH
+from socket import AF_UNIX, SOCK_DGRAM, error as socket_error, socket, timeout as socket_timeout
+from threading import Event, Lock, Thread
+from uuid import uuid4
+
+from six.moves.queue import Empty, Queue
+
+from .errors import ConfigurationError
+
+
+class UnixDatagramTransport(object):
+    """
+    A transport which connects every process on a host through unix domain
+    datagram sockets.
+
+    Each listener binds its own socket in `directory`, and messages are sent to
+    every other socket there.  Sockets left behind by processes which have
+    exited are removed.  Sends never block: if a listener's socket buffer is
+    full, the message is dropped for that listener.
+
+    :param str directory: The directory holding every listener's socket.  It
+        is created (readable only by this user) if it doesn't exist.
+    """
+    max_message_size = 65536
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = None
+        self._receiver = None
+        self._sender = None
+
+    def open(self):
+        if not isdir(self.directory):
+            try:
+                makedirs(self.directory, 0o700)
+            except OSError:
+                # Another process may have created it first.
+                if not isdir(self.directory):
+                    raise
+
+        # Anyone who can write to our directory can forge invalidations (or
+        # listen in on them), so refuse to use one we don't own outright.
+        info = lstat(self.directory)
+        if not S_ISDIR(info.st_mode) or info.st_uid != geteuid() or info.st_mode & (S_IWGRP | S_IWOTH):
+            raise ConfigurationError(
+                'The invalidation socket directory (%s) must be a directory '
+                'owned by this user, and not writable by anyone else.' % self.directory
+            )
+
+        self.path = join(self.directory, '%d-%s.sock' % (getpid(), uuid4().hex[:8]))
+
+        self._receiver = socket(AF_UNIX, SOCK_DGRAM)
+        self._receiver.bind(self.path)
+
+        self._sender = socket(AF_UNIX, SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+    def send(self, data):
+        failures = 0
+
+        for name in listdir(self.directory):
+            path = join(self.directory, name)
+            if not name.endswith('.sock') or path == self.path:
+                continue
+
+            try:
+                self._sender.sendto(data, path)
+            except socket_error as err:
+                if err.errno in (ECONNREFUSED, ENOENT):
+                    # Nobody is listening on this socket anymore.
+                    try:
+                        remove(path)
+                    except OSError:
+                        pass
+                elif err.errno in (EAGAIN, EWOULDBLOCK, ENOBUFS):
+                    failures += 1
+                else:
+                    raise
+
+        return failures
+
+    def receive(self, timeout):
+        self._receiver.settimeout(timeout)
+
+        try:
+            return self._receiver.recv(self.max_message_size)
+        except socket_timeout:
+            return None
+
+    def close(self):
+        for sock in (self._receiver, self._sender):
+            if sock is not None:
+                sock.close()
+
+        if self.path is not None:
+            try:
+                remove(self.path)
+            except OSError:
+                pass
+
+
+class LocalTransport(object):
+    """
+    An in-process transport: messages are delivered to every other
+    LocalTransport on the same channel.
+
+    :param str channel: (optional) The channel name.
+    """
+    _channels = {}
+    _channels_lock = Lock()
+
+    def __init__(self, channel='default'):
+        self.channel = channel
+        self._messages = Queue()
+
+    def open(self):
+        with self._channels_lock:
+            self._channels.setdefault(self.channel, []).append(self)
+
+    def send(self, data):
+        with self._channels_lock:
+            listeners = list(self._channels.get(self.channel, []))
+
+        for listener in listeners:
+            if listener is not self:
+                listener._messages.put(data)
+
+        return 0
+
+    def receive(self, timeout):
+        try:
+            return self._messages.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def close(self):
+        with self._channels_lock:
+            listeners = self._channels.get(self.channel, [])
+            if self in listeners:
+                listeners.remove(self)
+
+
+class InvalidationBus(object):
+    """
+    Publish invalidated Account hrefs to other processes, and receive theirs.
+
+    Published hrefs are queued, and sent in batches (at most every
+    `batch_interval`, or as soon as `max_batch` hrefs are queued) by a
+    background thread.  Another background thread receives batches sent by
+    other processes, and calls `callback(href)` for each href.
+
+    The transport is only opened (and the threads started) once the bus is
+    started, so creating a bus in a process which later forks is safe.
+
+    :param obj transport: The transport to use.
+    :param function callback: Called with each href received.
+    :param obj batch_interval: A `timedelta` object which controls how long
+        hrefs are queued before being sent.
+    :param int max_batch: The maximum number of hrefs to send in one message.
+    :param int queue_size: The maximum number of hrefs to queue.  Hrefs
+        published while the queue is full are dropped.
+    """
+    def __init__(self, transport, callback, batch_interval, max_batch, queue_size):
+        self.transport = transport
+        self.callback = callback
+        self.batch_interval = batch_interval.total_seconds()
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+
+        self.published = 0
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+        self._pending = []
+        self._pending_set = set()
+        self._pid = None
+        self._closed = Event()
+        self._wakeup = Event()
+        self._lock = Lock()
+
+    def start(self):
+        """
+        Open our transport, and start sending and receiving (if we haven't
+        already in this process).
+        """
+        if self._pid == getpid():
+            return
+
+        with self._lock:
+            if self._pid == getpid():
+                return
+
+            # If we were started before being forked, our threads didn't
+            # survive the fork, and hrefs queued by our parent aren't ours to
+            # send.
+            self._pending, self._pending_set = [], set()
+
+            self.transport.open()
+
+            for target in (self._send_loop, self._receive_loop):
+                thread = Thread(target=target)
+                thread.daemon = True
+                thread.start()
+
+            self._pid = getpid()
+
+    def publish(self, href):
+        """
+        Queue an Account href to be sent to every other process.
+
+        :param str href: The Account href.
+        """
+        self.start()
+
+        with self._lock:
+            if href in self._pending_set:
+                return
+
+            if len(self._pending) >= self.queue_size:
+                self.dropped += 1
+                return
+
+            self._pending.append(href)
+            self._pending_set.add(href)
+            self.published += 1
+
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+
+    def flush(self):
+        """Send every queued href now."""
+        with self._lock:
+            pending, self._pending, self._pending_set = self._pending, [], set()
+
+        for batch in self._batches(pending):
+            try:
+                failures = self.transport.send(self._encode(batch))
+            except Exception:
+                with self._lock:
+                    self.dropped += len(batch)
+                continue
+
+            with self._lock:
+                self.sent += len(batch)
+                self.dropped += failures * len(batch)
+
+    def _encode(self, batch):
+        """Return the message for a batch of hrefs."""
+        return dumps({'hrefs': batch}).encode('utf-8')
+
+    def _batches(self, hrefs):
+        """
+        Split hrefs into batches of at most `max_batch` hrefs, each of which
+        fits in a single message.  Hrefs too long to send at all are dropped.
+
+        :param list hrefs: The hrefs to send.
+        """
+        limit = getattr(self.transport, 'max_message_size', None)
+        empty = len(self._encode([]))
+        batch, size = [], empty
+
+        for href in hrefs:
+            # Each href costs its encoded length, plus a separator.
+            cost = len(dumps(href)) + 2
+
+            if limit is not None and empty + cost > limit:
+                with self._lock:
+                    self.dropped += 1
+                continue
+
+            if batch and (len(batch) >= self.max_batch or (limit is not None and size + cost > limit)):
+                yield batch
+                batch, size = [], empty
+
+            batch.append(href)
+            size += cost
+
+        if batch:
+            yield batch
+
+    def _send_loop(self):
+        """Send queued hrefs in batches, until we're closed."""
+        while not self._closed.is_set():
+            self._wakeup.wait(self.batch_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _receive_loop(self):
+        """Receive batches from other processes, until we're closed."""
+        while not self._closed.is_set():
+            try:
+                data = self.transport.receive(timeout=0.5)
+                if data is None:
+                    continue
+
+                hrefs = loads(data.decode('utf-8'))['hrefs']
+            except Exception:
+                if self._closed.is_set():
+                    return
+                continue
+
+            with self._lock:
+                self.received += len(hrefs)
+
+            for href in hrefs:
+                try:
+                    self.callback(href)
+                except Exception:
+                    pass
+
+    def close(self):
+        """Send every queued href, stop our threads, and close our transport."""
+        if self._pid != getpid():
+            return
+
+        self.flush()
+        self._closed.set()
+        self._wakeup.set()
+        self.transport.close()
+
+    @property
+    def stats(self):
+        """
+        Return statistics about the hrefs we've published and received.
+
+        :rtype: dict
+        :returns: The number of hrefs published, sent (handed to our
+            transport without an error), received, and dropped (either
+            because our queue was full, our transport failed, or another
+            process couldn't be reached), and the number currently queued.
+        """
+        with self._lock:
+            return {
+                'published': self.published,
+                'sent': self.sent,
+                'received': self.received,
+                'dropped': self.dropped,
+                'queued': len(self._pending),
+            }
@@ -1,13 +1,104 @@
 """Custom data models."""
 
 
+from copy import copy
+
 from flask import current_app
 from six import text_type
 
 from blinker import Namespace
 
 from stormpath.resources.account import Account
-from stormpath.resources.provider import Provider
+from stormpath.resources.base import Expansion
+from stormpath.resources.custom_data import CustomData
+from stormpath.resources.group import GroupList
+
+
+def get_expansion():
+    """
+    Build the expansion requested by the `STORMPATH_EXPAND` setting, which
+    lists the linked resources (`customData`, `groups`, etc.) to fetch along
+    with each account.
+
+    :rtype: obj
+    :returns: A Stormpath `Expansion`, or None if nothing should be expanded.
+    """
+    return current_app.stormpath_settings.expansion
+
+
+def _camel_case(name):
+    """
+    Convert an attribute name (`given_name`) to the name Stormpath uses for
+    the same field (`givenName`).
+
+    :param str name: The attribute name.
+    :rtype: str
+    """
+    words = name.split('_')
+
+    return words[0] + ''.join(word.capitalize() for word in words[1:])
+
+
+def _build_snapshot(user, group_hrefs):
+    """
+    Return a compact, JSON serializable snapshot of a user.
+
+    :param obj user: A :class:`User` or :class:`UserSnapshot`.
+    :param frozenset group_hrefs: The user's Group hrefs, or None if they
+        aren't known (in which case they're left out).
+    :rtype: dict
+    """
+    modified_at = user.modified_at
+    if hasattr(modified_at, 'isoformat'):
+        modified_at = modified_at.isoformat()
+
+    snapshot = {
+        'href': user.href,
+        'status': user.status,
+        'username': user.username,
+        'email': user.email,
+        'givenName': user.given_name,
+        'middleName': user.middle_name,
+        'surname': user.surname,
+        'modifiedAt': modified_at,
+    }
+    if group_hrefs is not None:
+        snapshot['groups'] = list(group_hrefs)
+
+    return snapshot
+
+
+def _copy_resource(resource):
+    """
+    Return a copy of a Stormpath resource, which can be modified without
+    affecting the original.  Its data (but not its linked resources) is
+    copied.
+
+    :param obj resource: The resource.
+    :rtype: obj
+    """
+    clone = resource.__class__.__new__(resource.__class__)
+    for name, value in resource.__dict__.items():
+        if isinstance(value, (dict, list, set)):
+            value = copy(value)
+
+        clone.__dict__[name] = value
+
+    return clone
+
+
+class _TrackedCustomData(CustomData):
+    """
+    Custom data which remembers whether it was modified in place, so its User
+    only saves it when it needs to.
+    """
+    def __setitem__(self, key, value):
+        super(_TrackedCustomData, self).__setitem__(key, value)
+        self.__dict__['_modified'] = True
+
+    def __delitem__(self, key):
+        super(_TrackedCustomData, self).__delitem__(key)
+        self.__dict__['_modified'] = True
 
 
 stormpath_signals = Namespace()
@@ -15,6 +106,11 @@ user_created = stormpath_signals.signal('user-created')
 user_updated = stormpath_signals.signal('user-updated')
 user_deleted = stormpath_signals.signal('user-deleted')
 
+# Sent (with the User as its sender, and no payload) whenever a user is
+# updated or deleted, so our own caches can drop the user without making
+# `user_updated` and `user_deleted` build their payloads.
+_user_changed = stormpath_signals.signal('user-changed')
+
 
 class User(Account):
     """
@@ -23,6 +119,16 @@ class User(Account):
     This can be used as described in the Stormpath Python SDK documentation:
     https://github.com/stormpath/stormpath-sdk-python
     """
+    # Users rebuilt from a session snapshot only hold a subset of the account's
+    # data, so they can't be saved or deleted.
+    _read_only = False
+    _group_hrefs = None
+
+    # The names of the fields which were modified since this user was loaded
+    # (or last saved), and whether their custom data was replaced since then.
+    _dirty_fields = frozenset()
+    _custom_data_assigned = False
+
     def __repr__(self):
         return u'User <"%s" ("%s")>' % (self.username or self.email, self.href)
 
@@ -56,21 +162,196 @@ class User(Account):
         """
         return True
 
+    def __setattr__(self, name, value):
+        """
+        Record which fields are modified, so only those are sent when the user
+        is saved.
+        """
+        if name in self.writable_attrs:
+            self.__dict__['_dirty_fields'] = self._dirty_fields | frozenset([name])
+
+        super(User, self).__setattr__(name, value)
+
+    @property
+    def custom_data(self):
+        """
+        This user's custom data.
+
+        Custom data is saved along with the next call to :meth:`save` only if
+        it was modified: assigned (`user.custom_data = {...}`), or changed in
+        place (`user.custom_data['key'] = value`, `del
+        user.custom_data['key']`, etc.).  Reading custom data doesn't mark it
+        as modified, so changes made inside a mutable value
+        (`user.custom_data['key'].append(value)`) are only noticed once the key
+        is assigned again.
+        """
+        # The SDK keeps loaded custom data in our __dict__ as well, so we
+        # can't tell an assigned value apart from a loaded one by looking
+        # there.
+        if self._custom_data_assigned:
+            return self.__dict__['custom_data']
+
+        custom_data = super(User, self).__getattr__('custom_data')
+        if type(custom_data) is CustomData:
+            custom_data.__class__ = _TrackedCustomData
+            custom_data.__dict__['_modified'] = False
+
+        self.__dict__['_custom_data'] = custom_data
+
+        return custom_data
+
+    @custom_data.setter
+    def custom_data(self, value):
+        self.__dict__['_custom_data_assigned'] = True
+        self.__dict__['custom_data'] = value
+
+    @property
+    def _custom_data_modified(self):
+        """True if this user's custom data was assigned or modified."""
+        if self._custom_data_assigned:
+            return True
+
+        custom_data = self.__dict__.get('_custom_data')
+
+        return bool(custom_data is not None and custom_data.__dict__.get('_modified'))
+
+    @property
+    def autosaves(self):
+        """
+        The linked resources saved along with this user: custom data is left
+        out unless it was modified.
+        """
+        autosaves = getattr(Account, 'autosaves', ())
+        if self._custom_data_modified:
+            return autosaves
+
+        return tuple(name for name in autosaves if name != 'custom_data')
+
+    @property
+    def is_dirty(self):
+        """
+        True if this user has unsaved modifications (to its fields, or its
+        custom data).
+        """
+        return bool(self._dirty_fields) or self._custom_data_modified
+
+    def _get_properties(self):
+        """
+        Return the properties sent to Stormpath when this user is saved: only
+        the fields which were modified since it was loaded.
+        """
+        properties = super(User, self)._get_properties()
+        if not self.href:
+            return properties
+
+        dirty = set(_camel_case(name) for name in self._dirty_fields)
+
+        return dict((key, value) for key, value in properties.items() if key in dirty)
+
+    def _mark_clean(self):
+        """Forget about every modification, once they've been saved."""
+        self.__dict__['_dirty_fields'] = frozenset()
+        self.__dict__['_custom_data_assigned'] = False
+
+        custom_data = self.__dict__.get('_custom_data')
+        if custom_data is not None:
+            custom_data.__dict__['_modified'] = False
+
+    def copy(self):
+        """
+        Return a copy of this user, which can be modified (and saved) without
+        affecting this one.  The user's custom data is copied along with it.
+
+        :rtype: obj
+        """
+        user = _copy_resource(self)
+
+        custom_data = self.__dict__.get('custom_data')
+        if isinstance(custom_data, CustomData):
+            custom_data = _copy_resource(custom_data)
+            user.__dict__['custom_data'] = custom_data
+            if '_custom_data' in self.__dict__:
+                user.__dict__['_custom_data'] = custom_data
+
+        return user
+
+    def get_group_hrefs(self):
+        """
+        Return the hrefs of every Group this user is a member of.
+
+        Users rebuilt from a session snapshot already know their group hrefs,
+        so this doesn't make any Stormpath API calls for them.
+
+        :rtype: frozenset
+        :returns: The Group hrefs.
+        """
+        if self._group_hrefs is not None:
+            return self._group_hrefs
+
+        return frozenset(group.href for group in self.groups)
+
+    def to_snapshot(self):
+        """
+        Return a compact, JSON serializable snapshot of this user.
+
+        The snapshot only holds the data needed to identify the user and check
+        their status and group membership.
+
+        :rtype: dict
+        :returns: The snapshot data.
+        """
+        return _build_snapshot(self, self.get_group_hrefs())
+
+    def _check_writable(self):
+        """
+        Raise an error if this user was rebuilt from a session snapshot.
+        """
+        if self._read_only:
+            raise ValueError('This user was loaded from a session snapshot and is read-only. Fetch the account from Stormpath before modifying it.')
+
     def save(self):
         """
-        Send signal after user is updated.
+        Save any modifications, and send signal after user is updated.
+
+        Only the modified fields are sent to Stormpath, and custom data is
+        only saved if it was modified.  If nothing was modified, this doesn't
+        make any Stormpath API calls (and no signal is sent).
+
+        The signal's `user` payload is only built if a receiver is connected.
         """
-        return_value = super(User, self).save()
-        user_updated.send(self, user=dict(self))
+        self._check_writable()
+        if not self.is_dirty:
+            return None
+
+        if self._dirty_fields:
+            return_value = super(User, self).save()
+        else:
+            # Only custom data was modified, so there's no need to send the
+            # account itself.
+            return_value = self.custom_data.save()
+
+        _user_changed.send(self)
+        if user_updated.has_receivers_for(self):
+            user_updated.send(self, user=dict(self))
+
+        # Building the signal payload reads every field (custom data
+        # included), so we only forget our modifications afterwards.
+        self._mark_clean()
+
         return return_value
 
     def delete(self):
         """
         Send signal after user is deleted.
+
+        The signal's `user` payload is only built if a receiver is connected.
         """
-        user_dict = dict(self)
+        self._check_writable()
+        user_dict = dict(self) if user_deleted.has_receivers_for(None) else None
         return_value = super(User, self).delete()
-        user_deleted.send(None, user=user_dict)
+        _user_changed.send(self)
+        if user_dict is not None:
+            user_deleted.send(None, user=user_dict)
         return return_value
 
     @classmethod
@@ -111,9 +392,12 @@ class User(Account):
             'middle_name': middle_name,
             'custom_data': custom_data,
             'status': status,
-        })
+        }, expand=get_expansion())
         _user.__class__ = User
-        user_created.send(self, user=dict(_user))
+        if user_created.has_receivers_for(self):
+            user_created.send(self, user=dict(_user))
+
+        _user._mark_clean()
 
         return _user
 
@@ -126,11 +410,54 @@ class User(Account):
         If something goes wrong, this will raise an exception -- most likely --
         a `StormpathError` (flask_stormpath.StormpathError).
         """
-        _user = current_app.stormpath_manager.application.authenticate_account(login, password).account
+        manager = current_app.stormpath_manager
+        expansion = get_expansion()
+
+        def authenticate():
+            # If no linked resources need to be expanded, we ask for the
+            # account to be returned along with the login result, instead of
+            # being fetched afterwards.
+            if expansion is None:
+                return manager.application.authenticate_account(
+                    login,
+                    password,
+                    expand = Expansion('account'),
+                ).account
+
+            # Expansions can't be nested, so we fetch the account (along with
+            # its linked resources) separately.
+            href = manager.application.authenticate_account(login, password).account.href
+            account = manager.client.accounts.get(href, expand=expansion)
+            account._ensure_data()
+
+            return account
+
+        _user = manager.call_api(authenticate)
         _user.__class__ = User
 
         return _user
 
+    @classmethod
+    def from_snapshot(self, snapshot):
+        """
+        Create a new, read-only User class given a snapshot built by
+        :meth:`to_snapshot`.
+
+        This doesn't make any Stormpath API calls.
+        """
+        properties = dict(snapshot)
+        group_hrefs = properties.pop('groups', None)
+
+        _user = User(current_app.stormpath_manager.client, properties=properties)
+        _user._read_only = True
+
+        # If the snapshot doesn't hold the user's group hrefs, they're fetched
+        # when they're first needed.
+        if group_hrefs is not None:
+            _user._group_hrefs = frozenset(group_hrefs)
+
+        return _user
+
     @classmethod
     def from_google(self, code):
         """
@@ -142,10 +469,13 @@ class User(Account):
         If something goes wrong, this will raise an exception -- most likely --
         a `StormpathError` (flask_stormpath.StormpathError).
         """
-        _user = current_app.stormpath_manager.application.get_provider_account(
+        from stormpath.resources.provider import Provider
+
+        manager = current_app.stormpath_manager
+        _user = manager.call_api(lambda: manager.application.get_provider_account(
             code = code,
             provider = Provider.GOOGLE,
-        )
+        ))
         _user.__class__ = User
 
         return _user
@@ -161,10 +491,196 @@ class User(Account):
         If something goes wrong, this will raise an exception -- most likely --
         a `StormpathError` (flask_stormpath.StormpathError).
         """
-        _user = current_app.stormpath_manager.application.get_provider_account(
+        from stormpath.resources.provider import Provider
+
+        manager = current_app.stormpath_manager
+        _user = manager.call_api(lambda: manager.application.get_provider_account(
             access_token = access_token,
             provider = Provider.FACEBOOK,
-        )
+        ))
         _user.__class__ = User
 
         return _user
+
+
+class UserSnapshot(object):
+    """
+    A compact, read-only copy of a :class:`User`.
+
+    A snapshot only holds the fields needed to identify a user and check their
+    status (plus their group hrefs, if known), so it takes a fraction of the
+    memory of a full User, which keeps the whole Stormpath resource graph
+    around.  This makes it suitable for caching large numbers of users.
+
+    Snapshots implement the same Flask-Login interface as :class:`User`.  The
+    first time a snapshot is modified (or any field it doesn't hold, like
+    `custom_data`, is read), it's promoted: the full User is fetched from
+    Stormpath, and every subsequent read and write goes to it.
+    """
+    FIELDS = ('href', 'status', 'username', 'email', 'given_name', 'middle_name', 'surname', 'modified_at')
+
+    __slots__ = FIELDS + ('group_hrefs', '_user')
+
+    def __init__(self, href, status, username=None, email=None, given_name=None, middle_name=None, surname=None, modified_at=None, group_hrefs=None):
+        object.__setattr__(self, 'href', href)
+        object.__setattr__(self, 'status', status)
+        object.__setattr__(self, 'username', username)
+        object.__setattr__(self, 'email', email)
+        object.__setattr__(self, 'given_name', given_name)
+        object.__setattr__(self, 'middle_name', middle_name)
+        object.__setattr__(self, 'surname', surname)
+        object.__setattr__(self, 'modified_at', modified_at)
+        object.__setattr__(self, 'group_hrefs', group_hrefs)
+        object.__setattr__(self, '_user', None)
+
+    @classmethod
+    def from_user(self, user, group_hrefs=None):
+        """
+        Create a new UserSnapshot given a :class:`User`.
+
+        This doesn't make any Stormpath API calls: the user's group hrefs are
+        only copied if they're given, or if the user already knows them.
+
+        :param obj user: The User.
+        :param frozenset group_hrefs: (optional) The user's Group hrefs.
+        """
+        return UserSnapshot(
+            href = user.href,
+            status = user.status,
+            username = user.username,
+            email = user.email,
+            given_name = user.given_name,
+            middle_name = user.middle_name,
+            surname = user.surname,
+            modified_at = user.modified_at,
+            group_hrefs = user._group_hrefs if group_hrefs is None else group_hrefs,
+        )
+
+    def copy(self):
+        """
+        Return an unpromoted copy of this snapshot.
+
+        :rtype: obj
+        """
+        return UserSnapshot(*(getattr(self, name) for name in self.FIELDS + ('group_hrefs',)))
+
+    def __repr__(self):
+        return u'UserSnapshot <"%s" ("%s")>' % (self.username or self.email, self.href)
+
+    def get_id(self):
+        """
+        Return the unique user identifier (in our case, the Stormpath resource
+        href).
+        """
+        return text_type(self.href)
+
+    @property
+    def is_active(self):
+        """
+        A user account is active if, and only if, their account status is
+        'ENABLED'.
+        """
+        return self.status == 'ENABLED'
+
+    @property
+    def is_anonymous(self):
+        """
+        We don't support anonymous users, so this is always False.
+        """
+        return False
+
+    @property
+    def is_authenticated(self):
+        """
+        All users will always be authenticated, so this will always return
+        True.
+        """
+        return True
+
+    @property
+    def is_promoted(self):
+        """True if the full User has been fetched."""
+        return self._user is not None
+
+    def promote(self):
+        """
+        Fetch the full User this snapshot was taken from (if we haven't
+        already).
+
+        :rtype: obj
+        :returns: The :class:`User`.
+        """
+        if self._user is None:
+            manager = current_app.stormpath_manager
+            object.__setattr__(self, '_user', manager.call_api(manager._get_account, self.href))
+
+        return self._user
+
+    def __getattr__(self, name):
+        # This is only called for attributes we don't hold.
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        return getattr(self.promote(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.promote(), name, value)
+        if name in self.FIELDS:
+            object.__setattr__(self, name, value)
+
+    def get_group_hrefs(self):
+        """
+        Return the hrefs of every Group this user is a member of.
+
+        If the snapshot doesn't know them, they're taken from the group cache
+        (if enabled), or else fetched from the account's groups -- without
+        fetching the full User.
+
+        :rtype: frozenset
+        :returns: The Group hrefs.
+        """
+        if self.group_hrefs is not None:
+            return self.group_hrefs
+
+        if self._user is not None:
+            return self._user.get_group_hrefs()
+
+        manager = current_app.stormpath_manager
+        if manager.group_cache is not None:
+            hrefs = manager.group_cache.get(self.href)
+            if hrefs is not None:
+                return hrefs
+
+        groups = GroupList(manager.client, href='%s/groups' % self.href)
+
+        return manager.call_api(lambda: frozenset(group.href for group in groups))
+
+    def to_snapshot(self):
+        """
+        Return a compact, JSON serializable snapshot of this user (see
+        :meth:`User.to_snapshot`).
+
+        The snapshot is built from our own fields, so this doesn't make any
+        Stormpath API calls.  If we don't know the user's group hrefs, they're
+        left out of the snapshot.
+
+        :rtype: dict
+        :returns: The snapshot data.
+        """
+        return _build_snapshot(self, self.group_hrefs)
+
+    def save(self):
+        """
+        Save any modifications.  If this snapshot was never modified, this
+        doesn't make any Stormpath API calls.
+        """
+        if self._user is None:
+            return None
+
+        return self._user.save()
+
+    def delete(self):
+        """
+        Delete this user.
+        """
+        return self.promote().delete()
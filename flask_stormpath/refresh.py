@@ -0,0 +1,119 @@
+"""A background worker pool used to refresh cached data."""
+
+
+from threading import Lock, Thread
+from time import time
+
+from six.moves.queue import Queue
+
+
+class Refresher(object):
+    """
+    A small pool of background threads which run refresh tasks.
+
+    Each task is identified by a key (an Account href, for instance).  A task
+    which is already queued (or running) for a key isn't queued again, so
+    scheduling the same refresh repeatedly is cheap.
+
+    The worker threads are only started once the first task is scheduled, so
+    creating a Refresher in a process which later forks is safe.
+
+    :param int threads: The maximum number of tasks to run concurrently.
+    """
+    def __init__(self, threads):
+        self.threads = threads
+        self.scheduled = 0
+        self.refreshed = 0
+        self.failed = 0
+
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._pending = set()
+        self._queue = Queue()
+        self._workers = []
+        self._lock = Lock()
+
+    def schedule(self, key, func):
+        """
+        Run `func` in the background, unless a task for `key` is already
+        pending.
+
+        :param str key: The task key.
+        :param function func: A function which takes no arguments.  Any
+            exception it raises is counted (and otherwise ignored).
+        :rtype: bool
+        :returns: True if the task was scheduled.
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+
+            self._pending.add(key)
+            self.scheduled += 1
+
+            if not self._workers:
+                for _ in range(self.threads):
+                    worker = Thread(target=self._work)
+                    worker.daemon = True
+                    worker.start()
+                    self._workers.append(worker)
+
+        self._queue.put((key, func))
+
+        return True
+
+    def is_pending(self, key):
+        """
+        Return True if a task for `key` is queued or running.
+
+        :param str key: The task key.
+        :rtype: bool
+        """
+        with self._lock:
+            return key in self._pending
+
+    def _work(self):
+        """Run queued tasks, forever."""
+        while True:
+            key, func = self._queue.get()
+            start = time()
+
+            try:
+                func()
+                failed = False
+            except Exception:
+                failed = True
+
+            latency = time() - start
+
+            with self._lock:
+                self._pending.discard(key)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.refreshed += 1
+
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+
+    @property
+    def stats(self):
+        """
+        Return statistics about our tasks.
+
+        :rtype: dict
+        :returns: The number of tasks waiting to run (`queue_depth`), the number
+            scheduled, refreshed (completed), and failed, and the average and
+            maximum time (in seconds) tasks took to run.
+        """
+        with self._lock:
+            finished = self.refreshed + self.failed
+
+            return {
+                'queue_depth': self._queue.qsize(),
+                'scheduled': self.scheduled,
+                'refreshed': self.refreshed,
+                'failed': self.failed,
+                'latency_avg': self._latency_total / finished if finished else 0.0,
+                'latency_max': self._latency_max,
+            }
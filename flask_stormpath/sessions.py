@@ -0,0 +1,65 @@
+"""
+Helpers for storing signed account snapshots in the user's session.
+
+When session snapshots are enabled, a compact, signed copy of the user's
+account is stored in the session at login time.  This lets us rebuild the
+current user on subsequent requests without talking to Stormpath at all, until
+the snapshot becomes too old.
+"""
+
+
+from flask import current_app, session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+
+SESSION_KEY = 'stormpath_snapshot'
+
+
+def _get_serializer():
+    """
+    Return a serializer which signs snapshots with the app's secret key.
+
+    :rtype: obj
+    :returns: An `itsdangerous.URLSafeTimedSerializer` object.
+    """
+    return URLSafeTimedSerializer(current_app.secret_key, salt='flask-stormpath-snapshot')
+
+
+def save_snapshot(user):
+    """
+    Store a signed snapshot of the given user in the session.
+
+    :param obj user: A :class:`flask_stormpath.models.User` object.
+    """
+    session[SESSION_KEY] = _get_serializer().dumps(user.to_snapshot())
+
+
+def load_snapshot(account_href, max_age):
+    """
+    Load a user's snapshot from the session.
+
+    :param str account_href: The href of the Account we're loading.
+    :param obj max_age: A `timedelta` object which controls how old a snapshot
+        can be before we consider it stale.
+    :rtype: dict
+    :returns: The snapshot data, or None if there is no valid, fresh snapshot
+        for this account.
+    """
+    token = session.get(SESSION_KEY)
+    if not token:
+        return None
+
+    try:
+        snapshot = _get_serializer().loads(token, max_age=max_age.total_seconds())
+    except BadSignature:
+        return None
+
+    if snapshot.get('href') != account_href:
+        return None
+
+    return snapshot
+
+
+def clear_snapshot():
+    """Remove the snapshot (if any) from the session."""
+    session.pop(SESSION_KEY, None)
@@ -2,7 +2,14 @@
 
 
 from datetime import timedelta
+from hashlib import sha1
+from os.path import join
+from tempfile import gettempdir
 
+from six import string_types
+from stormpath.resources.base import Expansion
+
+from .dispatch import BACKPRESSURE_POLICIES
 from .errors import ConfigurationError
 
 
@@ -20,6 +27,16 @@ def init_settings(config):
     config.setdefault('STORMPATH_API_KEY_FILE', None)
     config.setdefault('STORMPATH_APPLICATION', None)
 
+    # The Stormpath API to talk to.  By default, the Stormpath SDK's (the
+    # public Stormpath API) is used.
+    config.setdefault('STORMPATH_BASE_URL', None)
+
+    # If the href of the Stormpath Application is known, it'll be fetched
+    # directly instead of searched for by name.  Otherwise, the href found by
+    # searching can be cached in a local file, for other processes to use.
+    config.setdefault('STORMPATH_APPLICATION_HREF', None)
+    config.setdefault('STORMPATH_APPLICATION_HREF_CACHE', None)
+
     # Which fields should be displayed when registering new users?
     config.setdefault('STORMPATH_ENABLE_FACEBOOK', False)
     config.setdefault('STORMPATH_ENABLE_GOOGLE', False)
@@ -74,6 +91,101 @@ def init_settings(config):
     # Cache configuration.
     config.setdefault('STORMPATH_CACHE', None)
 
+    # HTTP configuration.  These settings control the pool of persistent
+    # connections used to talk to the Stormpath API, and the default timeouts
+    # applied to every call (None means no timeout).
+    config.setdefault('STORMPATH_HTTP_POOL_SIZE', 10)
+    config.setdefault('STORMPATH_HTTP_KEEP_ALIVE', True)
+    config.setdefault('STORMPATH_HTTP_CONNECT_TIMEOUT', None)
+    config.setdefault('STORMPATH_HTTP_READ_TIMEOUT', None)
+
+    # Should we create the Stormpath Client, resolve the Stormpath Application,
+    # and compile our templates when the extension is initialized (instead of
+    # when the first request needs them)?
+    config.setdefault('STORMPATH_EAGER_INIT', False)
+
+    # User cache configuration.  If enabled, loaded users will be cached in
+    # local memory (keyed by their Account href) across requests.
+    config.setdefault('STORMPATH_USER_CACHE_ENABLED', False)
+    config.setdefault('STORMPATH_USER_CACHE_SIZE', 1000)
+    config.setdefault('STORMPATH_USER_CACHE_TTL', timedelta(minutes=5))
+
+    # Should the user cache hold compact, read-only snapshots of each user
+    # (promoted to a full User when modified) instead of full User objects?
+    config.setdefault('STORMPATH_USER_CACHE_SNAPSHOTS', False)
+
+    # Refresh-ahead configuration.  If enabled, cached users which are read
+    # when they're within REFRESH_AHEAD (plus a random jitter of up to
+    # REFRESH_JITTER) of expiring are re-fetched in the background, using up to
+    # REFRESH_THREADS threads.
+    config.setdefault('STORMPATH_USER_CACHE_REFRESH_AHEAD', None)
+    config.setdefault('STORMPATH_USER_CACHE_REFRESH_JITTER', timedelta(seconds=10))
+    config.setdefault('STORMPATH_REFRESH_THREADS', 2)
+
+    # Group cache configuration.  If enabled, each user's group memberships
+    # will be cached in local memory across requests.
+    config.setdefault('STORMPATH_GROUP_CACHE_ENABLED', False)
+    config.setdefault('STORMPATH_GROUP_CACHE_SIZE', 1000)
+    config.setdefault('STORMPATH_GROUP_CACHE_TTL', timedelta(minutes=1))
+
+    # How long to remember that a Group name used by `groups_required` doesn't
+    # match any groups, before searching for it again.
+    config.setdefault('STORMPATH_UNKNOWN_GROUP_TTL', timedelta(seconds=30))
+
+    # Session snapshot configuration.  If enabled, a signed snapshot of the
+    # user's account is stored in their session, and used to load the user
+    # (without any Stormpath API calls) until it's older than the max age.
+    config.setdefault('STORMPATH_SESSION_SNAPSHOT_ENABLED', False)
+    config.setdefault('STORMPATH_SESSION_SNAPSHOT_MAX_AGE', timedelta(minutes=5))
+
+    # Circuit breaker configuration.  If enabled, Stormpath API calls are made
+    # through a circuit breaker, which opens (and stops calling Stormpath) once
+    # too many recent calls have failed or been slow.  While it's open, users
+    # and group memberships are served from the user and group caches, even if
+    # they're up to MAX_STALENESS old.
+    config.setdefault('STORMPATH_CIRCUIT_BREAKER_ENABLED', False)
+    config.setdefault('STORMPATH_CIRCUIT_BREAKER_WINDOW', 20)
+    config.setdefault('STORMPATH_CIRCUIT_BREAKER_MIN_CALLS', 5)
+    config.setdefault('STORMPATH_CIRCUIT_BREAKER_ERROR_RATE', 0.5)
+    config.setdefault('STORMPATH_CIRCUIT_BREAKER_SLOW_CALL', timedelta(seconds=5))
+    config.setdefault('STORMPATH_CIRCUIT_BREAKER_RESET_TIMEOUT', timedelta(seconds=30))
+    config.setdefault('STORMPATH_CIRCUIT_BREAKER_MAX_STALENESS', timedelta(hours=1))
+
+    # Invalidation bus configuration.  If enabled, the hrefs of users who are
+    # updated, deleted, or logged out are broadcast to every other process, so
+    # they can drop those users from their caches.  The transport is a function
+    # which returns a transport object (by default, unix domain sockets in
+    # SOCKET_DIR are used, which connect every process on the same host).  The
+    # default SOCKET_DIR is specific to our Stormpath Application, so apps
+    # using different Applications never invalidate each other's users.
+    application = config['STORMPATH_APPLICATION_HREF'] or config.get('STORMPATH_APPLICATION') or ''
+    config.setdefault('STORMPATH_INVALIDATION_ENABLED', False)
+    config.setdefault('STORMPATH_INVALIDATION_TRANSPORT', None)
+    config.setdefault('STORMPATH_INVALIDATION_SOCKET_DIR', join(
+        gettempdir(),
+        'flask-stormpath-invalidation-%s' % sha1(application.encode('utf-8')).hexdigest()[:16],
+    ))
+    config.setdefault('STORMPATH_INVALIDATION_BATCH_INTERVAL', timedelta(milliseconds=50))
+    config.setdefault('STORMPATH_INVALIDATION_MAX_BATCH', 100)
+    config.setdefault('STORMPATH_INVALIDATION_QUEUE_SIZE', 10000)
+
+    # How should receivers connected with `StormpathManager.connect_async` be
+    # run?  They're run by a pool of background threads, each with its own
+    # (bounded) queue.  When a queue is full, signals are either delivered once
+    # there's room ('block'), dropped ('drop'), or delivered right away in the
+    # sending thread ('caller').
+    config.setdefault('STORMPATH_SIGNAL_THREADS', 2)
+    config.setdefault('STORMPATH_SIGNAL_QUEUE_SIZE', 1000)
+    config.setdefault('STORMPATH_SIGNAL_BACKPRESSURE', 'block')
+
+    # Which linked resources (customData, groups, groupMemberships, etc.)
+    # should be fetched along with each account, in the same API call?
+    config.setdefault('STORMPATH_EXPAND', [])
+
+    # Should users be able to authenticate by sending a Stormpath access token
+    # (as a bearer token) instead of a session cookie?
+    config.setdefault('STORMPATH_ENABLE_TOKEN_AUTH', False)
+
     # Configure templates.  These template settings control which templates are
     # used to render the Flask-Stormpath views.
     config.setdefault('STORMPATH_BASE_TEMPLATE', 'flask_stormpath/base.html')
@@ -85,6 +197,10 @@ def init_settings(config):
     config.setdefault('STORMPATH_FORGOT_PASSWORD_COMPLETE_TEMPLATE', 'flask_stormpath/forgot_complete.html')
     config.setdefault('STORMPATH_SETTINGS_TEMPLATE', 'flask_stormpath/settings.html')
 
+    # A list of endpoints whose templates should never load the current user
+    # (the `user` template variable is always an anonymous user for these).
+    config.setdefault('STORMPATH_USER_CONTEXT_EXEMPT', [])
+
     # Social login configuration.
     config.setdefault('STORMPATH_SOCIAL', {})
 
@@ -113,7 +229,7 @@ def check_settings(config):
     ):
         raise ConfigurationError('You must define your Stormpath credentials.')
 
-    if not config['STORMPATH_APPLICATION']:
+    if not (config['STORMPATH_APPLICATION'] or config['STORMPATH_APPLICATION_HREF']):
         raise ConfigurationError('You must define your Stormpath application.')
 
     if config['STORMPATH_ENABLE_GOOGLE']:
@@ -140,3 +256,128 @@ def check_settings(config):
 
     if config['STORMPATH_COOKIE_DURATION'] and not isinstance(config['STORMPATH_COOKIE_DURATION'], timedelta):
         raise ConfigurationError('STORMPATH_COOKIE_DURATION must be a timedelta object.')
+
+    if not isinstance(config['STORMPATH_HTTP_POOL_SIZE'], int) or config['STORMPATH_HTTP_POOL_SIZE'] < 1:
+        raise ConfigurationError('STORMPATH_HTTP_POOL_SIZE must be a positive integer.')
+
+    for timeout in ('CONNECT', 'READ'):
+        if config['STORMPATH_HTTP_%s_TIMEOUT' % timeout] and not isinstance(config['STORMPATH_HTTP_%s_TIMEOUT' % timeout], timedelta):
+            raise ConfigurationError('STORMPATH_HTTP_%s_TIMEOUT must be a timedelta object.' % timeout)
+
+    for cache in ('USER', 'GROUP'):
+        if not config['STORMPATH_%s_CACHE_ENABLED' % cache]:
+            continue
+
+        if not isinstance(config['STORMPATH_%s_CACHE_SIZE' % cache], int) or config['STORMPATH_%s_CACHE_SIZE' % cache] < 1:
+            raise ConfigurationError('STORMPATH_%s_CACHE_SIZE must be a positive integer.' % cache)
+
+        if not isinstance(config['STORMPATH_%s_CACHE_TTL' % cache], timedelta):
+            raise ConfigurationError('STORMPATH_%s_CACHE_TTL must be a timedelta object.' % cache)
+
+    if not isinstance(config['STORMPATH_UNKNOWN_GROUP_TTL'], timedelta):
+        raise ConfigurationError('STORMPATH_UNKNOWN_GROUP_TTL must be a timedelta object.')
+
+    if config['STORMPATH_USER_CACHE_REFRESH_AHEAD'] and not isinstance(config['STORMPATH_USER_CACHE_REFRESH_AHEAD'], timedelta):
+        raise ConfigurationError('STORMPATH_USER_CACHE_REFRESH_AHEAD must be a timedelta object.')
+
+    if config['STORMPATH_USER_CACHE_REFRESH_JITTER'] and not isinstance(config['STORMPATH_USER_CACHE_REFRESH_JITTER'], timedelta):
+        raise ConfigurationError('STORMPATH_USER_CACHE_REFRESH_JITTER must be a timedelta object.')
+
+    if not isinstance(config['STORMPATH_REFRESH_THREADS'], int) or config['STORMPATH_REFRESH_THREADS'] < 1:
+        raise ConfigurationError('STORMPATH_REFRESH_THREADS must be a positive integer.')
+
+    if config['STORMPATH_CIRCUIT_BREAKER_ENABLED']:
+        for setting in ('WINDOW', 'MIN_CALLS'):
+            if not isinstance(config['STORMPATH_CIRCUIT_BREAKER_%s' % setting], int) or config['STORMPATH_CIRCUIT_BREAKER_%s' % setting] < 1:
+                raise ConfigurationError('STORMPATH_CIRCUIT_BREAKER_%s must be a positive integer.' % setting)
+
+        if not isinstance(config['STORMPATH_CIRCUIT_BREAKER_ERROR_RATE'], (int, float)) or not 0 < config['STORMPATH_CIRCUIT_BREAKER_ERROR_RATE'] <= 1:
+            raise ConfigurationError('STORMPATH_CIRCUIT_BREAKER_ERROR_RATE must be a number between 0 and 1.')
+
+        if config['STORMPATH_CIRCUIT_BREAKER_SLOW_CALL'] and not isinstance(config['STORMPATH_CIRCUIT_BREAKER_SLOW_CALL'], timedelta):
+            raise ConfigurationError('STORMPATH_CIRCUIT_BREAKER_SLOW_CALL must be a timedelta object.')
+
+        for setting in ('RESET_TIMEOUT', 'MAX_STALENESS'):
+            if not isinstance(config['STORMPATH_CIRCUIT_BREAKER_%s' % setting], timedelta):
+                raise ConfigurationError('STORMPATH_CIRCUIT_BREAKER_%s must be a timedelta object.' % setting)
+
+    if config['STORMPATH_INVALIDATION_ENABLED']:
+        if config['STORMPATH_INVALIDATION_TRANSPORT'] and not callable(config['STORMPATH_INVALIDATION_TRANSPORT']):
+            raise ConfigurationError('STORMPATH_INVALIDATION_TRANSPORT must be a function which returns a transport.')
+
+        if not isinstance(config['STORMPATH_INVALIDATION_BATCH_INTERVAL'], timedelta):
+            raise ConfigurationError('STORMPATH_INVALIDATION_BATCH_INTERVAL must be a timedelta object.')
+
+        for setting in ('MAX_BATCH', 'QUEUE_SIZE'):
+            if not isinstance(config['STORMPATH_INVALIDATION_%s' % setting], int) or config['STORMPATH_INVALIDATION_%s' % setting] < 1:
+                raise ConfigurationError('STORMPATH_INVALIDATION_%s must be a positive integer.' % setting)
+
+    for setting in ('THREADS', 'QUEUE_SIZE'):
+        if not isinstance(config['STORMPATH_SIGNAL_%s' % setting], int) or config['STORMPATH_SIGNAL_%s' % setting] < 1:
+            raise ConfigurationError('STORMPATH_SIGNAL_%s must be a positive integer.' % setting)
+
+    if config['STORMPATH_SIGNAL_BACKPRESSURE'] not in BACKPRESSURE_POLICIES:
+        raise ConfigurationError('STORMPATH_SIGNAL_BACKPRESSURE must be one of: %s.' % ', '.join(BACKPRESSURE_POLICIES))
+
+    if not isinstance(config['STORMPATH_EXPAND'], (list, tuple)) or not all(isinstance(name, string_types) for name in config['STORMPATH_EXPAND']):
+        raise ConfigurationError('STORMPATH_EXPAND must be a list of resource names.')
+
+    if config['STORMPATH_SESSION_SNAPSHOT_ENABLED'] and not isinstance(config['STORMPATH_SESSION_SNAPSHOT_MAX_AGE'], timedelta):
+        raise ConfigurationError('STORMPATH_SESSION_SNAPSHOT_MAX_AGE must be a timedelta object.')
+
+
+class Settings(object):
+    """
+    An immutable, compiled copy of the Flask-Stormpath settings.
+
+    Every `STORMPATH_*` setting is available as an attribute, named after the
+    setting without its prefix, in lowercase (`STORMPATH_REDIRECT_URL` is
+    `settings.redirect_url`).  Values which would otherwise be derived on
+    every request are computed once:
+
+        - `registration_redirect_url`: Where users are redirected after
+          registering.
+        - `registration_form`: The registration form class (see
+          :func:`flask_stormpath.forms.get_registration_form`).  This is
+          built the first time it's used, so our forms (and WTForms) aren't
+          imported by apps which never render them.
+        - `expansion`: The Stormpath `Expansion` requested by
+          `STORMPATH_EXPAND`, or None.
+        - `user_context_exempt`: A frozenset of `STORMPATH_USER_CONTEXT_EXEMPT`.
+
+    Settings are compiled after they've been checked.  To change them, use
+    :meth:`flask_stormpath.StormpathManager.reload_settings`.
+
+    :param dict config: The Flask app config.
+    """
+    def __init__(self, config):
+        config = dict((key, value) for key, value in config.items() if key.startswith('STORMPATH_'))
+        values = dict((key[len('STORMPATH_'):].lower(), value) for key, value in config.items())
+
+        values['registration_redirect_url'] = config.get('STORMPATH_REGISTRATION_REDIRECT_URL', config['STORMPATH_REDIRECT_URL'])
+        values['_config'] = config
+        values['expansion'] = Expansion(*config['STORMPATH_EXPAND']) if config['STORMPATH_EXPAND'] else None
+        values['user_context_exempt'] = frozenset(config['STORMPATH_USER_CONTEXT_EXEMPT'])
+
+        self.__dict__.update(values)
+
+    @property
+    def registration_form(self):
+        """
+        The registration form class for these settings.
+
+        :rtype: class
+        """
+        form = self.__dict__.get('_registration_form')
+        if form is None:
+            from .forms import get_registration_form
+
+            form = self.__dict__['_registration_form'] = get_registration_form(self._config)
+
+        return form
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Settings are read-only. Use StormpathManager.reload_settings to change them.')
+
+    def __delattr__(self, name):
+        raise AttributeError('Settings are read-only. Use StormpathManager.reload_settings to change them.')
@@ -0,0 +1,434 @@
+"""
+A cache shared between processes on the same host, via a memory-mapped file.
+
+The file is split into fixed-size slots, which are grouped into small sets (a
+set-associative cache): a key can only live in one of the slots of the set its
+hash maps to, and when the set is full, its least recently used slot is
+evicted.
+
+Reads are lock-free: every slot carries a sequence number which writers make
+odd while they're modifying the slot, and bump again once they're done, so
+readers can detect (and retry) torn reads.  Writers are serialized with an
+exclusive `flock` on the file.
+
+This module relies on `fcntl`, so it's only available on Unix platforms.
+"""
+
+
+from fcntl import LOCK_EX, LOCK_UN, flock
+from json import dumps, loads
+from mmap import mmap
+from os import O_CREAT, O_RDWR, close, fstat, ftruncate, getpid, lseek, read, remove, rename, stat, write
+from os import open as open_fd
+from os.path import abspath, dirname
+from struct import Struct
+from tempfile import mkstemp
+from threading import Lock
+from time import sleep, time
+from zlib import crc32
+
+from stormpath.cache.entry import CacheEntry
+
+
+MAGIC = b'FSPCACHE'
+VERSION = 1
+
+# The file header: magic, version, number of slots, and slot size.
+HEADER = Struct('<8sIII')
+HEADER_SIZE = 64
+
+# Each slot starts with: a sequence number, the key hash, the time it was last
+# used, the key length, and the value length.  The key and value follow.
+SLOT = Struct('<IIdHI')
+SLOT_SEQ = Struct('<I')
+SLOT_FIELDS = Struct('<IdHI')
+SLOT_LAST_USED = Struct('<d')
+
+# The number of slots in each set.
+WAYS = 8
+
+# How many times a reader retries a slot which is being written to.  Readers
+# yield to other threads between retries, so the writer can finish.
+READ_RETRIES = 100
+
+# The longest key a slot can describe (its length is stored in an unsigned
+# short).
+MAX_KEY_LENGTH = 0xffff
+
+
+class MmapCache(object):
+    """
+    A size-bounded cache of bytes, shared by every process which opens the
+    same file.
+
+    Every process must use the same `slots` and `slot_size` for a given file.
+    If the file was created with a different layout, it's replaced with an
+    empty one.
+
+    :param str path: The path of the cache file.  It's created if it doesn't
+        exist.
+    :param int slots: The number of slots (rounded up to a multiple of 8).
+    :param int slot_size: The size of each slot, in bytes.  Entries whose key
+        and value don't fit in a slot aren't cached.
+    """
+    def __init__(self, path, slots=4096, slot_size=4096):
+        self.path = path
+        self.slots = -(-slots // WAYS) * WAYS
+        self.slot_size = slot_size
+        self.capacity = slot_size - SLOT.size
+        self.size = HEADER_SIZE + self.slots * slot_size
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversize = 0
+
+        self._sets = self.slots // WAYS
+        self._fd = self._open()
+        self._pid = getpid()
+        self._lock = Lock()
+
+        # Stats are updated by lock-free readers too, so they get their own
+        # lock: readers must never wait on a writer's flock.
+        self._stats_lock = Lock()
+
+        self._mm = mmap(self._fd, self.size)
+
+    def _open(self):
+        """
+        Open our cache file, and return its file descriptor.
+
+        If the file has a different layout, a new file is created alongside
+        it, and renamed over it.  Other processes which still have the old
+        file mapped keep using it (safely) until they re-open it; truncating
+        it in place would crash them as soon as they touched a page past its
+        new end.
+
+        :rtype: int
+        """
+        header = HEADER.pack(MAGIC, VERSION, self.slots, self.slot_size)
+
+        while True:
+            fd = open_fd(self.path, O_RDWR | O_CREAT, 0o600)
+            flock(fd, LOCK_EX)
+            result = None
+            try:
+                result = self._check_layout(fd, header)
+            finally:
+                flock(fd, LOCK_UN)
+                if result is not fd:
+                    close(fd)
+
+            if result is not None:
+                return result
+
+    def _check_layout(self, fd, header):
+        """
+        Check the layout of our (locked) cache file, replacing it if it's
+        wrong.
+
+        :param int fd: The cache file's descriptor.
+        :param bytes header: The header our layout needs.
+        :rtype: int
+        :returns: `fd` if the layout is right, the descriptor of the new file
+            if it was replaced, or None if another process replaced the file
+            while we were waiting for its lock (so it must be re-opened).
+        """
+        info = fstat(fd)
+        try:
+            current = stat(self.path)
+        except OSError:
+            return None
+
+        if (current.st_dev, current.st_ino) != (info.st_dev, info.st_ino):
+            return None
+
+        lseek(fd, 0, 0)
+        if info.st_size == self.size and read(fd, HEADER.size) == header:
+            return fd
+
+        new_fd, temp_path = mkstemp(dir=dirname(abspath(self.path)))
+        try:
+            ftruncate(new_fd, self.size)
+            write(new_fd, header)
+            rename(temp_path, self.path)
+        except Exception:
+            close(new_fd)
+            remove(temp_path)
+            raise
+
+        return new_fd
+
+    def __len__(self):
+        return sum(1 for offset in self._offsets() if SLOT.unpack_from(self._mm, offset)[3])
+
+    def _offsets(self, key_hash=None):
+        """
+        Return the offsets of every slot, or of the slots in the set the given
+        key hash maps to.
+
+        :param int key_hash: (optional) A key hash.
+        :rtype: list
+        """
+        if key_hash is None:
+            return range(HEADER_SIZE, self.size, self.slot_size)
+
+        start = HEADER_SIZE + (key_hash % self._sets) * WAYS * self.slot_size
+
+        return range(start, start + WAYS * self.slot_size, self.slot_size)
+
+    def _write_lock(self):
+        """
+        Return a lock which serializes writers, across threads and processes.
+
+        Our `flock` is tied to our file descriptor, which a forked child
+        shares with its parent, so children re-open the file first (and close
+        the descriptor they inherited, which doesn't release the parent's
+        lock).
+        """
+        self._check_fork()
+
+        return _WriteLock(self._lock, self._fd)
+
+    def _check_fork(self):
+        """
+        If we've been forked, re-open our file, and replace our locks (another
+        thread may have held them when we were forked).  A child's stats start
+        from zero.
+        """
+        if self._pid != getpid():
+            inherited, self._fd = self._fd, open_fd(self.path, O_RDWR)
+            close(inherited)
+            self._pid = getpid()
+            self._lock = Lock()
+            self._stats_lock = Lock()
+            self.hits = self.misses = self.evictions = self.oversize = 0
+
+    def _count(self, name):
+        """
+        Add one to one of our stats.
+
+        :param str name: The stat's name, eg: `hits`.
+        """
+        self._check_fork()
+
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or None.
+
+        :param str key: The cache key.
+        :rtype: bytes
+        """
+        key = key.encode('utf-8')
+        key_hash = crc32(key) & 0xffffffff
+        mm = self._mm
+
+        for offset in self._offsets(key_hash):
+            for _ in range(READ_RETRIES):
+                seq, slot_hash, _, key_length, value_length = SLOT.unpack_from(mm, offset)
+                if seq & 1:
+                    sleep(0)
+                    continue
+
+                if slot_hash != key_hash or key_length != len(key):
+                    break
+
+                start = offset + SLOT.size
+                data = mm[start:start + key_length + value_length]
+                if SLOT_SEQ.unpack_from(mm, offset)[0] != seq:
+                    sleep(0)
+                    continue
+
+                if data[:key_length] != key:
+                    break
+
+                # This is only a hint for eviction, so it doesn't need to be
+                # written under the lock.
+                SLOT_LAST_USED.pack_into(mm, offset + 8, time())
+                self._count('hits')
+
+                return data[key_length:]
+
+        self._count('misses')
+
+        return None
+
+    def set(self, key, value):
+        """
+        Store `value` under `key`, evicting the least recently used entry in
+        its set if necessary.
+
+        :param str key: The cache key.
+        :param bytes value: The value to cache.
+        :rtype: bool
+        :returns: False if the entry is too large to be cached.
+        :raises ValueError: If the key is longer than 65535 bytes.
+        """
+        key = key.encode('utf-8')
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValueError('Cache keys must be at most %d bytes long (got %d bytes).' % (MAX_KEY_LENGTH, len(key)))
+
+        if len(key) + len(value) > self.capacity:
+            self._count('oversize')
+            return False
+
+        key_hash = crc32(key) & 0xffffffff
+        mm = self._mm
+
+        with self._write_lock():
+            target = empty = oldest = None
+            oldest_used = None
+
+            for offset in self._offsets(key_hash):
+                _, slot_hash, last_used, key_length, _ = SLOT.unpack_from(mm, offset)
+                if not key_length:
+                    if empty is None:
+                        empty = offset
+                    continue
+
+                start = offset + SLOT.size
+                if slot_hash == key_hash and mm[start:start + key_length] == key:
+                    target = offset
+                    break
+
+                if oldest_used is None or last_used < oldest_used:
+                    oldest, oldest_used = offset, last_used
+
+            if target is None:
+                target = empty
+            if target is None:
+                target = oldest
+                self._count('evictions')
+
+            self._write_slot(target, key_hash, key, value)
+
+        return True
+
+    def _write_slot(self, offset, key_hash, key, value):
+        """
+        Write an entry to a slot.  This must be called while holding our write
+        lock.
+
+        Readers must never see the sequence number as even while the slot is
+        inconsistent, so it's made odd first, and bumped to the next even
+        number (on its own) last.
+        """
+        mm = self._mm
+        seq = SLOT_SEQ.unpack_from(mm, offset)[0]
+
+        SLOT_SEQ.pack_into(mm, offset, seq + 1)
+        SLOT_FIELDS.pack_into(mm, offset + SLOT_SEQ.size, key_hash, time(), len(key), len(value))
+        if key:
+            start = offset + SLOT.size
+            mm[start:start + len(key) + len(value)] = key + value
+        SLOT_SEQ.pack_into(mm, offset, (seq + 2) & 0xffffffff)
+
+    def delete(self, key):
+        """
+        Remove `key` from the cache (if present).
+
+        :param str key: The cache key.
+        """
+        key = key.encode('utf-8')
+        key_hash = crc32(key) & 0xffffffff
+        mm = self._mm
+
+        with self._write_lock():
+            for offset in self._offsets(key_hash):
+                _, slot_hash, _, key_length, _ = SLOT.unpack_from(mm, offset)
+                start = offset + SLOT.size
+                if key_length and slot_hash == key_hash and mm[start:start + key_length] == key:
+                    self._write_slot(offset, 0, b'', b'')
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._write_lock():
+            for offset in self._offsets():
+                if SLOT.unpack_from(self._mm, offset)[3]:
+                    self._write_slot(offset, 0, b'', b'')
+
+    def close(self):
+        """Unmap the cache file, and close it."""
+        self._mm.close()
+        close(self._fd)
+
+    @property
+    def stats(self):
+        """
+        Return this process's cache statistics.
+
+        :rtype: dict
+        :returns: The number of hits, misses, evictions, and entries which
+            were too large to be cached.
+        """
+        with self._stats_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'oversize': self.oversize,
+            }
+
+
+class _WriteLock(object):
+    """A context manager which holds a thread lock, and an exclusive flock."""
+    def __init__(self, lock, fd):
+        self.lock = lock
+        self.fd = fd
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            flock(self.fd, LOCK_EX)
+        except Exception:
+            self.lock.release()
+            raise
+
+    def __exit__(self, *args):
+        try:
+            flock(self.fd, LOCK_UN)
+        finally:
+            self.lock.release()
+
+
+class MmapStore(object):
+    """
+    A Stormpath cache store (for use with the `STORMPATH_CACHE` setting)
+    which keeps cached resources in a :class:`MmapCache`, so every worker
+    process on a host shares them.
+
+    The Stormpath SDK creates one store per cache region (accounts,
+    applications, etc.).  They can all share the same file, as resources are
+    keyed by their (unique) href -- but clearing any region clears them all.
+
+    :param str path: The path of the cache file.
+    :param int slots: The number of slots in the cache file.
+    :param int slot_size: The size of each slot, in bytes.
+    """
+    def __init__(self, path, slots=4096, slot_size=4096):
+        self.cache = MmapCache(path, slots=slots, slot_size=slot_size)
+
+    def __getitem__(self, key):
+        data = self.cache.get(key)
+        if data is None:
+            return None
+
+        try:
+            return CacheEntry.parse(loads(data.decode('utf-8')))
+        except ValueError:
+            return None
+
+    def __setitem__(self, key, entry):
+        self.cache.set(key, dumps(entry.to_dict()).encode('utf-8'))
+
+    def __delitem__(self, key):
+        self.cache.delete(key)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def clear(self):
+        self.cache.clear()
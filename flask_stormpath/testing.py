@@ -0,0 +1,1219 @@
+"""
+A fake Stormpath API, for tests and load testing.
+
+:class:`FakeStormpath` is a WSGI app which implements (in memory) the parts of
+the Stormpath REST API Flask-Stormpath uses: the tenant, applications,
+directories, accounts (and their custom data), groups, group memberships,
+account store mappings, login attempts, social provider accounts, and password
+reset tokens.
+
+It can be served over HTTP on a local port, and the Stormpath SDK pointed at
+it with the `STORMPATH_BASE_URL` setting::
+
+    from flask_stormpath.testing import FakeStormpath
+
+    stormpath = FakeStormpath(latency=0.05)
+    stormpath.start()
+
+    app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+    app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+    app.config['STORMPATH_BASE_URL'] = stormpath.base_url
+
+    ...
+
+    stormpath.stop()
+
+Requests aren't authenticated, and nothing is persisted.  Latency and errors
+can be injected, so timeouts, retries, and outages can be tested, and every
+API call is counted, so tests and benchmarks can check how many calls a
+request needs.
+"""
+
+
+from base64 import b64decode
+from collections import Counter
+from datetime import datetime
+from fnmatch import fnmatch
+from json import dumps, loads
+from random import random
+from re import compile as compile_regex
+from threading import Lock, Thread
+from time import sleep
+from uuid import uuid4
+
+from six import string_types
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wrappers import Request, Response
+
+
+# The tenant every resource belongs to.
+TENANT_ID = 'fakeTenant'
+
+# The default (and maximum) page size of collections.
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 100
+
+# Collection query parameters which aren't attribute searches.
+COLLECTION_PARAMS = ('offset', 'limit', 'expand', 'orderBy')
+
+# The writable properties of each kind of resource.
+ACCOUNT_PROPERTIES = ('username', 'email', 'password', 'givenName', 'middleName', 'surname', 'status')
+DIRECTORY_PROPERTIES = ('name', 'description', 'status')
+
+EXPAND_PATTERN = compile_regex(r'(\w+)(?:\(([^)]*)\))?')
+
+
+class FakeStormpathError(Exception):
+    """
+    An error response from the fake Stormpath API.
+
+    :param int status: The HTTP status code.
+    :param int code: The Stormpath error code.
+    :param str message: The error message.
+    """
+    def __init__(self, status, code, message):
+        super(FakeStormpathError, self).__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+    def to_dict(self):
+        """
+        Return the error as the Stormpath API would.
+
+        :rtype: dict
+        """
+        return {
+            'status': self.status,
+            'code': self.code,
+            'message': self.message,
+            'developerMessage': self.message,
+            'moreInfo': 'https://docs.stormpath.com/errors/%d' % self.code,
+        }
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """A request handler which supports keep-alive, and doesn't log requests."""
+    protocol_version = 'HTTP/1.1'
+
+    def log(self, type, message, *args):
+        pass
+
+
+def _now():
+    """
+    Return the current time, formatted as the Stormpath API does.
+
+    :rtype: str
+    """
+    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _new_id():
+    """
+    Return a new, random resource ID.
+
+    :rtype: str
+    """
+    return uuid4().hex[:22]
+
+
+def _parse_expand(expand):
+    """
+    Parse an `expand` query parameter.
+
+    :param str expand: The expansion (`customData,groups(offset:0,limit:10)`).
+    :rtype: list
+    :returns: A list of (name, params) tuples.
+    """
+    expansions = []
+    for name, options in EXPAND_PATTERN.findall(expand or ''):
+        params = dict(option.split(':', 1) for option in options.split(',') if ':' in option)
+        expansions.append((name, params))
+
+    return expansions
+
+
+def _matches(resource, params):
+    """
+    Return True if a resource matches a collection search.
+
+    `q` searches every string property.  Any other parameter searches the
+    property of that name, and may use `*` wildcards.  Searches are case
+    insensitive.
+
+    :param dict resource: The resource's properties.
+    :param dict params: The collection's query parameters.
+    :rtype: bool
+    """
+    for name, value in params.items():
+        if name in COLLECTION_PARAMS:
+            continue
+
+        value = value.lower()
+        if name == 'q':
+            if not any(value in prop.lower() for prop in resource.values() if isinstance(prop, string_types)):
+                return False
+        else:
+            prop = resource.get(name)
+            if not isinstance(prop, string_types) or not fnmatch(prop.lower(), value):
+                return False
+
+    return True
+
+
+def _check_password(password):
+    """
+    Enforce Stormpath's default password policy.
+
+    :param str password: The password.
+    :raises: FakeStormpathError if the password isn't strong enough.
+    """
+    if len(password) < 8:
+        raise FakeStormpathError(400, 2007, 'Account password minimum length not satisfied.')
+    if len(password) > 100:
+        raise FakeStormpathError(400, 2008, 'Account password maximum length exceeded.')
+    if not any(c.islower() for c in password):
+        raise FakeStormpathError(400, 400, 'Password requires at least 1 lowercase character.')
+    if not any(c.isupper() for c in password):
+        raise FakeStormpathError(400, 400, 'Password requires at least 1 uppercase character.')
+    if not any(c.isdigit() for c in password):
+        raise FakeStormpathError(400, 400, 'Password requires at least 1 numeric character.')
+
+
+class FakeStormpath(object):
+    """
+    A fake, in-memory Stormpath API.
+
+    :param float latency: The number of seconds each API call takes.
+    :param float jitter: A random number of seconds (up to this much) added to
+        each API call's latency.
+    :param float error_rate: The fraction of API calls which fail (0-1).
+    :param int error_status: The HTTP status code of failed API calls.
+    """
+    def __init__(self, latency=0, jitter=0, error_rate=0, error_status=503):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+        self.calls = Counter()
+        self.errors = 0
+        self.server = None
+
+        self._lock = Lock()
+        self._failures = []
+        self._routes = self._build_routes()
+        self._base_url = None
+
+        self._applications = {}
+        self._directories = {}
+        self._accounts = {}
+        self._groups = {}
+        self._memberships = {}
+        self._mappings = {}
+        self._custom_data = {}
+        self._reset_tokens = {}
+        self._provider_accounts = {}
+
+    @property
+    def base_url(self):
+        """
+        The base URL of the API, for the `STORMPATH_BASE_URL` setting.
+
+        This is only available once the server has been started.
+
+        :rtype: str
+        """
+        if self.server is not None:
+            return 'http://%s:%d/v1' % (self.server.server_address[0], self.server.server_port)
+
+    @property
+    def stats(self):
+        """
+        Statistics about the API calls made so far.
+
+        - `calls`: The total number of API calls.
+        - `errors`: How many of them failed because of injected errors.
+        - `endpoints`: The number of calls to each endpoint (`'GET
+          /accounts/*'`, etc.).
+
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'calls': sum(self.calls.values()),
+                'errors': self.errors,
+                'endpoints': dict(self.calls),
+            }
+
+    def reset_stats(self):
+        """Forget about the API calls made so far."""
+        with self._lock:
+            self.calls.clear()
+            self.errors = 0
+
+    def start(self, host='127.0.0.1', port=0):
+        """
+        Serve the API over HTTP in a background thread.
+
+        :param str host: The host to listen on.
+        :param int port: The port to listen on (by default, a free one).
+        :rtype: str
+        :returns: The base URL of the API.
+        """
+        self.server = make_server(host, port, self, threaded=True, request_handler=_QuietRequestHandler)
+
+        thread = Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        return self.base_url
+
+    def stop(self):
+        """Stop serving the API."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def fail(self, count=1, status=None):
+        """
+        Make the next API calls fail.
+
+        :param int count: The number of API calls which fail.
+        :param int status: Their HTTP status code (by default, `error_status`).
+        """
+        with self._lock:
+            self._failures.extend([status or self.error_status] * count)
+
+    def add_provider_account(self, provider_id, token, **properties):
+        """
+        Register a social login.
+
+        Logging in with the given access token (or code) will create (or
+        return) an account in the application's directory for the given
+        provider.
+
+        :param str provider_id: The provider (`google`, `facebook`, etc.).
+        :param str token: The access token (or code) the user logs in with.
+        :param properties: The account's properties (`email`, `givenName`,
+            `surname`, etc.).
+        """
+        with self._lock:
+            self._provider_accounts[(provider_id, token)] = properties
+
+    @property
+    def password_reset_tokens(self):
+        """
+        The password reset tokens which have been issued (and not yet used).
+
+        Stormpath would email these to users.  Each is a dict with the
+        `token`, and the `email` it was sent to.
+
+        :rtype: list
+        """
+        with self._lock:
+            return [
+                {'token': token, 'email': self._accounts[reset['account']]['email']}
+                for token, reset in self._reset_tokens.items()
+            ]
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+
+        failure = None
+        with self._lock:
+            if self._failures:
+                failure = self._failures.pop(0)
+            elif self.error_rate and random() < self.error_rate:
+                failure = self.error_status
+
+            if failure:
+                self.calls['%s %s' % (request.method, self._route(request.method, request.path)[0])] += 1
+                self.errors += 1
+
+        latency = self.latency + random() * self.jitter
+        if latency:
+            sleep(latency)
+
+        if failure:
+            status, body = failure, FakeStormpathError(failure, failure, 'Injected error.').to_dict()
+        else:
+            with self._lock:
+                self._base_url = request.url_root.rstrip('/') + '/v1'
+                status, body = self._handle(
+                    request.method,
+                    request.path,
+                    request.args.to_dict(),
+                    loads(request.get_data(as_text=True) or '{}'),
+                    count = True,
+                )
+
+        if body is None:
+            response = Response(status=status)
+        else:
+            response = Response(dumps(body), status=status, content_type='application/json')
+
+        return response(environ, start_response)
+
+    def _handle(self, method, path, params, body, count=False):
+        """
+        Handle an API call.
+
+        :param str method: The HTTP method.
+        :param str path: The path (`/v1/accounts/xxx`).
+        :param dict params: The query parameters.
+        :param dict body: The JSON request body.
+        :param bool count: Whether or not to count this API call.
+        :rtype: tuple
+        :returns: The (status, body) of the response.
+        """
+        name, handler, args = self._route(method, path)
+        if count:
+            self.calls['%s %s' % (method, name)] += 1
+
+        if handler is None:
+            return 404, FakeStormpathError(404, 404, 'The requested resource does not exist.').to_dict()
+
+        try:
+            status, resource = handler(params, body, *args)
+        except FakeStormpathError as err:
+            return err.status, err.to_dict()
+
+        if resource is not None:
+            self._expand(resource, params.get('expand'))
+
+        return status, resource
+
+    def _route(self, method, path):
+        """
+        Find the handler for an API call.
+
+        :param str method: The HTTP method.
+        :param str path: The path (`/v1/accounts/xxx`).
+        :rtype: tuple
+        :returns: The (name, handler, args) of the route.  If there's no such
+            route, the name is the path, and the handler is None.
+        """
+        if path.startswith('/v1/'):
+            path = path[len('/v1'):]
+
+        for route_method, pattern, name, handler in self._routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                return name, handler, match.groups()
+
+        return path, None, ()
+
+    def _build_routes(self):
+        """
+        Return the API's routes.
+
+        :rtype: list
+        :returns: A list of (method, pattern, name, handler) tuples.
+        """
+        routes = (
+            ('GET', '/tenants/*', self._get_tenant),
+            ('GET', '/tenants/*/applications', self._list_applications),
+            ('POST', '/tenants/*/applications', self._create_application),
+            ('GET', '/tenants/*/directories', self._list_directories),
+            ('POST', '/tenants/*/directories', self._create_directory),
+            ('GET', '/applications', self._list_applications),
+            ('POST', '/applications', self._create_application),
+            ('GET', '/applications/*', self._get_application),
+            ('POST', '/applications/*', self._update_application),
+            ('DELETE', '/applications/*', self._delete_application),
+            ('GET', '/applications/*/accounts', self._list_application_accounts),
+            ('POST', '/applications/*/accounts', self._create_application_account),
+            ('GET', '/applications/*/groups', self._list_application_groups),
+            ('POST', '/applications/*/groups', self._create_application_group),
+            ('GET', '/applications/*/accountStoreMappings', self._list_application_mappings),
+            ('POST', '/applications/*/accountStoreMappings', self._create_mapping),
+            ('POST', '/applications/*/loginAttempts', self._login),
+            ('POST', '/applications/*/passwordResetTokens', self._create_reset_token),
+            ('GET', '/applications/*/passwordResetTokens/*', self._get_reset_token),
+            ('POST', '/applications/*/passwordResetTokens/*', self._use_reset_token),
+            ('GET', '/directories', self._list_directories),
+            ('POST', '/directories', self._create_directory),
+            ('GET', '/directories/*', self._get_directory),
+            ('POST', '/directories/*', self._update_directory),
+            ('DELETE', '/directories/*', self._delete_directory),
+            ('GET', '/directories/*/provider', self._get_provider),
+            ('GET', '/directories/*/accounts', self._list_directory_accounts),
+            ('POST', '/directories/*/accounts', self._create_directory_account),
+            ('GET', '/directories/*/groups', self._list_directory_groups),
+            ('POST', '/directories/*/groups', self._create_directory_group),
+            ('POST', '/accountStoreMappings', self._create_mapping),
+            ('GET', '/accountStoreMappings/*', self._get_mapping),
+            ('DELETE', '/accountStoreMappings/*', self._delete_mapping),
+            ('GET', '/accounts/*', self._get_account),
+            ('POST', '/accounts/*', self._update_account),
+            ('DELETE', '/accounts/*', self._delete_account),
+            ('GET', '/accounts/*/groups', self._list_account_groups),
+            ('GET', '/accounts/*/groupMemberships', self._list_account_memberships),
+            ('GET', '/accounts/*/providerData', self._get_provider_data),
+            ('GET', '/groups/*', self._get_group),
+            ('POST', '/groups/*', self._update_group),
+            ('DELETE', '/groups/*', self._delete_group),
+            ('GET', '/groups/*/accounts', self._list_group_accounts),
+            ('POST', '/groupMemberships', self._create_membership),
+            ('GET', '/groupMemberships/*', self._get_membership),
+            ('DELETE', '/groupMemberships/*', self._delete_membership),
+            ('GET', '/*/*/customData', self._get_custom_data),
+            ('POST', '/*/*/customData', self._update_custom_data),
+            ('DELETE', '/*/*/customData', self._delete_custom_data),
+            ('DELETE', '/*/*/customData/*', self._delete_custom_data_key),
+        )
+
+        return [
+            (method, compile_regex('^%s$' % name.replace('*', '([^/]+)')), name, handler)
+            for method, name, handler in routes
+        ]
+
+    # Rendering.
+
+    def _href(self, *parts):
+        """
+        Return the href of a resource.
+
+        :param parts: The path segments (`'accounts', 'xxx'`).
+        :rtype: str
+        """
+        return '/'.join((self._base_url,) + parts)
+
+    def _link(self, *parts):
+        """
+        Return a link to a resource.
+
+        :param parts: The path segments (`'accounts', 'xxx'`).
+        :rtype: dict
+        """
+        return {'href': self._href(*parts)}
+
+    def _id(self, href, kind):
+        """
+        Return the ID of the resource an href refers to.
+
+        :param str href: The resource's href.
+        :param str kind: The kind of resource expected (`accounts`, etc.).
+        :rtype: str
+        """
+        parts = (href or '').rstrip('/').split('/')
+        if len(parts) < 2 or parts[-2] != kind:
+            raise FakeStormpathError(400, 2002, 'Invalid %s href.' % kind)
+
+        return parts[-1]
+
+    def _expand(self, resource, expand):
+        """
+        Replace the links in a resource with the resources they point to.
+
+        :param dict resource: The rendered resource.
+        :param str expand: The `expand` query parameter.
+        """
+        for name, params in _parse_expand(expand):
+            link = resource.get(name)
+            if isinstance(link, dict) and 'href' in link and link['href'].startswith(self._base_url):
+                status, expanded = self._handle('GET', link['href'][len(self._base_url):], params, None)
+                if status == 200:
+                    resource[name] = expanded
+
+    def _collection(self, params, items, *parts):
+        """
+        Render a page of a collection.
+
+        :param dict params: The query parameters (used for searches and
+            paging).
+        :param list items: The rendered resources in the collection.
+        :param parts: The path segments of the collection.
+        :rtype: tuple
+        """
+        items = [item for item in items if _matches(item, params)]
+        offset = int(params.get('offset', 0))
+        limit = min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+
+        return 200, {
+            'href': self._href(*parts),
+            'offset': offset,
+            'limit': limit,
+            'size': len(items),
+            'items': items[offset:offset + limit],
+        }
+
+    def _get(self, store, kind, id):
+        """
+        Return a stored resource.
+
+        :param dict store: The resources of this kind.
+        :param str kind: The kind of resource (`accounts`, etc.).
+        :param str id: The resource's ID.
+        :rtype: dict
+        """
+        resource = store.get(id)
+        if resource is None:
+            raise FakeStormpathError(404, 404, 'The requested resource does not exist.')
+
+        return resource
+
+    def _render_tenant(self):
+        return {
+            'href': self._href('tenants', TENANT_ID),
+            'name': 'Fake Tenant',
+            'key': TENANT_ID,
+            'applications': self._link('tenants', TENANT_ID, 'applications'),
+            'directories': self._link('tenants', TENANT_ID, 'directories'),
+            'customData': self._link('tenants', TENANT_ID, 'customData'),
+        }
+
+    def _render_application(self, id):
+        application = self._applications[id]
+        resource = dict(application, href=self._href('applications', id), tenant=self._link('tenants', TENANT_ID))
+        for name in ('accounts', 'groups', 'accountStoreMappings', 'loginAttempts', 'passwordResetTokens', 'customData'):
+            resource[name] = self._link('applications', id, name)
+
+        for name, flag in (('defaultAccountStoreMapping', 'isDefaultAccountStore'), ('defaultGroupStoreMapping', 'isDefaultGroupStore')):
+            mappings = [mapping_id for mapping_id in self._mapping_ids(id) if self._mappings[mapping_id][flag]]
+            resource[name] = self._link('accountStoreMappings', mappings[0]) if mappings else None
+
+        return resource
+
+    def _render_directory(self, id):
+        directory = self._directories[id]
+        resource = dict(directory, href=self._href('directories', id), tenant=self._link('tenants', TENANT_ID))
+        resource.pop('provider')
+        for name in ('accounts', 'groups', 'provider', 'customData'):
+            resource[name] = self._link('directories', id, name)
+
+        return resource
+
+    def _render_account(self, id):
+        account = self._accounts[id]
+        resource = dict((name, value) for name, value in account.items() if name not in ('password', 'directory'))
+        resource.update({
+            'href': self._href('accounts', id),
+            'fullName': ' '.join(name for name in (account['givenName'], account['middleName'], account['surname']) if name),
+            'emailVerificationToken': None,
+            'directory': self._link('directories', account['directory']),
+            'tenant': self._link('tenants', TENANT_ID),
+        })
+        for name in ('customData', 'providerData', 'groups', 'groupMemberships', 'applications', 'apiKeys', 'accessTokens', 'refreshTokens'):
+            resource[name] = self._link('accounts', id, name)
+
+        return resource
+
+    def _render_group(self, id):
+        group = self._groups[id]
+        resource = dict(group, href=self._href('groups', id), tenant=self._link('tenants', TENANT_ID))
+        resource['directory'] = self._link('directories', group['directory'])
+        for name in ('accounts', 'customData'):
+            resource[name] = self._link('groups', id, name)
+
+        return resource
+
+    def _render_membership(self, id):
+        membership = self._memberships[id]
+
+        return {
+            'href': self._href('groupMemberships', id),
+            'account': self._link('accounts', membership['account']),
+            'group': self._link('groups', membership['group']),
+        }
+
+    def _render_mapping(self, id):
+        mapping = self._mappings[id]
+
+        return {
+            'href': self._href('accountStoreMappings', id),
+            'application': self._link('applications', mapping['application']),
+            'accountStore': self._link(*mapping['accountStore']),
+            'listIndex': mapping['listIndex'],
+            'isDefaultAccountStore': mapping['isDefaultAccountStore'],
+            'isDefaultGroupStore': mapping['isDefaultGroupStore'],
+        }
+
+    def _render_reset_token(self, application_id, token):
+        reset = self._reset_tokens[token]
+
+        return {
+            'href': self._href('applications', application_id, 'passwordResetTokens', token),
+            'email': self._accounts[reset['account']]['email'],
+            'account': self._link('accounts', reset['account']),
+        }
+
+    # Lookups.
+
+    def _mapping_ids(self, application_id):
+        """Return the IDs of an application's account store mappings, in order."""
+        mappings = [mapping_id for mapping_id, mapping in self._mappings.items() if mapping['application'] == application_id]
+
+        return sorted(mappings, key=lambda mapping_id: self._mappings[mapping_id]['listIndex'])
+
+    def _application_account_ids(self, application_id):
+        """Return the IDs of every account which can log into an application."""
+        account_ids = []
+        for mapping_id in self._mapping_ids(application_id):
+            kind, store_id = self._mappings[mapping_id]['accountStore']
+            if kind == 'directories':
+                account_ids.extend(id for id, account in self._accounts.items() if account['directory'] == store_id)
+            else:
+                account_ids.extend(membership['account'] for membership in self._memberships.values() if membership['group'] == store_id)
+
+        return account_ids
+
+    def _application_group_ids(self, application_id):
+        """Return the IDs of every group available to an application."""
+        group_ids = []
+        for mapping_id in self._mapping_ids(application_id):
+            kind, store_id = self._mappings[mapping_id]['accountStore']
+            if kind == 'directories':
+                group_ids.extend(id for id, group in self._groups.items() if group['directory'] == store_id)
+            else:
+                group_ids.append(store_id)
+
+        return group_ids
+
+    def _default_directory(self, application_id, flag):
+        """
+        Return the ID of the directory an application creates accounts (or
+        groups) in.
+
+        :param str application_id: The application's ID.
+        :param str flag: `isDefaultAccountStore` or `isDefaultGroupStore`.
+        :rtype: tuple
+        :returns: The (directory ID, group ID) -- the group ID is None unless
+            the default account store is a group.
+        """
+        for mapping_id in self._mapping_ids(application_id):
+            mapping = self._mappings[mapping_id]
+            if mapping[flag]:
+                kind, store_id = mapping['accountStore']
+                if kind == 'directories':
+                    return store_id, None
+
+                return self._groups[store_id]['directory'], store_id
+
+        raise FakeStormpathError(400, 5102, 'This application does not have a default account store.')
+
+    # Tenants.
+
+    def _get_tenant(self, params, body, tenant_id):
+        return 200, self._render_tenant()
+
+    # Applications.
+
+    def _list_applications(self, params, body, tenant_id=None):
+        return self._collection(params, [self._render_application(id) for id in self._applications], 'tenants', TENANT_ID, 'applications')
+
+    def _create_application(self, params, body, tenant_id=None):
+        if not body.get('name'):
+            raise FakeStormpathError(400, 2000, 'Application name is required.')
+        if any(application['name'] == body['name'] for application in self._applications.values()):
+            raise FakeStormpathError(409, 2001, 'Application name already exists.')
+
+        id = _new_id()
+        self._applications[id] = {
+            'name': body['name'],
+            'description': body.get('description', ''),
+            'status': body.get('status', 'ENABLED'),
+            'createdAt': _now(),
+            'modifiedAt': _now(),
+        }
+
+        create_directory = params.get('createDirectory')
+        if create_directory:
+            name = body['name'] + ' Directory' if create_directory.lower() == 'true' else create_directory
+            status, directory = self._create_directory({}, {'name': name})
+            self._create_mapping({}, {
+                'application': {'href': self._href('applications', id)},
+                'accountStore': {'href': directory['href']},
+                'isDefaultAccountStore': True,
+                'isDefaultGroupStore': True,
+            })
+
+        return 201, self._render_application(id)
+
+    def _get_application(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+
+        return 200, self._render_application(id)
+
+    def _update_application(self, params, body, id):
+        application = self._get(self._applications, 'applications', id)
+        application.update((name, body[name]) for name in DIRECTORY_PROPERTIES if name in body)
+        application['modifiedAt'] = _now()
+
+        return 200, self._render_application(id)
+
+    def _delete_application(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+        for mapping_id in self._mapping_ids(id):
+            del self._mappings[mapping_id]
+
+        del self._applications[id]
+        self._custom_data.pop(('applications', id), None)
+
+        return 204, None
+
+    def _list_application_accounts(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+
+        return self._collection(params, [self._render_account(account_id) for account_id in self._application_account_ids(id)], 'applications', id, 'accounts')
+
+    def _create_application_account(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+
+        if 'providerData' in body:
+            return self._login_with_provider(id, body['providerData'])
+
+        directory_id, group_id = self._default_directory(id, 'isDefaultAccountStore')
+        status, account = self._create_directory_account(params, body, directory_id)
+        if group_id is not None:
+            self._memberships[_new_id()] = {'account': self._id(account['href'], 'accounts'), 'group': group_id}
+
+        return status, account
+
+    def _list_application_groups(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+
+        return self._collection(params, [self._render_group(group_id) for group_id in self._application_group_ids(id)], 'applications', id, 'groups')
+
+    def _create_application_group(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+
+        return self._create_directory_group(params, body, self._default_directory(id, 'isDefaultGroupStore')[0])
+
+    def _list_application_mappings(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+
+        return self._collection(params, [self._render_mapping(mapping_id) for mapping_id in self._mapping_ids(id)], 'applications', id, 'accountStoreMappings')
+
+    def _login(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+
+        try:
+            login, password = b64decode(body.get('value', '')).decode('utf-8').split(':', 1)
+        except (TypeError, ValueError):
+            raise FakeStormpathError(400, 2000, 'Login attempt value is invalid.')
+
+        for account_id in self._application_account_ids(id):
+            account = self._accounts[account_id]
+            if login.lower() in (account['username'].lower(), account['email'].lower()) and account['password'] == password:
+                if account['status'] != 'ENABLED':
+                    raise FakeStormpathError(400, 7101, 'Login attempt failed because the Account is not enabled.')
+
+                return 200, {'account': self._link('accounts', account_id)}
+
+        raise FakeStormpathError(400, 7100, 'Invalid username or password.')
+
+    def _login_with_provider(self, id, provider_data):
+        provider_id = provider_data.get('providerId')
+        token = provider_data.get('accessToken') or provider_data.get('code')
+
+        directory_ids = [
+            self._mappings[mapping_id]['accountStore'][1] for mapping_id in self._mapping_ids(id)
+            if self._mappings[mapping_id]['accountStore'][0] == 'directories' and
+            self._directories[self._mappings[mapping_id]['accountStore'][1]]['provider']['providerId'] == provider_id
+        ]
+        if not directory_ids:
+            raise FakeStormpathError(400, 7200, 'This application does not have a %s directory.' % provider_id)
+
+        properties = self._provider_accounts.get((provider_id, token))
+        if properties is None:
+            raise FakeStormpathError(400, 7201, 'Stormpath was not able to complete the request to %s: invalid access token.' % provider_id)
+
+        for account_id, account in self._accounts.items():
+            if account['directory'] == directory_ids[0] and account['email'] == properties['email']:
+                return 200, self._render_account(account_id)
+
+        body = {'givenName': '', 'surname': ''}
+        body.update(properties)
+        status, account = self._create_account(body, directory_ids[0], check_password=False)
+
+        return 201, account
+
+    # Password resets.
+
+    def _create_reset_token(self, params, body, id):
+        self._get(self._applications, 'applications', id)
+
+        email = (body.get('email') or '').lower()
+        for account_id in self._application_account_ids(id):
+            if self._accounts[account_id]['email'].lower() == email:
+                token = _new_id()
+                self._reset_tokens[token] = {'application': id, 'account': account_id}
+
+                return 200, self._render_reset_token(id, token)
+
+        raise FakeStormpathError(400, 2016, 'The email property value does not match a known resource.')
+
+    def _get_reset_token(self, params, body, id, token):
+        reset = self._reset_tokens.get(token)
+        if reset is None or reset['application'] != id:
+            raise FakeStormpathError(404, 404, 'The requested resource does not exist.')
+
+        return 200, self._render_reset_token(id, token)
+
+    def _use_reset_token(self, params, body, id, token):
+        status, reset = self._get_reset_token(params, body, id, token)
+        self._update_account({}, {'password': body.get('password', '')}, self._reset_tokens.pop(token)['account'])
+
+        return 200, reset
+
+    # Directories.
+
+    def _list_directories(self, params, body, tenant_id=None):
+        return self._collection(params, [self._render_directory(id) for id in self._directories], 'tenants', TENANT_ID, 'directories')
+
+    def _create_directory(self, params, body, tenant_id=None):
+        if not body.get('name'):
+            raise FakeStormpathError(400, 2000, 'Directory name is required.')
+        if any(directory['name'] == body['name'] for directory in self._directories.values()):
+            raise FakeStormpathError(409, 2001, 'Directory name already exists.')
+
+        provider = dict(body.get('provider') or {})
+        provider.setdefault('providerId', 'stormpath')
+        provider.update(createdAt=_now(), modifiedAt=_now())
+
+        id = _new_id()
+        self._directories[id] = {
+            'name': body['name'],
+            'description': body.get('description', ''),
+            'status': body.get('status', 'ENABLED'),
+            'provider': provider,
+            'createdAt': _now(),
+            'modifiedAt': _now(),
+        }
+
+        return 201, self._render_directory(id)
+
+    def _get_directory(self, params, body, id):
+        self._get(self._directories, 'directories', id)
+
+        return 200, self._render_directory(id)
+
+    def _update_directory(self, params, body, id):
+        directory = self._get(self._directories, 'directories', id)
+        directory.update((name, body[name]) for name in DIRECTORY_PROPERTIES if name in body)
+        directory['modifiedAt'] = _now()
+
+        return 200, self._render_directory(id)
+
+    def _delete_directory(self, params, body, id):
+        self._get(self._directories, 'directories', id)
+
+        for account_id in [account_id for account_id, account in self._accounts.items() if account['directory'] == id]:
+            self._delete_account({}, None, account_id)
+        for group_id in [group_id for group_id, group in self._groups.items() if group['directory'] == id]:
+            self._delete_group({}, None, group_id)
+        for mapping_id in [mapping_id for mapping_id, mapping in self._mappings.items() if mapping['accountStore'] == ('directories', id)]:
+            del self._mappings[mapping_id]
+
+        del self._directories[id]
+        self._custom_data.pop(('directories', id), None)
+
+        return 204, None
+
+    def _get_provider(self, params, body, id):
+        directory = self._get(self._directories, 'directories', id)
+
+        return 200, dict(directory['provider'], href=self._href('directories', id, 'provider'))
+
+    def _list_directory_accounts(self, params, body, id):
+        self._get(self._directories, 'directories', id)
+        account_ids = [account_id for account_id, account in self._accounts.items() if account['directory'] == id]
+
+        return self._collection(params, [self._render_account(account_id) for account_id in account_ids], 'directories', id, 'accounts')
+
+    def _create_directory_account(self, params, body, id):
+        self._get(self._directories, 'directories', id)
+
+        return self._create_account(body, id)
+
+    def _list_directory_groups(self, params, body, id):
+        self._get(self._directories, 'directories', id)
+        group_ids = [group_id for group_id, group in self._groups.items() if group['directory'] == id]
+
+        return self._collection(params, [self._render_group(group_id) for group_id in group_ids], 'directories', id, 'groups')
+
+    def _create_directory_group(self, params, body, id):
+        self._get(self._directories, 'directories', id)
+
+        if not body.get('name'):
+            raise FakeStormpathError(400, 2000, 'Group name is required.')
+        if any(group['directory'] == id and group['name'] == body['name'] for group in self._groups.values()):
+            raise FakeStormpathError(409, 2001, 'Group name already exists.')
+
+        group_id = _new_id()
+        self._groups[group_id] = {
+            'name': body['name'],
+            'description': body.get('description', ''),
+            'status': body.get('status', 'ENABLED'),
+            'directory': id,
+            'createdAt': _now(),
+            'modifiedAt': _now(),
+        }
+        if body.get('customData'):
+            self._custom_data[('groups', group_id)] = dict(body['customData'])
+
+        return 201, self._render_group(group_id)
+
+    # Account store mappings.
+
+    def _create_mapping(self, params, body, application_id=None):
+        if application_id is None:
+            application_id = self._id((body.get('application') or {}).get('href'), 'applications')
+
+        self._get(self._applications, 'applications', application_id)
+
+        store_href = (body.get('accountStore') or {}).get('href', '')
+        kind = 'groups' if '/groups/' in store_href else 'directories'
+        store_id = self._id(store_href, kind)
+        self._get(self._groups if kind == 'groups' else self._directories, kind, store_id)
+
+        mappings = self._mapping_ids(application_id)
+        id = _new_id()
+        self._mappings[id] = {
+            'application': application_id,
+            'accountStore': (kind, store_id),
+            'listIndex': body.get('listIndex', len(mappings)),
+            'isDefaultAccountStore': bool(body.get('isDefaultAccountStore')),
+            'isDefaultGroupStore': bool(body.get('isDefaultGroupStore')) and kind == 'directories',
+        }
+
+        # Only one mapping can be the default account (or group) store.
+        for flag in ('isDefaultAccountStore', 'isDefaultGroupStore'):
+            if self._mappings[id][flag]:
+                for mapping_id in mappings:
+                    self._mappings[mapping_id][flag] = False
+
+        return 201, self._render_mapping(id)
+
+    def _get_mapping(self, params, body, id):
+        self._get(self._mappings, 'accountStoreMappings', id)
+
+        return 200, self._render_mapping(id)
+
+    def _delete_mapping(self, params, body, id):
+        self._get(self._mappings, 'accountStoreMappings', id)
+        del self._mappings[id]
+
+        return 204, None
+
+    # Accounts.
+
+    def _create_account(self, body, directory_id, check_password=True):
+        """
+        Create an account in a directory.
+
+        :param dict body: The account's properties.
+        :param str directory_id: The directory's ID.
+        :param bool check_password: Whether or not a (valid) password is
+            required.
+        :rtype: tuple
+        """
+        for name in ('email', 'password', 'givenName', 'surname') if check_password else ('email',):
+            if body.get(name) is None:
+                raise FakeStormpathError(400, 2000, 'Account %s is required.' % name)
+
+        account = {
+            'username': body.get('username') or body['email'],
+            'email': body['email'],
+            'password': body.get('password'),
+            'givenName': body.get('givenName'),
+            'middleName': body.get('middleName'),
+            'surname': body.get('surname'),
+            'status': body.get('status', 'ENABLED'),
+            'directory': directory_id,
+            'createdAt': _now(),
+            'modifiedAt': _now(),
+        }
+        self._check_account(account)
+        if check_password:
+            _check_password(account['password'])
+
+        id = _new_id()
+        self._accounts[id] = account
+        if body.get('customData'):
+            self._custom_data[('accounts', id)] = dict(body['customData'])
+
+        return 201, self._render_account(id)
+
+    def _check_account(self, account, id=None):
+        """
+        Make sure an account's username and email are unique within its
+        directory.
+
+        :param dict account: The account's properties.
+        :param str id: The account's ID (if it already exists).
+        """
+        for other_id, other in self._accounts.items():
+            if other_id != id and other['directory'] == account['directory']:
+                if other['email'].lower() == account['email'].lower():
+                    raise FakeStormpathError(409, 2001, 'Account with that email already exists.  Please choose another email.')
+                if other['username'].lower() == account['username'].lower():
+                    raise FakeStormpathError(409, 2001, 'Account with that username already exists.  Please choose another username.')
+
+    def _get_account(self, params, body, id):
+        self._get(self._accounts, 'accounts', id)
+
+        return 200, self._render_account(id)
+
+    def _update_account(self, params, body, id):
+        account = dict(self._get(self._accounts, 'accounts', id))
+        account.update((name, body[name]) for name in ACCOUNT_PROPERTIES if name in body)
+        self._check_account(account, id)
+        if 'password' in body:
+            _check_password(account['password'])
+
+        account['modifiedAt'] = _now()
+        self._accounts[id] = account
+        if body.get('customData'):
+            self._update_custom_data({}, body['customData'], 'accounts', id)
+
+        return 200, self._render_account(id)
+
+    def _delete_account(self, params, body, id):
+        self._get(self._accounts, 'accounts', id)
+
+        for membership_id in [membership_id for membership_id, membership in self._memberships.items() if membership['account'] == id]:
+            del self._memberships[membership_id]
+        for token in [token for token, reset in self._reset_tokens.items() if reset['account'] == id]:
+            del self._reset_tokens[token]
+
+        del self._accounts[id]
+        self._custom_data.pop(('accounts', id), None)
+
+        return 204, None
+
+    def _list_account_groups(self, params, body, id):
+        self._get(self._accounts, 'accounts', id)
+        group_ids = [membership['group'] for membership in self._memberships.values() if membership['account'] == id]
+
+        return self._collection(params, [self._render_group(group_id) for group_id in group_ids], 'accounts', id, 'groups')
+
+    def _list_account_memberships(self, params, body, id):
+        self._get(self._accounts, 'accounts', id)
+        membership_ids = [membership_id for membership_id, membership in self._memberships.items() if membership['account'] == id]
+
+        return self._collection(params, [self._render_membership(membership_id) for membership_id in membership_ids], 'accounts', id, 'groupMemberships')
+
+    def _get_provider_data(self, params, body, id):
+        account = self._get(self._accounts, 'accounts', id)
+
+        return 200, {
+            'href': self._href('accounts', id, 'providerData'),
+            'providerId': self._directories[account['directory']]['provider']['providerId'],
+            'createdAt': account['createdAt'],
+            'modifiedAt': account['modifiedAt'],
+        }
+
+    # Groups.
+
+    def _get_group(self, params, body, id):
+        self._get(self._groups, 'groups', id)
+
+        return 200, self._render_group(id)
+
+    def _update_group(self, params, body, id):
+        group = self._get(self._groups, 'groups', id)
+        group.update((name, body[name]) for name in DIRECTORY_PROPERTIES if name in body)
+        group['modifiedAt'] = _now()
+
+        return 200, self._render_group(id)
+
+    def _delete_group(self, params, body, id):
+        self._get(self._groups, 'groups', id)
+
+        for membership_id in [membership_id for membership_id, membership in self._memberships.items() if membership['group'] == id]:
+            del self._memberships[membership_id]
+        for mapping_id in [mapping_id for mapping_id, mapping in self._mappings.items() if mapping['accountStore'] == ('groups', id)]:
+            del self._mappings[mapping_id]
+
+        del self._groups[id]
+        self._custom_data.pop(('groups', id), None)
+
+        return 204, None
+
+    def _list_group_accounts(self, params, body, id):
+        self._get(self._groups, 'groups', id)
+        account_ids = [membership['account'] for membership in self._memberships.values() if membership['group'] == id]
+
+        return self._collection(params, [self._render_account(account_id) for account_id in account_ids], 'groups', id, 'accounts')
+
+    # Group memberships.
+
+    def _create_membership(self, params, body):
+        account_id = self._id((body.get('account') or {}).get('href'), 'accounts')
+        group_id = self._id((body.get('group') or {}).get('href'), 'groups')
+        self._get(self._accounts, 'accounts', account_id)
+        self._get(self._groups, 'groups', group_id)
+
+        if any(membership == {'account': account_id, 'group': group_id} for membership in self._memberships.values()):
+            raise FakeStormpathError(409, 2001, 'The account is already a member of the group.')
+
+        id = _new_id()
+        self._memberships[id] = {'account': account_id, 'group': group_id}
+
+        return 201, self._render_membership(id)
+
+    def _get_membership(self, params, body, id):
+        self._get(self._memberships, 'groupMemberships', id)
+
+        return 200, self._render_membership(id)
+
+    def _delete_membership(self, params, body, id):
+        self._get(self._memberships, 'groupMemberships', id)
+        del self._memberships[id]
+
+        return 204, None
+
+    # Custom data.
+
+    def _custom_data_owner(self, kind, id):
+        """
+        Return the key of a resource's custom data.
+
+        :param str kind: The kind of resource (`accounts`, etc.).
+        :param str id: The resource's ID.
+        :rtype: tuple
+        """
+        stores = {
+            'tenants': {TENANT_ID: True},
+            'applications': self._applications,
+            'directories': self._directories,
+            'accounts': self._accounts,
+            'groups': self._groups,
+        }
+        if id not in stores.get(kind, ()):
+            raise FakeStormpathError(404, 404, 'The requested resource does not exist.')
+
+        return kind, id
+
+    def _get_custom_data(self, params, body, kind, id):
+        key = self._custom_data_owner(kind, id)
+        data = self._custom_data.get(key, {})
+
+        resource = {'createdAt': data.get('createdAt', _now()), 'modifiedAt': data.get('modifiedAt', _now())}
+        resource.update(data)
+        resource['href'] = self._href(kind, id, 'customData')
+
+        return 200, resource
+
+    def _update_custom_data(self, params, body, kind, id):
+        key = self._custom_data_owner(kind, id)
+        data = self._custom_data.setdefault(key, {'createdAt': _now()})
+        data.update((name, value) for name, value in body.items() if name not in ('href', 'createdAt', 'modifiedAt'))
+        data['modifiedAt'] = _now()
+
+        return self._get_custom_data(params, None, kind, id)
+
+    def _delete_custom_data(self, params, body, kind, id):
+        self._custom_data.pop(self._custom_data_owner(kind, id), None)
+
+        return 204, None
+
+    def _delete_custom_data_key(self, params, body, kind, id, name):
+        self._custom_data.get(self._custom_data_owner(kind, id), {}).pop(name, None)
+
+        return 204, None
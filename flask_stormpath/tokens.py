@@ -0,0 +1,54 @@
+"""
+Helpers for authenticating requests with Stormpath OAuth access tokens.
+
+Stormpath access tokens are JWTs signed (using HS256) with the API key secret
+that issued them, so we can verify them locally -- without making a Stormpath
+API call for every request.
+"""
+
+
+from jwt import InvalidTokenError, decode, get_unverified_header
+
+
+def get_bearer_token(request):
+    """
+    Extract a bearer token from the request's `Authorization` header.
+
+    :param obj request: The Flask request.
+    :rtype: str
+    :returns: The raw token, or None if the request doesn't carry one.
+    """
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+
+    return token.strip()
+
+
+def verify_access_token(token, secret, application_href):
+    """
+    Verify a Stormpath access token locally.
+
+    This checks the token's signature and expiration time, ensures the token
+    is an access token (not a refresh token), and that it was issued by the
+    given Stormpath Application for an Account.
+
+    :param str token: The raw access token.
+    :param str secret: The Stormpath API key secret used to sign the token.
+    :param str application_href: The href of our Stormpath Application.
+    :rtype: dict
+    :returns: The token's claims, or None if the token is invalid.
+    """
+    try:
+        if get_unverified_header(token).get('stt') != 'access':
+            return None
+
+        claims = decode(token, secret, algorithms=['HS256'])
+    except InvalidTokenError:
+        return None
+
+    if claims.get('iss') != application_href or not claims.get('sub'):
+        return None
+
+    return claims
@@ -0,0 +1,108 @@
+"""A tuned HTTP transport for talking to the Stormpath API."""
+
+
+from threading import Lock
+
+from requests.adapters import HTTPAdapter
+
+
+def _make_counting_pool_cls(pool_cls, adapter):
+    """
+    Build a subclass of the given connection pool class whose connections
+    report every (re)connect to the given adapter.
+
+    :param obj pool_cls: A `urllib3` connection pool class.
+    :param obj adapter: The :class:`PooledHTTPAdapter` to report to.
+    :rtype: obj
+    """
+    base_connection_cls = pool_cls.ConnectionCls
+
+    class CountingConnection(base_connection_cls):
+        def connect(self):
+            adapter._count('connections_opened')
+            return super(CountingConnection, self).connect()
+
+    return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': CountingConnection})
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    A `requests` transport adapter which keeps a pool of persistent
+    connections to the Stormpath API, and applies default timeouts to every
+    call.
+
+    One adapter is mounted on each Stormpath Client, so all requests (and all
+    threads) served by a worker share the same connection pool.  The
+    underlying pools are thread-safe.
+
+    :param int pool_size: The maximum number of connections to keep open.
+    :param bool keep_alive: Should connections be reused across calls?  If
+        not, every call opens (and closes) its own connection.
+    :param obj connect_timeout: (optional) A `timedelta` object which controls
+        how long we'll wait to connect to Stormpath.
+    :param obj read_timeout: (optional) A `timedelta` object which controls how
+        long we'll wait for Stormpath to respond.
+    """
+    def __init__(self, pool_size, keep_alive=True, connect_timeout=None, read_timeout=None):
+        self.keep_alive = keep_alive
+        self._counters = {'connections_opened': 0, 'requests': 0}
+        self._counters_lock = Lock()
+        self.timeout = (
+            connect_timeout.total_seconds() if connect_timeout else None,
+            read_timeout.total_seconds() if read_timeout else None,
+        )
+
+        super(PooledHTTPAdapter, self).__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """
+        Initialize our pool manager, making it count every connection it opens.
+        """
+        super(PooledHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = dict(
+            (scheme, _make_counting_pool_cls(pool_cls, self))
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        )
+
+    def _count(self, name):
+        """
+        Increment one of our counters.
+
+        :param str name: The counter name.
+        """
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def send(self, request, **kwargs):
+        """
+        Send a request, applying our default timeouts (unless the caller
+        specified their own).
+        """
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+
+        if not self.keep_alive:
+            request.headers['Connection'] = 'close'
+
+        self._count('requests')
+
+        return super(PooledHTTPAdapter, self).send(request, **kwargs)
+
+    @property
+    def stats(self):
+        """
+        Return connection statistics for this adapter.
+
+        :rtype: dict
+        :returns: The number of connections opened, and the number of requests
+            which reused an already open connection.
+        """
+        with self._counters_lock:
+            opened = self._counters['connections_opened']
+            made = self._counters['requests']
+
+        return {
+            'connections_opened': opened,
+            'connections_reused': max(made - opened, 0),
+        }
@@ -2,7 +2,6 @@
 
 import sys
 
-from facebook import get_user_from_cookie
 from flask import (
     abort,
     current_app,
@@ -13,14 +12,12 @@ from flask import (
 )
 from flask_login import login_user
 from six import string_types
-from stormpath.resources.provider import Provider
 
 from . import StormpathError, logout_user
 from .forms import (
     ChangePasswordForm,
     ForgotPasswordForm,
     LoginForm,
-    RegistrationForm,
 )
 from .models import User
 
@@ -36,7 +33,8 @@ def register():
     template that is used to render this page can all be controlled via
     Flask-Stormpath settings.
     """
-    form = RegistrationForm(config=current_app.config)
+    settings = current_app.stormpath_settings
+    form = settings.registration_form()
 
     # If we received a POST request with valid information, we'll continue
     # processing.
@@ -62,20 +60,16 @@ def register():
             login_user(account, remember=True)
 
             # The email address must be verified, so pop an alert about it.
-            if current_app.config['STORMPATH_VERIFY_EMAIL'] is True:
+            if settings.verify_email is True:
                 flash('You must validate your email address before logging in. Please check your email for instructions.')
 
-            if 'STORMPATH_REGISTRATION_REDIRECT_URL' in current_app.config:
-                redirect_url = current_app.config['STORMPATH_REGISTRATION_REDIRECT_URL']
-            else:
-                redirect_url = current_app.config['STORMPATH_REDIRECT_URL']
-            return redirect(redirect_url)
+            return redirect(settings.registration_redirect_url)
 
         except StormpathError as err:
             flash(err.message)
 
     return render_template(
-        current_app.config['STORMPATH_REGISTRATION_TEMPLATE'],
+        settings.registration_template,
         form = form,
     )
 
@@ -91,6 +85,7 @@ def login():
     template that is used to render this page can all be controlled via
     Flask-Stormpath settings.
     """
+    settings = current_app.stormpath_settings
     form = LoginForm()
 
     # If we received a POST request with valid information, we'll continue
@@ -107,12 +102,12 @@ def login():
             # query parameter, or the STORMPATH_REDIRECT_URL setting.
             login_user(account, remember=True)
 
-            return redirect(request.args.get('next') or current_app.config['STORMPATH_REDIRECT_URL'])
+            return redirect(request.args.get('next') or settings.redirect_url)
         except StormpathError as err:
             flash(err.message)
 
     return render_template(
-        current_app.config['STORMPATH_LOGIN_TEMPLATE'],
+        settings.login_template,
         form = form,
     )
 
@@ -128,6 +123,7 @@ def forgot():
     The URL this view is bound to, and the template that is used to render
     this page can all be controlled via Flask-Stormpath settings.
     """
+    settings = current_app.stormpath_settings
     form = ForgotPasswordForm()
 
     # If we received a POST request with valid information, we'll continue
@@ -143,7 +139,7 @@ def forgot():
             # user, we'll display a success page prompting the user to check
             # their inbox to complete the password reset process.
             return render_template(
-                current_app.config['STORMPATH_FORGOT_PASSWORD_EMAIL_SENT_TEMPLATE'],
+                settings.forgot_password_email_sent_template,
                 user = account,
             )
         except StormpathError as err:
@@ -158,7 +154,7 @@ def forgot():
                 flash('Invalid email address.')
 
     return render_template(
-        current_app.config['STORMPATH_FORGOT_PASSWORD_TEMPLATE'],
+        settings.forgot_password_template,
         form = form,
     )
 
@@ -174,6 +170,8 @@ def forgot_change():
     The URL this view is bound to, and the template that is used to render
     this page can all be controlled via Flask-Stormpath settings.
     """
+    settings = current_app.stormpath_settings
+
     try:
         account = current_app.stormpath_manager.application.verify_password_reset_token(request.args.get('sptoken'))
     except StormpathError as err:
@@ -193,7 +191,7 @@ def forgot_change():
             account = User.from_login(account.email, form.password.data)
             login_user(account, remember=True)
 
-            return render_template(current_app.config['STORMPATH_FORGOT_PASSWORD_COMPLETE_TEMPLATE'])
+            return render_template(settings.forgot_password_complete_template)
         except StormpathError as err:
             if isinstance(err.message, string_types) and 'https' in err.message.lower():
                 flash('Something went wrong! Please try again.')
@@ -206,7 +204,7 @@ def forgot_change():
         flash("Passwords don't match.")
 
     return render_template(
-        current_app.config['STORMPATH_FORGOT_PASSWORD_CHANGE_TEMPLATE'],
+        settings.forgot_password_change_template,
         form = form,
     )
 
@@ -236,12 +234,17 @@ def facebook_login():
     The location this view redirects users to can be configured via
     Flask-Stormpath settings.
     """
+    from facebook import get_user_from_cookie
+    from stormpath.resources.provider import Provider
+
+    settings = current_app.stormpath_settings
+
     # First, we'll try to grab the Facebook user's data by accessing their
     # session data.
     facebook_user = get_user_from_cookie(
         request.cookies,
-        current_app.config['STORMPATH_SOCIAL']['FACEBOOK']['app_id'],
-        current_app.config['STORMPATH_SOCIAL']['FACEBOOK']['app_secret'],
+        settings.social['FACEBOOK']['app_id'],
+        settings.social['FACEBOOK']['app_secret'],
     )
 
     # Now, we'll try to have Stormpath either create or update this user's
@@ -274,8 +277,8 @@ def facebook_login():
         dir = current_app.stormpath_manager.client.directories.create({
             'name': current_app.stormpath_manager.application.name + '-facebook',
             'provider': {
-                'client_id': current_app.config['STORMPATH_SOCIAL']['FACEBOOK']['app_id'],
-                'client_secret': current_app.config['STORMPATH_SOCIAL']['FACEBOOK']['app_secret'],
+                'client_id': settings.social['FACEBOOK']['app_id'],
+                'client_secret': settings.social['FACEBOOK']['app_secret'],
                 'provider_id': Provider.FACEBOOK,
             },
         })
@@ -297,7 +300,7 @@ def facebook_login():
     # Facebook user will be treated exactly like a normal Stormpath user!
     login_user(account, remember=True)
 
-    return redirect(request.args.get('next') or current_app.config['STORMPATH_REDIRECT_URL'])
+    return redirect(request.args.get('next') or settings.redirect_url)
 
 
 def google_login():
@@ -315,6 +318,10 @@ def google_login():
     The location this view redirects users to can be configured via
     Flask-Stormpath settings.
     """
+    from stormpath.resources.provider import Provider
+
+    settings = current_app.stormpath_settings
+
     # First, we'll try to grab the 'code' query string that Google should be
     # passing to us.  If this doesn't exist, we'll abort with a 400 BAD REQUEST
     # (since something horrible must have happened).
@@ -351,9 +358,9 @@ def google_login():
         dir = current_app.stormpath_manager.client.directories.create({
             'name': current_app.stormpath_manager.application.name + '-google',
             'provider': {
-                'client_id': current_app.config['STORMPATH_SOCIAL']['GOOGLE']['client_id'],
-                'client_secret': current_app.config['STORMPATH_SOCIAL']['GOOGLE']['client_secret'],
-                'redirect_uri': request.url_root[:-1] + current_app.config['STORMPATH_GOOGLE_LOGIN_URL'],
+                'client_id': settings.social['GOOGLE']['client_id'],
+                'client_secret': settings.social['GOOGLE']['client_secret'],
+                'redirect_uri': request.url_root[:-1] + settings.google_login_url,
                 'provider_id': Provider.GOOGLE,
             },
         })
@@ -375,7 +382,7 @@ def google_login():
     # Google user will be treated exactly like a normal Stormpath user!
     login_user(account, remember=True)
 
-    return redirect(request.args.get('next') or current_app.config['STORMPATH_REDIRECT_URL'])
+    return redirect(request.args.get('next') or settings.redirect_url)
 
 
 def logout():
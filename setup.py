@@ -53,6 +53,8 @@ setup(
         'Flask-WTF>=0.9.5',
         'facebook-sdk==2.0.0',
         'oauth2client==1.5.2',
+        'PyJWT>=1.0.0',
+        'requests>=2.4.0',
         'stormpath==2.4.4',
         'blinker==1.4'
     ],
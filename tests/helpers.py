@@ -11,10 +11,19 @@ from unittest import TestCase
 from uuid import uuid4
 
 from flask import Flask
-from flask.ext.stormpath import StormpathManager
+from flask_stormpath import StormpathManager
+from flask_stormpath.testing import FakeStormpath
 from stormpath.client import Client
 
 
+# Our tests run against the real Stormpath API.  If `STORMPATH_FAKE_API=1` is
+# set, they run offline instead, against a local fake Stormpath API (which is
+# started the first time it's needed).
+USE_FAKE_API = environ.get('STORMPATH_FAKE_API') == '1'
+
+_fake_stormpath = None
+
+
 class StormpathTestCase(TestCase):
     """
     Custom test case which bootstraps a Stormpath client, application, and Flask
@@ -25,9 +34,14 @@ class StormpathTestCase(TestCase):
 
     When a test finishes, we'll delete all Stormpath resources that were
     created.
+
+    If tests are running against the fake Stormpath API, it's available as
+    `self.stormpath` (so tests can inject errors, count API calls, etc.).
+    Otherwise, `self.stormpath` is None.
     """
     def setUp(self):
         """Provision a new Client, Application, and Flask app."""
+        self.stormpath = bootstrap_stormpath()
         self.client = bootstrap_client()
         self.application = bootstrap_app(self.client)
         self.app = bootstrap_flask_app(self.application)
@@ -52,6 +66,51 @@ class SignalReceiver(object):
         self.received_signals.append((sender, user))
 
 
+def bootstrap_stormpath():
+    """
+    Start the fake Stormpath API, if our tests are running against it.
+
+    The fake API is shared by every test (each test creates its own,
+    uniquely named, Application, so tests don't interfere with each other).
+
+    :rtype: obj
+    :returns: The FakeStormpath API, or None if tests are running against the
+        real Stormpath API.
+    """
+    global _fake_stormpath
+
+    if USE_FAKE_API and _fake_stormpath is None:
+        _fake_stormpath = FakeStormpath()
+        _fake_stormpath.start()
+
+    return _fake_stormpath
+
+
+def get_api_key():
+    """
+    Return the Stormpath credentials our tests use.
+
+    :rtype: tuple
+    :returns: The (id, secret) of the API key.
+    """
+    if USE_FAKE_API:
+        return 'fake-id', 'fake-secret'
+
+    return environ.get('STORMPATH_API_KEY_ID'), environ.get('STORMPATH_API_KEY_SECRET')
+
+
+def get_base_url():
+    """
+    Return the base URL of the Stormpath API our tests use.
+
+    :rtype: str
+    :returns: The base URL, or None for the real Stormpath API.
+    """
+    stormpath = bootstrap_stormpath()
+
+    return stormpath.base_url if stormpath is not None else None
+
+
 def bootstrap_client():
     """
     Create a new Stormpath Client from environment variables.
@@ -59,9 +118,13 @@ def bootstrap_client():
     :rtype: obj
     :returns: A new Stormpath Client, fully initialized.
     """
+    id, secret = get_api_key()
+    options = {'base_url': get_base_url()} if USE_FAKE_API else {}
+
     return Client(
-        id = environ.get('STORMPATH_API_KEY_ID'),
-        secret = environ.get('STORMPATH_API_KEY_SECRET'),
+        id = id,
+        secret = secret,
+        **options
     )
 
 
@@ -97,8 +160,8 @@ def bootstrap_flask_app(app):
     a = Flask(__name__)
     a.config['DEBUG'] = True
     a.config['SECRET_KEY'] = uuid4().hex
-    a.config['STORMPATH_API_KEY_ID'] = environ.get('STORMPATH_API_KEY_ID')
-    a.config['STORMPATH_API_KEY_SECRET'] = environ.get('STORMPATH_API_KEY_SECRET')
+    a.config['STORMPATH_API_KEY_ID'], a.config['STORMPATH_API_KEY_SECRET'] = get_api_key()
+    a.config['STORMPATH_BASE_URL'] = get_base_url()
     a.config['STORMPATH_APPLICATION'] = app.name
     a.config['WTF_CSRF_ENABLED'] = False
     StormpathManager(a)
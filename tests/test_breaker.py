@@ -0,0 +1,143 @@
+"""Run tests against our circuit breaker."""
+
+
+from datetime import timedelta
+from time import sleep
+from unittest import TestCase
+
+from flask_stormpath import User
+from flask_stormpath.breaker import CircuitBreaker, CircuitOpenError, is_outage
+from stormpath.error import Error as StormpathError
+
+from .helpers import StormpathTestCase
+
+
+def fail(status=500):
+    raise StormpathError({'status': status, 'message': 'Oops.'})
+
+
+class TestIsOutage(TestCase):
+
+    def test_is_outage(self):
+        self.assertTrue(is_outage(StormpathError({'status': 500})))
+        self.assertTrue(is_outage(StormpathError({'status': 429})))
+        self.assertTrue(is_outage(IOError()))
+        self.assertTrue(is_outage(CircuitOpenError()))
+        self.assertFalse(is_outage(StormpathError({'status': 400})))
+        self.assertFalse(is_outage(StormpathError({'status': 404})))
+        self.assertFalse(is_outage(ValueError()))
+
+
+class TestCircuitBreaker(TestCase):
+    """Ensure our circuit breaker opens, rejects, and recovers properly."""
+
+    def make_breaker(self, **kwargs):
+        options = {
+            'window': 10,
+            'min_calls': 4,
+            'error_rate': 0.5,
+            'slow_call': None,
+            'reset_timeout': timedelta(seconds=0.1),
+        }
+        options.update(kwargs)
+
+        return CircuitBreaker(**options)
+
+    def test_opens_on_error_rate(self):
+        breaker = self.make_breaker()
+        self.assertEqual(breaker.call(lambda: 1), 1)
+        self.assertEqual(breaker.call(lambda: 2), 2)
+        self.assertRaises(StormpathError, breaker.call, fail)
+        self.assertEqual(breaker.state, 'closed')
+
+        self.assertRaises(StormpathError, breaker.call, fail)
+        self.assertEqual(breaker.state, 'open')
+
+        self.assertRaises(CircuitOpenError, breaker.call, lambda: 3)
+        self.assertEqual(breaker.stats['rejected'], 1)
+        self.assertEqual(breaker.stats['opened'], 1)
+
+    def test_ignores_client_errors(self):
+        breaker = self.make_breaker()
+        for _ in range(10):
+            self.assertRaises(StormpathError, breaker.call, fail, 400)
+
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(breaker.stats['failures'], 0)
+
+    def test_counts_slow_calls(self):
+        breaker = self.make_breaker(min_calls=2, slow_call=timedelta(seconds=0.01))
+        breaker.call(sleep, 0.02)
+        breaker.call(sleep, 0.02)
+
+        self.assertEqual(breaker.state, 'open')
+
+    def test_half_open(self):
+        breaker = self.make_breaker()
+        breaker.trip()
+        self.assertEqual(breaker.state, 'open')
+
+        # After the reset timeout, a failed trial call opens the breaker again.
+        sleep(0.15)
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertRaises(StormpathError, breaker.call, fail)
+        self.assertEqual(breaker.state, 'open')
+
+        # And a successful trial call closes it.
+        sleep(0.15)
+        self.assertEqual(breaker.call(lambda: 1), 1)
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(breaker.stats['opened'], 2)
+
+    def test_interrupted_trial(self):
+        breaker = self.make_breaker()
+        breaker.trip()
+        sleep(0.15)
+
+        def interrupt():
+            raise KeyboardInterrupt()
+
+        # An interrupted trial call counts as a failure, rather than leaving
+        # the breaker half-open with a trial call that never finishes.
+        self.assertRaises(KeyboardInterrupt, breaker.call, interrupt)
+        self.assertEqual(breaker.state, 'open')
+
+        sleep(0.15)
+        self.assertEqual(breaker.call(lambda: 1), 1)
+        self.assertEqual(breaker.state, 'closed')
+
+
+class TestServeStale(StormpathTestCase):
+    """Ensure the last known good users are served while the breaker is open."""
+
+    def setUp(self):
+        super(TestServeStale, self).setUp()
+        self.app.config['STORMPATH_CIRCUIT_BREAKER_ENABLED'] = True
+        self.app.stormpath_manager.init_breaker(self.app)
+        self.app.stormpath_manager.init_cache(self.app)
+
+        with self.app.app_context():
+            self.user = User.create(
+                given_name = 'Randall',
+                surname = 'Degges',
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+            )
+
+    def test_serves_stale_users(self):
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            user = manager.load_user(self.user.href)
+            self.assertEqual(user.email, self.user.email)
+
+            manager.breaker.trip()
+            self.assertEqual(manager.load_user(self.user.href).email, user.email)
+            self.assertEqual(manager.user_cache.stale_hits, 1)
+
+    def test_rejects_logins(self):
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            manager.breaker.trip()
+            self.assertRaises(CircuitOpenError, User.from_login, 'r@rdegges.com', 'woot1LoveCookies!')
@@ -0,0 +1,287 @@
+"""Run tests against our user cache."""
+
+
+from datetime import timedelta
+from threading import Event, Thread
+from time import sleep
+from unittest import TestCase
+
+from flask import Flask
+from flask_stormpath import StormpathManager
+from flask_stormpath.cache import SingleFlight, UserCache
+from flask_stormpath.invalidation import LocalTransport
+from flask_stormpath.models import User, UserSnapshot, _user_changed, user_deleted, user_updated
+from stormpath.resources.custom_data import CustomData
+
+from .helpers import StormpathTestCase
+
+
+class TestUserCache(TestCase):
+    """Ensure our LRU / TTL cache behaves properly."""
+
+    def test_get_and_set(self):
+        cache = UserCache(max_size=10, ttl=timedelta(minutes=5))
+        self.assertEqual(cache.get('a'), None)
+
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_expires_entries(self):
+        cache = UserCache(max_size=10, ttl=timedelta(seconds=0.1))
+        cache.set('a', 1)
+        sleep(0.2)
+
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_stale_reads(self):
+        cache = UserCache(max_size=10, ttl=timedelta(seconds=0.1), stale_ttl=timedelta(seconds=0.2))
+        cache.set('a', 1)
+        sleep(0.15)
+
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('a', stale=True), 1)
+        self.assertEqual(cache.stale_hits, 1)
+
+        sleep(0.2)
+        self.assertEqual(cache.get('a', stale=True), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = UserCache(max_size=2, ttl=timedelta(minutes=5))
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        # Touch 'a' so 'b' becomes the least recently used entry.
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_delete_and_clear(self):
+        cache = UserCache(max_size=10, ttl=timedelta(minutes=5))
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        cache.delete('a')
+        cache.delete('missing')
+        self.assertEqual(cache.get('a'), None)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class TestSingleFlight(TestCase):
+    """Ensure concurrent calls for the same key are coalesced."""
+
+    def run_concurrently(self, flight, key, func, count):
+        results = []
+        threads = [Thread(target=lambda: results.append(flight.do(key, func))) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+
+        return threads, results
+
+    def test_collapses_concurrent_calls(self):
+        flight = SingleFlight()
+        started = Event()
+        release = Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'user'
+
+        leader, results = self.run_concurrently(flight, 'a', func, 1)
+        started.wait()
+        followers, follower_results = self.run_concurrently(flight, 'a', func, 5)
+
+        # Wait until every follower is waiting on the leader's call.
+        while flight.stats['collapsed'] < 5:
+            sleep(0.01)
+
+        release.set()
+        for thread in leader + followers:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results + follower_results, ['user'] * 6)
+        self.assertEqual(flight.stats, {'calls': 1, 'collapsed': 5})
+
+        # Once the call is done, new calls aren't collapsed.
+        self.assertEqual(flight.do('a', lambda: 'again'), 'again')
+        self.assertEqual(flight.stats, {'calls': 2, 'collapsed': 5})
+
+    def test_shares_exceptions(self):
+        flight = SingleFlight()
+
+        def func():
+            raise ValueError('boom')
+
+        self.assertRaises(ValueError, flight.do, 'a', func)
+        self.assertEqual(flight.do('a', lambda: 1), 1)
+
+
+class TestCoalescedUserLoads(TestCase):
+    """Ensure concurrent loads of the same user each get their own copy."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SECRET_KEY'] = 'woot'
+        self.app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+        self.app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+        self.app.config['STORMPATH_APPLICATION'] = 'xxx'
+        self.manager = StormpathManager(self.app)
+
+        self.href = 'https://api.stormpath.com/v1/accounts/xxx'
+        self.started = Event()
+        self.release = Event()
+        self.manager._get_account = self.get_account
+
+    def get_account(self, href):
+        self.started.set()
+        self.release.wait(5)
+
+        custom_data = CustomData.__new__(CustomData)
+        custom_data.__dict__['data'] = {}
+
+        user = User.__new__(User)
+        user.__dict__.update({'href': href, 'given_name': 'Randall', 'custom_data': custom_data})
+
+        return user
+
+    def test_copies_coalesced_users(self):
+        users = []
+
+        def load():
+            with self.app.app_context():
+                users.append(self.manager.fetch_user(self.href))
+
+        threads = [Thread(target=load)]
+        threads[0].start()
+        self.started.wait(5)
+
+        threads.append(Thread(target=load))
+        threads[1].start()
+        while self.manager.user_fetches.stats['collapsed'] < 1:
+            sleep(0.01)
+
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.manager.user_fetches.stats, {'calls': 1, 'collapsed': 1})
+        first, second = users
+        self.assertIsNot(first, second)
+
+        # Modifying one caller's user doesn't affect the other's.
+        first.__dict__['given_name'] = 'Rando'
+        first.__dict__['custom_data'].__dict__['data']['favorite_color'] = 'blue'
+        self.assertEqual(second.__dict__['given_name'], 'Randall')
+        self.assertEqual(second.__dict__['custom_data'].__dict__['data'], {})
+
+
+class TestInvalidationHooks(TestCase):
+    """Ensure our own cache hooks don't make user signals build their payloads."""
+
+    def test_hooks(self):
+        receivers = (len(user_updated.receivers), len(user_deleted.receivers))
+
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'woot'
+        app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+        app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+        app.config['STORMPATH_APPLICATION'] = 'xxx'
+        app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        app.config['STORMPATH_INVALIDATION_ENABLED'] = True
+        app.config['STORMPATH_INVALIDATION_TRANSPORT'] = LocalTransport
+        manager = StormpathManager(app)
+
+        self.assertEqual((len(user_updated.receivers), len(user_deleted.receivers)), receivers)
+
+        href = 'https://api.stormpath.com/v1/accounts/xxx'
+        user = User.__new__(User)
+        user.__dict__['href'] = href
+        manager.user_cache.set(href, user)
+
+        _user_changed.send(user)
+        self.assertFalse(href in manager.user_cache)
+        self.assertEqual(manager.invalidation_bus.stats['published'], 1)
+        manager.invalidation_bus.close()
+
+
+class TestLoadUserCache(StormpathTestCase):
+    """Ensure the StormpathManager uses (and invalidates) the user cache."""
+
+    def setUp(self):
+        super(TestLoadUserCache, self).setUp()
+        self.app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        self.app.stormpath_manager.init_cache(self.app)
+
+        with self.app.app_context():
+            self.user = User.create(
+                given_name = 'Randall',
+                surname = 'Degges',
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+            )
+
+    def test_caches_loaded_users(self):
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            user = manager.load_user(self.user.href)
+            cached = manager.load_user(self.user.href)
+            self.assertEqual(cached.href, user.href)
+            self.assertEqual(manager.user_cache.hits, 1)
+
+    def test_copies_cached_users(self):
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            manager.load_user(self.user.href)
+
+            # Each request gets its own copy of the cached user, so modifying
+            # it doesn't affect anyone else.
+            user = manager.load_user(self.user.href)
+            self.assertIsNot(manager.load_user(self.user.href), user)
+
+            user.given_name = 'Rando'
+            user.custom_data['favorite_color'] = 'blue'
+
+            cached = manager.load_user(self.user.href)
+            self.assertEqual(cached.given_name, 'Randall')
+            self.assertNotIn('favorite_color', cached.custom_data)
+            self.assertFalse(cached.is_dirty)
+
+    def test_invalidates_on_update(self):
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            manager.load_user(self.user.href)
+            self.assertTrue(self.user.href in manager.user_cache)
+
+            self.user.middle_name = 'Clark'
+            self.user.save()
+            self.assertFalse(self.user.href in manager.user_cache)
+
+    def test_caches_snapshots(self):
+        manager = self.app.stormpath_manager
+        self.app.config['STORMPATH_USER_CACHE_SNAPSHOTS'] = True
+        manager.init_cache(self.app)
+
+        with self.app.app_context():
+            self.assertIsInstance(manager.load_user(self.user.href), User)
+
+            # Each request gets its own copy of the cached snapshot.
+            user = manager.load_user(self.user.href)
+            self.assertIsInstance(user, UserSnapshot)
+            self.assertIsNot(manager.load_user(self.user.href), user)
+            self.assertEqual(user.email, 'r@rdegges.com')
@@ -1,8 +1,10 @@
 """Run tests against our custom context processors."""
 
 
+from flask import render_template_string
 from flask.ext.stormpath import User, user
 from flask.ext.stormpath.context_processors import user_context_processor
+from flask.ext.stormpath.decorators import user_context_exempt
 
 from .helpers import StormpathTestCase
 
@@ -32,7 +34,7 @@ class TestUserContextProcessor(StormpathTestCase):
 
             self.assertIsInstance(user_context_processor(), dict)
             self.assertTrue(user_context_processor().get('user'))
-            self.assertIsInstance(user_context_processor()['user'], User)
+            self.assertIsInstance(user_context_processor()['user']._get_current_object(), User)
 
     def test_works(self):
         with self.app.test_client() as c:
@@ -42,3 +44,56 @@ class TestUserContextProcessor(StormpathTestCase):
             })
 
             self.assertEqual(user.href, self.user.href)
+
+    def test_is_lazy(self):
+        loaded = []
+        load_user = self.app.login_manager.user_callback
+
+        def counting_load_user(account_href):
+            loaded.append(account_href)
+            return load_user(account_href)
+
+        self.app.login_manager.user_callback = counting_load_user
+
+        @self.app.route('/static-page')
+        def static_page():
+            return render_template_string('hello, world')
+
+        @self.app.route('/user-page')
+        def user_page():
+            return render_template_string('{{ user.email }}')
+
+        with self.app.test_client() as c:
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            # Templates which don't use `user` shouldn't load the user.
+            c.get('/static-page')
+            self.assertEqual(loaded, [])
+
+            resp = c.get('/user-page')
+            self.assertEqual(resp.data.decode('utf-8'), self.user.email)
+            self.assertEqual(loaded, [self.user.href])
+
+    def test_exempt_endpoints(self):
+        @self.app.route('/decorated')
+        @user_context_exempt
+        def decorated():
+            return render_template_string('{{ user.is_authenticated }}')
+
+        @self.app.route('/configured')
+        def configured():
+            return render_template_string('{{ user.is_authenticated }}')
+
+        self.app.stormpath_manager.reload_settings(STORMPATH_USER_CONTEXT_EXEMPT = ['configured'])
+
+        with self.app.test_client() as c:
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            self.assertEqual(c.get('/decorated').data.decode('utf-8'), 'False')
+            self.assertEqual(c.get('/configured').data.decode('utf-8'), 'False')
@@ -1,8 +1,16 @@
 """Run tests against our custom decorators."""
 
 
-from flask.ext.stormpath import User
-from flask.ext.stormpath.decorators import groups_required
+from datetime import timedelta
+from time import sleep
+from unittest import TestCase
+
+from flask import Flask
+from flask_stormpath import StormpathManager, User
+from flask_stormpath.breaker import CircuitOpenError
+from flask_stormpath.decorators import _resolve_group, groups_required
+from stormpath.error import Error as StormpathError
+from werkzeug.exceptions import ServiceUnavailable
 
 from .helpers import StormpathTestCase
 
@@ -107,3 +115,166 @@ class TestGroupsRequired(StormpathTestCase):
             # to one of the required groups.
             resp = c.get('/test')
             self.assertEqual(resp.status_code, 200)
+
+    def test_accepts_group_objects_and_hrefs(self):
+        @self.app.route('/test')
+        @groups_required([self.admins, self.developers.href])
+        def some_view():
+            return 'hello, world'
+
+        with self.app.test_client() as c:
+
+            # Log our user in.
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 302)
+
+            self.user.add_group(self.admins)
+            self.user.add_group(self.developers)
+
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 200)
+
+    def test_memoizes_group_names(self):
+        @self.app.route('/test')
+        @groups_required(['admins'])
+        def some_view():
+            return 'hello, world'
+
+        with self.app.test_client() as c:
+
+            # Log our user in.
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            self.user.add_group(self.admins)
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 200)
+
+            # Ensure the group name was resolved to its href exactly once.
+            self.assertEqual(
+                self.app.stormpath_manager.group_hrefs_by_name,
+                {'admins': frozenset([self.admins.href])},
+            )
+
+    def test_group_cache(self):
+        self.app.config['STORMPATH_GROUP_CACHE_ENABLED'] = True
+        self.app.stormpath_manager.init_cache(self.app)
+
+        @self.app.route('/test')
+        @groups_required(['admins'])
+        def some_view():
+            return 'hello, world'
+
+        with self.app.test_client() as c:
+
+            # Log our user in.
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 302)
+
+            # Since our user's memberships are cached, adding a group won't be
+            # noticed until the cache entry is invalidated.
+            self.user.add_group(self.admins)
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 302)
+
+            self.app.stormpath_manager.group_cache.delete(self.user.href)
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 200)
+
+    def test_group_expressions(self):
+        @self.app.route('/test')
+        @groups_required('admins or (developers and not testers)')
+        def some_view():
+            return 'hello, world'
+
+        testers = self.application.groups.create({
+            'name': 'testers',
+        })
+
+        with self.app.test_client() as c:
+
+            # Log our user in.
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 302)
+
+            self.user.add_group(self.developers)
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 200)
+
+            self.user.add_group(testers)
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 302)
+
+            self.user.add_group(self.admins)
+            resp = c.get('/test')
+            self.assertEqual(resp.status_code, 200)
+
+
+class TestResolveGroup(TestCase):
+    """Ensure group names are resolved sparingly, and outages are handled."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SECRET_KEY'] = 'woot'
+        self.app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+        self.app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+        self.app.config['STORMPATH_APPLICATION'] = 'xxx'
+        self.app.config['STORMPATH_UNKNOWN_GROUP_TTL'] = timedelta(seconds=0.1)
+        self.manager = StormpathManager(self.app)
+
+        self.searches = []
+        self.results = frozenset()
+        self.manager.call_api = self.search
+
+    def search(self, func):
+        self.searches.append(func)
+        if isinstance(self.results, Exception):
+            raise self.results
+
+        return self.results
+
+    def test_remembers_unknown_names(self):
+        with self.app.app_context():
+            self.assertEqual(_resolve_group('admins'), frozenset())
+            self.assertEqual(_resolve_group('admins'), frozenset())
+            self.assertEqual(len(self.searches), 1)
+
+            # Once the TTL has passed, the name is searched for again.
+            sleep(0.15)
+            self.results = frozenset(['https://api.stormpath.com/v1/groups/xxx'])
+            self.assertEqual(_resolve_group('admins'), self.results)
+            self.assertEqual(_resolve_group('admins'), self.results)
+            self.assertEqual(len(self.searches), 2)
+
+    def test_reloaded_ttl(self):
+        self.manager.reload_settings(STORMPATH_UNKNOWN_GROUP_TTL = timedelta(0))
+
+        with self.app.app_context():
+            _resolve_group('admins')
+            _resolve_group('admins')
+            self.assertEqual(len(self.searches), 2)
+
+    def test_outages(self):
+        with self.app.app_context():
+            self.results = CircuitOpenError()
+            self.assertRaises(ServiceUnavailable, _resolve_group, 'admins')
+
+            self.results = StormpathError({'status': 400, 'message': 'Oops.'})
+            self.assertRaises(StormpathError, _resolve_group, 'admins')
@@ -0,0 +1,161 @@
+"""Run tests against our asynchronous signal dispatcher."""
+
+
+from os import WNOHANG, _exit, fork, kill, waitpid
+from signal import SIGKILL
+from threading import Event, current_thread
+from time import sleep, time
+from unittest import TestCase
+
+from blinker import Namespace
+from flask import Flask, current_app
+
+from flask_stormpath.dispatch import SignalDispatcher
+
+
+class TestSignalDispatcher(TestCase):
+    """Ensure receivers are run in the background properly."""
+
+    def setUp(self):
+        self.signal = Namespace().signal('user-updated')
+
+    def test_runs_receivers_in_background(self):
+        dispatcher = SignalDispatcher(threads=2, queue_size=10)
+        received = []
+
+        def receiver(sender, user):
+            received.append((sender, user, current_thread()))
+
+        dispatcher.connect(self.signal, receiver)
+        self.signal.send('sender', user={'href': 'a'})
+
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0][:2], ('sender', {'href': 'a'}))
+        self.assertNotEqual(received[0][2], current_thread())
+        self.assertEqual(dispatcher.stats['delivered'], 1)
+
+    def test_orders_signals_per_user(self):
+        dispatcher = SignalDispatcher(threads=4, queue_size=1000)
+        received = {}
+
+        def receiver(sender, user):
+            received.setdefault(user['href'], []).append(user['version'])
+
+        dispatcher.connect(self.signal, receiver)
+        for version in range(50):
+            for href in ('a', 'b', 'c'):
+                self.signal.send(None, user={'href': href, 'version': version})
+
+        self.assertTrue(dispatcher.join(5))
+        for href in ('a', 'b', 'c'):
+            self.assertEqual(received[href], list(range(50)))
+
+    def test_drop_policy(self):
+        dispatcher = SignalDispatcher(threads=1, queue_size=1, policy='drop')
+        release = Event()
+
+        dispatcher.connect(self.signal, lambda sender, user: release.wait(5))
+        for _ in range(5):
+            self.signal.send(None, user={'href': 'a'})
+
+        # One signal is being delivered, and one is queued.
+        self.assertTrue(dispatcher.stats['dropped'] >= 3)
+
+        release.set()
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(dispatcher.stats['delivered'] + dispatcher.stats['dropped'], 5)
+
+    def test_caller_policy(self):
+        dispatcher = SignalDispatcher(threads=1, queue_size=1, policy='caller')
+        release = Event()
+        threads = []
+
+        def receiver(sender, user):
+            threads.append(current_thread())
+            if user['href'] == 'first':
+                release.wait(5)
+
+        dispatcher.connect(self.signal, receiver)
+        for href in ('first', 'a', 'b'):
+            self.signal.send(None, user={'href': href})
+
+        self.assertIn(current_thread(), threads)
+        self.assertTrue(dispatcher.stats['inline'] >= 1)
+
+        release.set()
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(dispatcher.stats['delivered'], 3)
+
+    def test_counts_failures(self):
+        dispatcher = SignalDispatcher(threads=1, queue_size=10)
+
+        def receiver(sender, user):
+            raise ValueError
+
+        dispatcher.connect(self.signal, receiver)
+        self.signal.send(None, user={'href': 'a'})
+
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(dispatcher.stats['failed'], 1)
+
+    def test_disconnect(self):
+        dispatcher = SignalDispatcher(threads=1, queue_size=10)
+        received = []
+
+        def receiver(sender, user):
+            received.append(user)
+
+        dispatcher.connect(self.signal, receiver)
+        dispatcher.disconnect(self.signal, receiver)
+        self.signal.send(None, user={'href': 'a'})
+
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(received, [])
+        self.assertEqual(dispatcher.stats['dispatched'], 0)
+
+    def test_pushes_app_context(self):
+        app = Flask(__name__)
+        dispatcher = SignalDispatcher(threads=1, queue_size=10)
+        apps = []
+
+        dispatcher.connect(self.signal, lambda sender, user: apps.append(current_app._get_current_object()))
+        with app.app_context():
+            self.signal.send(None, user={'href': 'a'})
+
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(apps, [app])
+
+    def test_survives_fork_while_locked(self):
+        dispatcher = SignalDispatcher(threads=1, queue_size=10)
+        received = []
+        dispatcher.connect(self.signal, lambda sender, user: received.append(user))
+        self.signal.send(None, user={'href': 'a'})
+        self.assertTrue(dispatcher.join(5))
+
+        # Fork while another thread holds the dispatcher's lock.
+        dispatcher._lock.acquire()
+        pid = fork()
+        if not pid:
+            status = 1
+            try:
+                self.signal.send(None, user={'href': 'b'})
+                if dispatcher.join(5) and received == [{'href': 'a'}, {'href': 'b'}]:
+                    status = 0
+            finally:
+                _exit(status)
+
+        dispatcher._lock.release()
+
+        deadline = time() + 10
+        while time() < deadline:
+            finished, status = waitpid(pid, WNOHANG)
+            if finished:
+                break
+            sleep(0.01)
+        else:
+            kill(pid, SIGKILL)
+            waitpid(pid, 0)
+            self.fail('The forked process deadlocked.')
+
+        self.assertEqual(status, 0)
@@ -0,0 +1,48 @@
+"""Run tests against our Group expression compiler."""
+
+
+from unittest import TestCase
+
+from flask_stormpath.errors import ConfigurationError
+from flask_stormpath.expressions import compile_expression
+
+
+class TestCompileExpression(TestCase):
+
+    def evaluate(self, expression, groups):
+        return compile_expression(expression)(lambda group: group in groups)
+
+    def test_single_group(self):
+        self.assertTrue(self.evaluate('admins', {'admins'}))
+        self.assertFalse(self.evaluate('admins', {'developers'}))
+
+    def test_operators(self):
+        self.assertTrue(self.evaluate('admins and developers', {'admins', 'developers'}))
+        self.assertFalse(self.evaluate('admins and developers', {'admins'}))
+        self.assertTrue(self.evaluate('admins or developers', {'developers'}))
+        self.assertFalse(self.evaluate('admins or developers', set()))
+        self.assertTrue(self.evaluate('not admins', set()))
+        self.assertFalse(self.evaluate('NOT admins', {'admins'}))
+
+    def test_precedence_and_parentheses(self):
+        # `and` binds tighter than `or`.
+        self.assertTrue(self.evaluate('admins or developers and testers', {'admins'}))
+        self.assertFalse(self.evaluate('(admins or developers) and testers', {'admins'}))
+        self.assertTrue(self.evaluate('not (admins or developers)', {'testers'}))
+
+    def test_quoted_names(self):
+        self.assertTrue(self.evaluate('"contractors team" and \'or\'', {'contractors team', 'or'}))
+
+    def test_short_circuits(self):
+        checked = []
+
+        def has_group(group):
+            checked.append(group)
+            return group == 'admins'
+
+        self.assertTrue(compile_expression('admins or developers')(has_group))
+        self.assertEqual(checked, ['admins'])
+
+    def test_invalid_expressions(self):
+        for expression in ('', 'admins and', '(admins', 'admins)', 'admins developers', 'not'):
+            self.assertRaises(ConfigurationError, compile_expression, expression)
@@ -0,0 +1,56 @@
+"""Run tests against our forms."""
+
+
+from unittest import TestCase
+
+from flask import Flask
+from werkzeug.datastructures import MultiDict
+
+from flask_stormpath.forms import RegistrationForm, get_registration_form
+from flask_stormpath.settings import init_settings
+
+
+class TestRegistrationForm(TestCase):
+    """Ensure registration form classes are built once per configuration."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SECRET_KEY'] = 'woot'
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        init_settings(self.app.config)
+
+    def validate(self, form_class, **data):
+        with self.app.test_request_context(method='POST'):
+            form = form_class(formdata=MultiDict(data))
+            form.validate()
+
+            return form.errors
+
+    def test_reuses_classes(self):
+        form_class = get_registration_form(self.app.config)
+        self.assertTrue(issubclass(form_class, RegistrationForm))
+        self.assertIs(get_registration_form(self.app.config), form_class)
+
+        self.app.config['STORMPATH_REQUIRE_SURNAME'] = False
+        self.assertIsNot(get_registration_form(self.app.config), form_class)
+
+    def test_requires_configured_fields(self):
+        self.app.config['STORMPATH_ENABLE_USERNAME'] = True
+        self.app.config['STORMPATH_REQUIRE_USERNAME'] = True
+        self.app.config['STORMPATH_REQUIRE_SURNAME'] = False
+
+        errors = self.validate(
+            get_registration_form(self.app.config),
+            email = 'r@rdegges.com',
+            password = 'woot1LoveCookies!',
+        )
+        self.assertEqual(sorted(errors), ['given_name', 'username'])
+
+        # Our base class (and its validators) are left untouched.
+        errors = self.validate(RegistrationForm, email='r@rdegges.com', password='woot1LoveCookies!')
+        self.assertEqual(errors, {})
+
+    def test_keeps_field_order(self):
+        with self.app.test_request_context():
+            names = [field.name for field in get_registration_form(self.app.config)()]
+            self.assertEqual(names, [field.name for field in RegistrationForm()])
@@ -0,0 +1,73 @@
+"""Make sure importing Flask-Stormpath stays cheap."""
+
+
+from json import loads
+from subprocess import PIPE, Popen
+from sys import executable, version_info
+from unittest import TestCase, skipIf
+
+
+# Modules which are only needed once one of our built-in views is used.
+LAZY_MODULES = ('flask_stormpath.views', 'flask_stormpath.forms', 'flask_wtf', 'wtforms', 'facebook', 'jwt')
+
+SCRIPT = """
+import json, sys
+
+from flask import Flask
+from flask_stormpath import StormpathManager, facebook_login, forgot, forgot_change, google_login, login, logout, register
+
+def loaded():
+    return sorted(name for name in %(modules)r if name in sys.modules)
+
+app = Flask(__name__)
+app.config['SECRET_KEY'] = 'woot'
+app.config['WTF_CSRF_ENABLED'] = False
+app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+app.config['STORMPATH_APPLICATION'] = 'xxx'
+StormpathManager(app)
+
+before = loaded()
+status = app.test_client().get('/login').status_code
+
+print(json.dumps({'before': before, 'status': status, 'after': loaded(), 'routed': app.view_functions['stormpath.login'] is login}))
+""" % {'modules': LAZY_MODULES}
+
+
+def run(*args):
+    """
+    Run a fresh Python interpreter, and return its output.
+
+    :rtype: tuple
+    :returns: The (stdout, stderr) of the interpreter.
+    """
+    process = Popen((executable,) + args, stdout=PIPE, stderr=PIPE)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise AssertionError(stderr.decode('utf-8'))
+
+    return stdout.decode('utf-8'), stderr.decode('utf-8')
+
+
+class TestLazyImports(TestCase):
+    """Ensure our views, forms, and social login SDKs are loaded lazily."""
+
+    def test_views_load_on_first_use(self):
+        result = loads(run('-c', SCRIPT)[0])
+
+        self.assertEqual(result['before'], [])
+        self.assertEqual(result['status'], 200)
+        self.assertTrue(result['routed'])
+        self.assertIn('flask_stormpath.views', result['after'])
+        self.assertIn('flask_stormpath.forms', result['after'])
+        self.assertNotIn('facebook', result['after'])
+
+    @skipIf(version_info < (3, 7), '-X importtime needs Python 3.7+')
+    def test_import_time(self):
+        # Each line of -X importtime output is:
+        #   import time: self [us] | cumulative | imported package
+        modules = [line.split('|')[2].strip() for line in run('-X', 'importtime', '-c', 'import flask_stormpath')[1].splitlines() if line.startswith('import time:')]
+
+        self.assertIn('flask_stormpath', modules)
+        for name in LAZY_MODULES:
+            self.assertNotIn(name, modules)
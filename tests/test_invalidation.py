@@ -0,0 +1,287 @@
+"""Run tests against our cross-process invalidation bus."""
+
+
+from datetime import timedelta
+from os import chmod, mkdir, stat, symlink
+from os.path import exists, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Lock
+from time import sleep, time
+from unittest import TestCase
+from uuid import uuid4
+
+from flask_stormpath import User
+from flask_stormpath.errors import ConfigurationError
+from flask_stormpath.invalidation import InvalidationBus, LocalTransport, UnixDatagramTransport
+from flask_stormpath.settings import init_settings
+
+from .helpers import StormpathTestCase
+
+
+def wait_for(condition, timeout=5):
+    """Wait until `condition()` is True (or the timeout passes)."""
+    deadline = time() + timeout
+    while not condition() and time() < deadline:
+        sleep(0.01)
+
+
+class Receiver(object):
+    """Collect every href received by a bus."""
+    def __init__(self):
+        self.hrefs = []
+        self.lock = Lock()
+
+    def __call__(self, href):
+        with self.lock:
+            self.hrefs.append(href)
+
+
+class CountingTransport(LocalTransport):
+    """A LocalTransport which counts the messages it sends."""
+    def __init__(self, *args, **kwargs):
+        super(CountingTransport, self).__init__(*args, **kwargs)
+        self.messages = 0
+        self.largest = 0
+
+    def send(self, data):
+        self.messages += 1
+        self.largest = max(self.largest, len(data))
+        return super(CountingTransport, self).send(data)
+
+
+class SmallTransport(CountingTransport):
+    """A CountingTransport which can only send small messages."""
+    max_message_size = 200
+
+
+class FailingTransport(LocalTransport):
+    """A LocalTransport which can't send anything."""
+    def send(self, data):
+        raise IOError('Oops.')
+
+
+class TestInvalidationBus(TestCase):
+    """Ensure hrefs are broadcast to (and received from) other buses."""
+
+    def setUp(self):
+        self.channel = uuid4().hex
+        self.buses = []
+
+    def tearDown(self):
+        for bus in self.buses:
+            bus.close()
+
+    def make_bus(self, transport=None, callback=None, **kwargs):
+        options = {
+            'batch_interval': timedelta(milliseconds=20),
+            'max_batch': 100,
+            'queue_size': 1000,
+        }
+        options.update(kwargs)
+
+        bus = InvalidationBus(transport or LocalTransport(self.channel), callback or Receiver(), **options)
+        bus.start()
+        self.buses.append(bus)
+
+        return bus
+
+    def test_broadcasts_hrefs(self):
+        receiver = Receiver()
+        sender = self.make_bus()
+        self.make_bus(callback=receiver)
+
+        sender.publish('a')
+        sender.publish('b')
+        wait_for(lambda: len(receiver.hrefs) == 2)
+
+        self.assertEqual(receiver.hrefs, ['a', 'b'])
+        self.assertEqual(sender.stats['published'], 2)
+        self.assertEqual(sender.stats['sent'], 2)
+
+    def test_ignores_own_hrefs(self):
+        receiver = Receiver()
+        bus = self.make_bus(callback=receiver)
+
+        bus.publish('a')
+        bus.flush()
+        sleep(0.1)
+
+        self.assertEqual(receiver.hrefs, [])
+
+    def test_batches_hrefs(self):
+        transport = CountingTransport(self.channel)
+        receiver = Receiver()
+        sender = self.make_bus(transport=transport, batch_interval=timedelta(seconds=60), max_batch=10)
+        self.make_bus(callback=receiver)
+
+        for i in range(25):
+            sender.publish(str(i))
+        sender.flush()
+
+        wait_for(lambda: len(receiver.hrefs) == 25)
+        self.assertEqual(transport.messages, 3)
+
+    def test_splits_batches_to_fit_messages(self):
+        transport = SmallTransport(self.channel)
+        receiver = Receiver()
+        sender = self.make_bus(transport=transport, batch_interval=timedelta(seconds=60))
+        self.make_bus(callback=receiver)
+
+        hrefs = ['%050d' % i for i in range(20)]
+        for href in hrefs:
+            sender.publish(href)
+        sender.publish('x' * 200)
+        sender.flush()
+
+        wait_for(lambda: len(receiver.hrefs) == 20)
+        self.assertEqual(receiver.hrefs, hrefs)
+        self.assertTrue(transport.messages > 1)
+        self.assertTrue(transport.largest <= SmallTransport.max_message_size)
+        self.assertEqual(sender.stats['dropped'], 1)
+
+    def test_drops_when_full(self):
+        bus = self.make_bus(batch_interval=timedelta(seconds=60), queue_size=2)
+
+        bus.publish('a')
+        bus.publish('a')
+        bus.publish('b')
+        bus.publish('c')
+
+        self.assertEqual(bus.stats['queued'], 2)
+        self.assertEqual(bus.stats['dropped'], 1)
+
+    def test_counts_failed_sends(self):
+        bus = self.make_bus(transport=FailingTransport(self.channel), batch_interval=timedelta(seconds=60))
+
+        bus.publish('a')
+        bus.publish('b')
+        bus.flush()
+
+        self.assertEqual(bus.stats['sent'], 0)
+        self.assertEqual(bus.stats['dropped'], 2)
+
+
+class TestSocketDir(TestCase):
+    """Ensure each Stormpath Application gets its own socket directory."""
+
+    def socket_dir(self, **config):
+        init_settings(config)
+        return config['STORMPATH_INVALIDATION_SOCKET_DIR']
+
+    def test_is_application_specific(self):
+        self.assertEqual(self.socket_dir(STORMPATH_APPLICATION='first'), self.socket_dir(STORMPATH_APPLICATION='first'))
+        self.assertNotEqual(self.socket_dir(STORMPATH_APPLICATION='first'), self.socket_dir(STORMPATH_APPLICATION='second'))
+        self.assertNotEqual(
+            self.socket_dir(STORMPATH_APPLICATION_HREF='https://api.stormpath.com/v1/applications/first'),
+            self.socket_dir(STORMPATH_APPLICATION_HREF='https://api.stormpath.com/v1/applications/second'),
+        )
+
+
+class TestUnixDatagramTransport(TestCase):
+    """Ensure our unix domain socket transport works."""
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.first = UnixDatagramTransport(self.directory)
+        self.second = UnixDatagramTransport(self.directory)
+        self.first.open()
+        self.second.open()
+
+    def tearDown(self):
+        self.first.close()
+        self.second.close()
+        rmtree(self.directory)
+
+    def test_send_and_receive(self):
+        self.assertEqual(self.first.send(b'hello'), 0)
+        self.assertEqual(self.second.receive(timeout=1), b'hello')
+        self.assertEqual(self.first.receive(timeout=0.05), None)
+
+    def test_sends_largest_message(self):
+        data = b'x' * UnixDatagramTransport.max_message_size
+        self.first.send(data)
+        self.assertEqual(self.second.receive(timeout=1), data)
+
+    def test_creates_private_directory(self):
+        directory = join(self.directory, 'new')
+        transport = UnixDatagramTransport(directory)
+        transport.open()
+        transport.close()
+
+        self.assertEqual(stat(directory).st_mode & 0o777, 0o700)
+
+    def test_refuses_shared_directory(self):
+        directory = join(self.directory, 'shared')
+        mkdir(directory)
+        chmod(directory, 0o777)
+
+        self.assertRaises(ConfigurationError, UnixDatagramTransport(directory).open)
+
+    def test_refuses_symlinked_directory(self):
+        directory = join(self.directory, 'link')
+        symlink(mkdtemp(dir=self.directory), directory)
+
+        self.assertRaises(ConfigurationError, UnixDatagramTransport(directory).open)
+
+    def test_removes_stale_sockets(self):
+        stale = UnixDatagramTransport(self.directory)
+        stale.open()
+        stale._receiver.close()
+
+        self.first.send(b'hello')
+        self.assertFalse(exists(stale.path))
+        self.assertTrue(exists(self.second.path))
+
+
+class TestManagerInvalidation(StormpathTestCase):
+    """Ensure the StormpathManager broadcasts (and handles) invalidations."""
+
+    def setUp(self):
+        super(TestManagerInvalidation, self).setUp()
+        self.channel = uuid4().hex
+
+        self.app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        self.app.config['STORMPATH_INVALIDATION_ENABLED'] = True
+        self.app.config['STORMPATH_INVALIDATION_TRANSPORT'] = lambda: LocalTransport(self.channel)
+        self.app.config['STORMPATH_INVALIDATION_BATCH_INTERVAL'] = timedelta(milliseconds=20)
+        self.app.stormpath_manager.init_cache(self.app)
+        self.app.stormpath_manager.init_invalidation(self.app)
+        self.app.stormpath_manager.invalidation_bus.start()
+
+        # Another "process" listening on the same channel.
+        self.receiver = Receiver()
+        self.other = InvalidationBus(LocalTransport(self.channel), self.receiver, timedelta(milliseconds=20), 100, 1000)
+        self.other.start()
+
+        with self.app.app_context():
+            self.user = User.create(
+                given_name = 'Randall',
+                surname = 'Degges',
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+            )
+
+    def tearDown(self):
+        self.other.close()
+        self.app.stormpath_manager.invalidation_bus.close()
+        super(TestManagerInvalidation, self).tearDown()
+
+    def test_broadcasts_updates(self):
+        with self.app.app_context():
+            self.user.middle_name = 'Clark'
+            self.user.save()
+
+        wait_for(lambda: self.user.href in self.receiver.hrefs)
+        self.assertTrue(self.user.href in self.receiver.hrefs)
+
+    def test_handles_remote_invalidations(self):
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            manager.load_user(self.user.href)
+            self.assertTrue(self.user.href in manager.user_cache)
+
+        self.other.publish(self.user.href)
+        wait_for(lambda: self.user.href not in manager.user_cache)
+        self.assertFalse(self.user.href in manager.user_cache)
@@ -0,0 +1,153 @@
+"""Run tests against the StormpathManager's lifecycle."""
+
+
+from json import dump, load
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Thread
+from uuid import uuid4
+
+from flask import Flask
+from flask_stormpath import StormpathManager
+from flask_stormpath.errors import ConfigurationError
+
+from .helpers import StormpathTestCase
+
+
+class TestLazyInitialization(StormpathTestCase):
+    """Ensure our Client and Application are created exactly once."""
+
+    def test_concurrent_access(self):
+        manager = self.app.stormpath_manager
+        clients = []
+        applications = []
+
+        def worker():
+            with self.app.app_context():
+                clients.append(manager.client)
+                applications.append(manager.application)
+
+        threads = [Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(clients), 8)
+        self.assertEqual(len(set(id(c) for c in clients)), 1)
+        self.assertEqual(len(set(id(a) for a in applications)), 1)
+
+    def test_resets_after_fork(self):
+        manager = self.app.stormpath_manager
+        self.app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        manager.init_cache(self.app)
+
+        with self.app.app_context():
+            client = manager.client
+            cache = manager.user_cache
+
+            # Pretend we were forked from another process.
+            self.app.stormpath_pid = -1
+
+            self.assertIsNot(manager.client, client)
+            self.assertIsNot(manager.user_cache, cache)
+            self.assertEqual(manager.application.href, self.application.href)
+
+    def test_reset(self):
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            client = manager.client
+            manager.reset()
+
+            self.assertFalse(hasattr(self.app, 'stormpath_client'))
+            self.assertIsNot(manager.client, client)
+
+
+class TestWarm(StormpathTestCase):
+    """Ensure the StormpathManager can be warmed up before serving requests."""
+
+    def test_warm(self):
+        self.assertFalse(hasattr(self.app, 'stormpath_client'))
+        self.app.stormpath_manager.warm()
+
+        self.assertTrue(hasattr(self.app, 'stormpath_client'))
+        self.assertEqual(self.app.stormpath_application.href, self.application.href)
+        self.assertTrue(self.app.stormpath_manager.http_stats['connections_opened'] >= 1)
+
+        with self.app.app_context():
+            template = self.app.jinja_env.get_template(self.app.config['STORMPATH_LOGIN_TEMPLATE'])
+            self.assertIs(self.app.jinja_env.get_template(self.app.config['STORMPATH_LOGIN_TEMPLATE']), template)
+
+    def test_eager_init(self):
+        app = Flask(__name__)
+        app.config.update(self.app.config)
+        app.config['STORMPATH_EAGER_INIT'] = True
+        StormpathManager(app)
+
+        self.assertTrue(hasattr(app, 'stormpath_client'))
+        self.assertEqual(app.stormpath_application.href, self.application.href)
+
+
+class TestResolveApplication(StormpathTestCase):
+    """Ensure the StormpathManager finds our Application efficiently."""
+
+    def setUp(self):
+        super(TestResolveApplication, self).setUp()
+        self.cache_dir = mkdtemp()
+        self.cache_file = join(self.cache_dir, 'application.json')
+
+    def tearDown(self):
+        super(TestResolveApplication, self).tearDown()
+        rmtree(self.cache_dir)
+
+    def test_by_href(self):
+        self.app.config['STORMPATH_APPLICATION'] = None
+        self.app.config['STORMPATH_APPLICATION_HREF'] = self.application.href
+
+        with self.app.app_context():
+            self.assertEqual(self.app.stormpath_manager.application.href, self.application.href)
+
+    def test_bad_href(self):
+        self.app.config['STORMPATH_APPLICATION_HREF'] = self.application.href + 'xxx'
+
+        with self.app.app_context():
+            self.assertRaises(ConfigurationError, lambda: self.app.stormpath_manager.application)
+
+    def test_missing_application(self):
+        self.app.config['STORMPATH_APPLICATION'] = 'flask-stormpath-tests-%s' % uuid4().hex
+
+        with self.app.app_context():
+            self.assertRaises(ConfigurationError, lambda: self.app.stormpath_manager.application)
+
+    def test_href_cache(self):
+        self.app.config['STORMPATH_APPLICATION_HREF_CACHE'] = self.cache_file
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            self.assertEqual(manager.application.href, self.application.href)
+
+        with open(self.cache_file) as f:
+            self.assertEqual(load(f), {'name': self.application.name, 'href': self.application.href})
+
+        # A new process should fetch the cached href instead of searching.
+        fetched = []
+        get_application = manager._get_application
+        manager._get_application = lambda href: fetched.append(href) or get_application(href)
+
+        manager.reset()
+        with self.app.app_context():
+            self.assertEqual(manager.application.href, self.application.href)
+            self.assertEqual(fetched, [self.application.href])
+
+    def test_stale_href_cache(self):
+        self.app.config['STORMPATH_APPLICATION_HREF_CACHE'] = self.cache_file
+        with open(self.cache_file, 'w') as f:
+            dump({'name': self.application.name, 'href': self.application.href + 'xxx'}, f)
+
+        with self.app.app_context():
+            self.assertEqual(self.app.stormpath_manager.application.href, self.application.href)
+
+        with open(self.cache_file) as f:
+            self.assertEqual(load(f)['href'], self.application.href)
@@ -1,8 +1,13 @@
 """Tests for our data models."""
 
 
-from flask_stormpath.models import User
+from unittest import TestCase
+
+from flask import Flask
+from flask_stormpath import StormpathManager
+from flask_stormpath.models import User, UserSnapshot
 from stormpath.resources.account import Account
+from stormpath.resources.custom_data import CustomData
 
 from .helpers import StormpathTestCase
 
@@ -201,3 +206,298 @@ class TestUser(StormpathTestCase):
                 'woot1LoveCookies!',
             )
             self.assertEqual(user.href, original_href)
+
+
+class TestExpansion(StormpathTestCase):
+    """Ensure linked resources are fetched along with accounts."""
+
+    def setUp(self):
+        super(TestExpansion, self).setUp()
+
+        with self.app.app_context():
+            self.user = User.create(
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+                given_name = 'Randall',
+                surname = 'Degges',
+                custom_data = {'favorite_color': 'blue'},
+            )
+
+    def count_requests(self, func):
+        """Return the number of Stormpath API calls made by `func`."""
+        manager = self.app.stormpath_manager
+        before = sum(manager.http_stats.values())
+        func()
+
+        return sum(manager.http_stats.values()) - before
+
+    def load(self):
+        user = self.app.stormpath_manager.load_user(self.user.href)
+        self.assertEqual(user.custom_data['favorite_color'], 'blue')
+        self.assertEqual(user.get_group_hrefs(), frozenset())
+
+    def test_expands_linked_resources(self):
+        with self.app.app_context():
+            self.app.stormpath_manager.application.href
+            self.assertTrue(self.count_requests(self.load) > 1)
+
+            self.app.stormpath_manager.reload_settings(STORMPATH_EXPAND = ['customData', 'groups'])
+            self.assertEqual(self.count_requests(self.load), 1)
+
+    def test_from_login(self):
+        self.app.stormpath_manager.reload_settings(STORMPATH_EXPAND = ['customData'])
+
+        with self.app.app_context():
+            user = User.from_login('r@rdegges.com', 'woot1LoveCookies!')
+            self.assertEqual(self.count_requests(lambda: user.custom_data['favorite_color']), 0)
+
+
+class TestDirtyTracking(StormpathTestCase):
+    """Ensure only modified fields (and modified custom data) are saved."""
+
+    def setUp(self):
+        super(TestDirtyTracking, self).setUp()
+
+        with self.app.app_context():
+            user = User.create(
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+                given_name = 'Randall',
+                surname = 'Degges',
+                custom_data = {'favorite_color': 'blue'},
+            )
+            self.href = user.href
+
+    def count_requests(self, func):
+        """Return the number of Stormpath API calls made by `func`."""
+        manager = self.app.stormpath_manager
+        before = sum(manager.http_stats.values())
+        func()
+
+        return sum(manager.http_stats.values()) - before
+
+    def load(self):
+        user = self.app.stormpath_manager.client.accounts.get(self.href)
+        user._ensure_data()
+        user.__class__ = User
+
+        return user
+
+    def test_tracks_modified_fields(self):
+        with self.app.app_context():
+            user = self.load()
+            self.assertFalse(user.is_dirty)
+
+            user.middle_name = 'Clark'
+            self.assertTrue(user.is_dirty)
+            self.assertEqual(user._get_properties(), {'middleName': 'Clark'})
+
+            user.save()
+            self.assertFalse(user.is_dirty)
+            self.assertEqual(self.load().middle_name, 'Clark')
+
+    def test_save_without_modifications(self):
+        with self.app.app_context():
+            user = self.load()
+            self.assertEqual(self.count_requests(user.save), 0)
+
+    def test_created_users_are_clean(self):
+        with self.app.app_context():
+            user = User.create(
+                email = 'woot@rdegges.com',
+                password = 'woot1LoveCookies!',
+                given_name = 'Randall',
+                surname = 'Degges',
+            )
+            self.assertFalse(user.is_dirty)
+
+    def test_reading_custom_data(self):
+        with self.app.app_context():
+            user = self.load()
+            self.assertEqual(user.custom_data['favorite_color'], 'blue')
+            dict(user)
+            self.assertFalse(user.is_dirty)
+            self.assertEqual(self.count_requests(user.save), 0)
+
+    def test_saves_deleted_custom_data(self):
+        with self.app.app_context():
+            user = self.load()
+            del user.custom_data['favorite_color']
+            self.assertTrue(user.is_dirty)
+
+            user.save()
+            self.assertFalse(user.is_dirty)
+            self.assertNotIn('favorite_color', self.load().custom_data)
+
+    def test_saves_modified_custom_data(self):
+        with self.app.app_context():
+            user = self.load()
+            user.custom_data['favorite_color'] = 'red'
+            self.assertTrue(user.is_dirty)
+            self.assertFalse(user._dirty_fields)
+
+            user.save()
+            self.assertFalse(user.is_dirty)
+            self.assertEqual(self.load().custom_data['favorite_color'], 'red')
+
+
+class TestUserCopy(TestCase):
+    """Ensure copies of a user don't share any data with it."""
+
+    def setUp(self):
+        self.custom_data = CustomData.__new__(CustomData)
+        self.custom_data.__dict__['data'] = {'favorite_color': 'red'}
+
+        self.user = User.__new__(User)
+        self.user.__dict__.update({
+            'href': 'https://api.stormpath.com/v1/accounts/xxx',
+            'given_name': 'Randall',
+            'custom_data': self.custom_data,
+            '_custom_data': self.custom_data,
+            '_dirty_fields': frozenset(['given_name']),
+        })
+
+    def test_copy(self):
+        copy = self.user.copy()
+        self.assertIsInstance(copy, User)
+        self.assertIsNot(copy, self.user)
+        self.assertEqual(copy.__dict__['href'], self.user.href)
+        self.assertEqual(copy.__dict__['given_name'], 'Randall')
+        self.assertEqual(copy._dirty_fields, frozenset(['given_name']))
+
+    def test_copies_custom_data(self):
+        copy = self.user.copy()
+        custom_data = copy.__dict__['custom_data']
+        self.assertIsNot(custom_data, self.custom_data)
+        self.assertIs(copy.__dict__['_custom_data'], custom_data)
+
+        custom_data.__dict__['data']['favorite_color'] = 'blue'
+        self.assertEqual(self.custom_data.__dict__['data'], {'favorite_color': 'red'})
+
+
+class TestUserSnapshot(TestCase):
+    """Ensure user snapshots behave like users."""
+
+    def setUp(self):
+        self.snapshot = UserSnapshot(
+            href = 'https://api.stormpath.com/v1/accounts/xxx',
+            status = 'ENABLED',
+            username = 'rdegges',
+            email = 'r@rdegges.com',
+            given_name = 'Randall',
+            surname = 'Degges',
+            group_hrefs = frozenset(['https://api.stormpath.com/v1/groups/xxx']),
+        )
+
+    def test_login_interface(self):
+        self.assertEqual(self.snapshot.get_id(), 'https://api.stormpath.com/v1/accounts/xxx')
+        self.assertTrue(self.snapshot.is_active)
+        self.assertTrue(self.snapshot.is_authenticated)
+        self.assertFalse(self.snapshot.is_anonymous)
+        self.assertEqual(self.snapshot.get_group_hrefs(), frozenset(['https://api.stormpath.com/v1/groups/xxx']))
+        self.assertEqual(repr(self.snapshot), 'UserSnapshot <"rdegges" ("https://api.stormpath.com/v1/accounts/xxx")>')
+
+    def test_is_compact(self):
+        self.assertFalse(hasattr(self.snapshot, '__dict__'))
+
+    def test_copy(self):
+        copy = self.snapshot.copy()
+        self.assertIsNot(copy, self.snapshot)
+        self.assertFalse(copy.is_promoted)
+
+        for name in UserSnapshot.FIELDS + ('group_hrefs',):
+            self.assertEqual(getattr(copy, name), getattr(self.snapshot, name))
+
+    def test_save_without_modifications(self):
+        self.assertEqual(self.snapshot.save(), None)
+        self.assertFalse(self.snapshot.is_promoted)
+
+
+class TestUserSnapshotGroups(TestCase):
+    """Ensure snapshots find their group memberships without being promoted."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SECRET_KEY'] = 'woot'
+        self.app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+        self.app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+        self.app.config['STORMPATH_APPLICATION'] = 'xxx'
+        self.app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        self.app.config['STORMPATH_USER_CACHE_SNAPSHOTS'] = True
+        self.app.config['STORMPATH_GROUP_CACHE_ENABLED'] = True
+        self.manager = StormpathManager(self.app)
+
+        self.promotions = []
+        self.manager._get_account = lambda href: self.promotions.append(href)
+
+        self.href = 'https://api.stormpath.com/v1/accounts/xxx'
+        self.group_hrefs = frozenset(['https://api.stormpath.com/v1/groups/xxx'])
+
+    def test_snapshots_capture_cached_groups(self):
+        user = User.__new__(User)
+        user.__dict__.update(dict((name, None) for name in UserSnapshot.FIELDS))
+        user.__dict__.update({'href': self.href, 'status': 'ENABLED'})
+
+        self.manager.group_cache.set(self.href, self.group_hrefs)
+        self.manager._store_user(self.href, user)
+
+        self.assertEqual(self.manager.user_cache.get(self.href).group_hrefs, self.group_hrefs)
+
+    def test_reads_group_cache(self):
+        snapshot = UserSnapshot(href=self.href, status='ENABLED')
+        self.manager.group_cache.set(self.href, self.group_hrefs)
+
+        with self.app.app_context():
+            self.assertEqual(snapshot.get_group_hrefs(), self.group_hrefs)
+
+        self.assertFalse(snapshot.is_promoted)
+        self.assertEqual(self.promotions, [])
+
+
+class TestUserSnapshotPromotion(StormpathTestCase):
+    """Ensure user snapshots are promoted to full users when needed."""
+
+    def setUp(self):
+        super(TestUserSnapshotPromotion, self).setUp()
+
+        with self.app.app_context():
+            self.user = User.create(
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+                given_name = 'Randall',
+                surname = 'Degges',
+                custom_data = {'favorite_color': 'blue'},
+            )
+
+    def test_from_user(self):
+        with self.app.app_context():
+            snapshot = UserSnapshot.from_user(self.user)
+            self.assertEqual(snapshot.href, self.user.href)
+            self.assertEqual(snapshot.email, 'r@rdegges.com')
+            self.assertEqual(snapshot.given_name, 'Randall')
+            self.assertFalse(snapshot.is_promoted)
+
+    def test_fetches_groups_without_promoting(self):
+        with self.app.app_context():
+            admins = self.application.groups.create({'name': 'admins'})
+            self.user.add_group(admins)
+
+            snapshot = UserSnapshot.from_user(self.user)
+            self.assertEqual(snapshot.get_group_hrefs(), frozenset([admins.href]))
+            self.assertFalse(snapshot.is_promoted)
+
+    def test_promotes_on_read(self):
+        with self.app.app_context():
+            snapshot = UserSnapshot.from_user(self.user)
+            self.assertEqual(snapshot.custom_data['favorite_color'], 'blue')
+            self.assertTrue(snapshot.is_promoted)
+
+    def test_promotes_on_write(self):
+        with self.app.app_context():
+            snapshot = UserSnapshot.from_user(self.user)
+            snapshot.middle_name = 'Clark'
+            self.assertTrue(snapshot.is_promoted)
+            self.assertEqual(snapshot.middle_name, 'Clark')
+
+            snapshot.save()
+            self.assertEqual(self.app.stormpath_manager._get_account(self.user.href).middle_name, 'Clark')
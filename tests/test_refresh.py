@@ -0,0 +1,110 @@
+"""Run tests against our background refresher."""
+
+
+from threading import Event, Lock
+from time import sleep, time
+from unittest import TestCase
+
+from flask_stormpath import User
+from flask_stormpath.refresh import Refresher
+
+from .helpers import StormpathTestCase
+
+
+def wait_for(condition, timeout=5):
+    """Wait until `condition()` is True (or the timeout passes)."""
+    deadline = time() + timeout
+    while not condition() and time() < deadline:
+        sleep(0.01)
+
+
+class TestRefresher(TestCase):
+    """Ensure our refresher runs tasks in the background properly."""
+
+    def test_runs_tasks(self):
+        refresher = Refresher(threads=2)
+        done = Event()
+
+        self.assertTrue(refresher.schedule('a', done.set))
+        self.assertTrue(done.wait(5))
+
+        wait_for(lambda: refresher.stats['refreshed'] == 1)
+        self.assertFalse(refresher.is_pending('a'))
+        self.assertEqual(refresher.stats['scheduled'], 1)
+
+    def test_skips_pending_tasks(self):
+        refresher = Refresher(threads=1)
+        release = Event()
+
+        self.assertTrue(refresher.schedule('a', release.wait))
+        self.assertFalse(refresher.schedule('a', release.wait))
+        self.assertTrue(refresher.is_pending('a'))
+
+        release.set()
+        wait_for(lambda: not refresher.is_pending('a'))
+        self.assertEqual(refresher.stats['scheduled'], 1)
+
+    def test_caps_concurrency(self):
+        refresher = Refresher(threads=2)
+        lock = Lock()
+        running = [0]
+        peak = [0]
+
+        def task():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        for key in range(6):
+            refresher.schedule(key, task)
+
+        self.assertTrue(refresher.stats['queue_depth'] > 0)
+        wait_for(lambda: refresher.stats['refreshed'] == 6)
+        self.assertEqual(peak[0], 2)
+        self.assertTrue(refresher.stats['latency_avg'] >= 0.05)
+
+    def test_counts_failures(self):
+        refresher = Refresher(threads=1)
+
+        def task():
+            raise ValueError('boom')
+
+        refresher.schedule('a', task)
+        wait_for(lambda: refresher.stats['failed'] == 1)
+        self.assertEqual(refresher.stats['refreshed'], 0)
+
+
+class TestRefreshAhead(StormpathTestCase):
+    """Ensure cached users are refreshed before they expire."""
+
+    def setUp(self):
+        super(TestRefreshAhead, self).setUp()
+        self.app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        self.app.config['STORMPATH_USER_CACHE_REFRESH_AHEAD'] = self.app.config['STORMPATH_USER_CACHE_TTL']
+        self.app.stormpath_manager.init_cache(self.app)
+
+        with self.app.app_context():
+            self.user = User.create(
+                given_name = 'Randall',
+                surname = 'Degges',
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+            )
+
+    def test_refreshes_hot_users(self):
+        manager = self.app.stormpath_manager
+
+        with self.app.app_context():
+            manager.load_user(self.user.href)
+            cached = manager.user_cache.get(self.user.href)
+
+            # Every cached user is within the refresh-ahead window, so reading
+            # it again schedules a refresh.
+            self.assertEqual(manager.load_user(self.user.href).href, self.user.href)
+            wait_for(lambda: manager.refresher.stats['refreshed'] == 1)
+
+            self.assertIsNot(manager.user_cache.get(self.user.href), cached)
+            self.assertEqual(manager.load_user(self.user.href).href, self.user.href)
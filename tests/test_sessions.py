@@ -0,0 +1,119 @@
+"""Run tests against our session snapshot support."""
+
+
+from datetime import timedelta
+from unittest import TestCase
+
+from flask import Flask, session
+from flask_stormpath import StormpathManager, user
+from flask_stormpath.models import User, UserSnapshot
+from flask_stormpath.sessions import SESSION_KEY, load_snapshot
+
+from .helpers import StormpathTestCase
+
+
+class TestSessionSnapshots(StormpathTestCase):
+
+    def setUp(self):
+        """Enable session snapshots and provision a user account."""
+        super(TestSessionSnapshots, self).setUp()
+        self.app.stormpath_manager.reload_settings(STORMPATH_SESSION_SNAPSHOT_ENABLED = True)
+        self.app.stormpath_manager.init_login(self.app)
+
+        with self.app.app_context():
+            self.user = User.create(
+                given_name = 'Randall',
+                surname = 'Degges',
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+            )
+
+        @self.app.route('/me')
+        def me():
+            return user.email
+
+    def test_login_stores_snapshot(self):
+        with self.app.test_client() as c:
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            self.assertTrue(session.get(SESSION_KEY))
+
+            c.get('/logout')
+            self.assertFalse(session.get(SESSION_KEY))
+
+    def test_loads_read_only_user_from_snapshot(self):
+        with self.app.test_client() as c:
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            resp = c.get('/me')
+            self.assertEqual(resp.data.decode('utf-8'), self.user.email)
+            self.assertTrue(user._read_only)
+            self.assertEqual(user.href, self.user.href)
+            self.assertRaises(ValueError, user.save)
+
+    def test_stale_snapshots_are_refreshed(self):
+        self.app.stormpath_manager.reload_settings(STORMPATH_SESSION_SNAPSHOT_MAX_AGE = timedelta(seconds=-1))
+
+        with self.app.test_client() as c:
+            c.post('/login', data={
+                'login': self.user.email,
+                'password': 'woot1LoveCookies!',
+            })
+
+            resp = c.get('/me')
+            self.assertEqual(resp.data.decode('utf-8'), self.user.email)
+            self.assertFalse(user._read_only)
+
+
+class TestCachedSnapshotSessions(TestCase):
+    """Ensure session snapshots are refreshed from cached user snapshots without API calls."""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SECRET_KEY'] = 'woot'
+        self.app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+        self.app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+        self.app.config['STORMPATH_APPLICATION'] = 'xxx'
+        self.app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        self.app.config['STORMPATH_USER_CACHE_SNAPSHOTS'] = True
+        self.app.config['STORMPATH_SESSION_SNAPSHOT_ENABLED'] = True
+        self.manager = StormpathManager(self.app)
+
+        self.api_calls = []
+        self.manager._get_account = lambda href: self.api_calls.append(href)
+
+        self.href = 'https://api.stormpath.com/v1/accounts/xxx'
+        self.manager.user_cache.set(self.href, UserSnapshot(
+            href = self.href,
+            status = 'ENABLED',
+            email = 'r@rdegges.com',
+            group_hrefs = frozenset(['https://api.stormpath.com/v1/groups/xxx']),
+        ))
+
+    def test_refreshes_snapshot_without_api_calls(self):
+        with self.app.test_request_context():
+            user = self.manager.load_user(self.href)
+            self.assertIsInstance(user, UserSnapshot)
+            self.assertFalse(user.is_promoted)
+            self.assertIn(SESSION_KEY, session)
+
+            snapshot = load_snapshot(self.href, timedelta(minutes=5))
+            self.assertEqual(snapshot['email'], 'r@rdegges.com')
+            self.assertEqual(snapshot['groups'], ['https://api.stormpath.com/v1/groups/xxx'])
+
+        self.assertEqual(self.api_calls, [])
+
+    def test_leaves_out_unknown_groups(self):
+        self.manager.user_cache.set(self.href, UserSnapshot(href=self.href, status='ENABLED'))
+
+        with self.app.test_request_context():
+            self.manager.load_user(self.href)
+            self.assertNotIn('groups', load_snapshot(self.href, timedelta(minutes=5)))
+
+        self.assertEqual(self.api_calls, [])
@@ -2,13 +2,16 @@
 
 
 from datetime import timedelta
-from os import close, environ, remove, write
+from os import close, remove, write
 from tempfile import mkstemp
+from unittest import TestCase
 
-from flask.ext.stormpath.errors import ConfigurationError
-from flask.ext.stormpath.settings import check_settings, init_settings
+from flask import Flask
+from flask_stormpath import StormpathManager
+from flask_stormpath.errors import ConfigurationError
+from flask_stormpath.settings import Settings, check_settings, init_settings
 
-from .helpers import StormpathTestCase
+from .helpers import StormpathTestCase, get_api_key
 
 
 class TestInitSettings(StormpathTestCase):
@@ -32,9 +35,8 @@ class TestCheckSettings(StormpathTestCase):
 
         # Generate our file locally.
         self.fd, self.file = mkstemp()
-        api_key_id = 'apiKey.id = %s\n' % environ.get('STORMPATH_API_KEY_ID')
-        api_key_secret = 'apiKey.secret = %s\n' % environ.get(
-            'STORMPATH_API_KEY_SECRET')
+        api_key_id = 'apiKey.id = %s\n' % get_api_key()[0]
+        api_key_secret = 'apiKey.secret = %s\n' % get_api_key()[1]
         write(self.fd, api_key_id.encode('utf-8') + b'\n')
         write(self.fd, api_key_secret.encode('utf-8') + b'\n')
 
@@ -48,8 +50,7 @@ class TestCheckSettings(StormpathTestCase):
 
         # Now we'll check to see that if we specify an API key ID and secret
         # things work.
-        self.app.config['STORMPATH_API_KEY_ID'] = environ.get('STORMPATH_API_KEY_ID')
-        self.app.config['STORMPATH_API_KEY_SECRET'] = environ.get('STORMPATH_API_KEY_SECRET')
+        self.app.config['STORMPATH_API_KEY_ID'], self.app.config['STORMPATH_API_KEY_SECRET'] = get_api_key()
         check_settings(self.app.config)
 
         # Now we'll check to see that if we specify an API key file things work.
@@ -64,6 +65,10 @@ class TestCheckSettings(StormpathTestCase):
         self.app.config['STORMPATH_APPLICATION'] = None
         self.assertRaises(ConfigurationError, check_settings, self.app.config)
 
+        # An Application href works just as well as an Application name.
+        self.app.config['STORMPATH_APPLICATION_HREF'] = 'https://api.stormpath.com/v1/applications/xxx'
+        check_settings(self.app.config)
+
     def test_google_settings(self):
         # Ensure that if the user has Google login enabled, they've specified
         # the correct settings.
@@ -123,6 +128,41 @@ class TestCheckSettings(StormpathTestCase):
         self.app.config['STORMPATH_COOKIE_DURATION'] = timedelta(minutes=1)
         check_settings(self.app.config)
 
+    def test_user_cache_settings(self):
+        # Ensure that if the user cache is enabled with a bogus size or TTL, an
+        # error is raised.
+        self.app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        self.app.config['STORMPATH_USER_CACHE_SIZE'] = 0
+        self.assertRaises(ConfigurationError, check_settings, self.app.config)
+
+        self.app.config['STORMPATH_USER_CACHE_SIZE'] = 100
+        self.app.config['STORMPATH_USER_CACHE_TTL'] = 60
+        self.assertRaises(ConfigurationError, check_settings, self.app.config)
+
+        # Now that we've configured things properly, it should work.
+        self.app.config['STORMPATH_USER_CACHE_TTL'] = timedelta(minutes=1)
+        check_settings(self.app.config)
+
+        self.app.config['STORMPATH_UNKNOWN_GROUP_TTL'] = 30
+        self.assertRaises(ConfigurationError, check_settings, self.app.config)
+
+        self.app.config['STORMPATH_UNKNOWN_GROUP_TTL'] = timedelta(seconds=30)
+        check_settings(self.app.config)
+
+    def test_signal_settings(self):
+        # Ensure that if the signal dispatcher is configured with a bogus
+        # thread count or backpressure policy, an error is raised.
+        self.app.config['STORMPATH_SIGNAL_THREADS'] = 0
+        self.assertRaises(ConfigurationError, check_settings, self.app.config)
+
+        self.app.config['STORMPATH_SIGNAL_THREADS'] = 2
+        self.app.config['STORMPATH_SIGNAL_BACKPRESSURE'] = 'panic'
+        self.assertRaises(ConfigurationError, check_settings, self.app.config)
+
+        # Now that we've configured things properly, it should work.
+        self.app.config['STORMPATH_SIGNAL_BACKPRESSURE'] = 'drop'
+        check_settings(self.app.config)
+
     def tearDown(self):
         """Remove our apiKey.properties file."""
         super(TestCheckSettings, self).tearDown()
@@ -130,3 +170,72 @@ class TestCheckSettings(StormpathTestCase):
         # Remove our file.
         close(self.fd)
         remove(self.file)
+
+
+class TestSettings(StormpathTestCase):
+    """Ensure our compiled settings work properly."""
+
+    def test_attributes(self):
+        settings = Settings(self.app.config)
+        self.assertEqual(settings.redirect_url, self.app.config['STORMPATH_REDIRECT_URL'])
+        self.assertEqual(settings.login_template, 'flask_stormpath/login.html')
+
+        # Derived values are computed up front.
+        self.assertEqual(settings.registration_redirect_url, settings.redirect_url)
+        self.assertEqual(settings.expansion, None)
+        self.assertEqual(settings.user_context_exempt, frozenset())
+
+    def test_read_only(self):
+        settings = Settings(self.app.config)
+
+        with self.assertRaises(AttributeError):
+            settings.redirect_url = '/dashboard'
+
+    def test_reload_settings(self):
+        manager = self.app.stormpath_manager
+        settings = manager.settings
+
+        manager.reload_settings(STORMPATH_REDIRECT_URL = '/dashboard')
+        self.assertIsNot(manager.settings, settings)
+        self.assertEqual(manager.settings.redirect_url, '/dashboard')
+        self.assertEqual(manager.settings.registration_redirect_url, '/dashboard')
+        self.assertEqual(self.app.config['STORMPATH_REDIRECT_URL'], '/dashboard')
+
+        # Invalid settings are rejected, and nothing is changed.
+        self.assertRaises(ConfigurationError, manager.reload_settings, STORMPATH_EXPAND = 'customData')
+        self.assertEqual(self.app.config['STORMPATH_EXPAND'], [])
+        self.assertEqual(manager.settings.redirect_url, '/dashboard')
+
+
+class TestPerAppSettings(TestCase):
+    """Ensure a StormpathManager shared by several apps keeps their settings apart."""
+
+    def make_app(self, redirect_url):
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'woot'
+        app.config['STORMPATH_API_KEY_ID'] = 'xxx'
+        app.config['STORMPATH_API_KEY_SECRET'] = 'xxx'
+        app.config['STORMPATH_APPLICATION'] = 'xxx'
+        app.config['STORMPATH_REDIRECT_URL'] = redirect_url
+
+        return app
+
+    def test_settings_per_app(self):
+        manager = StormpathManager()
+        first = self.make_app('/first')
+        second = self.make_app('/second')
+        manager.init_app(first)
+        manager.init_app(second)
+
+        self.assertEqual(first.stormpath_settings.redirect_url, '/first')
+        self.assertEqual(second.stormpath_settings.redirect_url, '/second')
+
+        with first.app_context():
+            self.assertEqual(manager.settings.redirect_url, '/first')
+
+        with second.app_context():
+            self.assertEqual(manager.settings.redirect_url, '/second')
+
+        manager.reload_settings(first, STORMPATH_REDIRECT_URL = '/dashboard')
+        self.assertEqual(first.stormpath_settings.redirect_url, '/dashboard')
+        self.assertEqual(second.stormpath_settings.redirect_url, '/second')
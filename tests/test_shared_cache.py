@@ -0,0 +1,170 @@
+"""Run tests against our shared (memory-mapped) cache."""
+
+
+from multiprocessing import Process
+from os import _exit, fork, fstat, listdir, waitpid
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Thread
+from unittest import TestCase
+
+from flask_stormpath.shared_cache import WAYS, MmapCache, MmapStore
+from stormpath.cache.entry import CacheEntry
+
+
+def write_entry(path, key, value):
+    """Write an entry to the cache from another process."""
+    MmapCache(path, slots=64, slot_size=256).set(key, value)
+
+
+class TestMmapCache(TestCase):
+    """Ensure our memory-mapped cache behaves properly."""
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.path = join(self.dir, 'cache')
+        self.cache = MmapCache(self.path, slots=64, slot_size=256)
+
+    def tearDown(self):
+        self.cache.close()
+        rmtree(self.dir)
+
+    def test_get_and_set(self):
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertTrue(self.cache.set('a', b'1'))
+        self.assertEqual(self.cache.get('a'), b'1')
+
+        self.assertTrue(self.cache.set('a', b'22'))
+        self.assertEqual(self.cache.get('a'), b'22')
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.stats['hits'], 2)
+        self.assertEqual(self.cache.stats['misses'], 1)
+
+    def test_oversize(self):
+        self.assertFalse(self.cache.set('a', b'x' * 256))
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(self.cache.stats['oversize'], 1)
+
+    def test_rejects_long_keys(self):
+        self.assertRaises(ValueError, self.cache.set, 'a' * 65536, b'1')
+
+    def test_delete_and_clear(self):
+        self.cache.set('a', b'1')
+        self.cache.set('b', b'2')
+
+        self.cache.delete('a')
+        self.cache.delete('missing')
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(self.cache.get('b'), b'2')
+
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        # With a single set, every key competes for the same slots.
+        cache = MmapCache(join(self.dir, 'small'), slots=WAYS, slot_size=256)
+        for key in range(WAYS):
+            cache.set(str(key), b'x')
+
+        cache.get('0')
+        cache.set('new', b'x')
+
+        self.assertEqual(len(cache), WAYS)
+        self.assertEqual(cache.get('0'), b'x')
+        self.assertEqual(cache.get('1'), None)
+        self.assertEqual(cache.stats['evictions'], 1)
+        cache.close()
+
+    def test_shared_between_processes(self):
+        process = Process(target=write_entry, args=(self.path, 'a', b'from another process'))
+        process.start()
+        process.join()
+
+        self.assertEqual(self.cache.get('a'), b'from another process')
+
+    def test_forked_processes(self):
+        inherited = self.cache._fd
+
+        pid = fork()
+        if not pid:
+            # Write to the cache we inherited, then exit with 1 if the file
+            # descriptor we inherited is still open.
+            status = 1
+            try:
+                self.cache.set('a', b'from a child')
+                try:
+                    fstat(inherited)
+                except OSError:
+                    status = 0
+            finally:
+                _exit(status)
+
+        self.assertEqual(waitpid(pid, 0)[1], 0)
+        self.assertEqual(self.cache.get('a'), b'from a child')
+
+    def test_resets_mismatched_layout(self):
+        self.cache.set('a', b'1')
+
+        cache = MmapCache(self.path, slots=128, slot_size=256)
+        self.assertEqual(cache.get('a'), None)
+        cache.close()
+
+    def test_replaces_mismatched_file(self):
+        self.cache.set('a', b'1')
+
+        # A smaller layout mustn't shrink the file we still have mapped.
+        cache = MmapCache(self.path, slots=8, slot_size=256)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(fstat(self.cache._fd).st_size, self.cache.size)
+        self.assertEqual(self.cache.get('a'), b'1')
+        for i in range(64):
+            self.cache.set(str(i), b'1')
+
+        # New opens share the new file.
+        other = MmapCache(self.path, slots=8, slot_size=256)
+        other.set('b', b'2')
+        self.assertEqual(cache.get('b'), b'2')
+        other.close()
+        cache.close()
+
+        self.assertEqual(listdir(self.dir), ['cache'])
+
+    def test_stats_across_threads(self):
+        self.cache.set('a', b'1')
+
+        def read():
+            for _ in range(2000):
+                self.cache.get('a')
+                self.cache.get('b')
+
+        threads = [Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.cache.stats['hits'], 16000)
+        self.assertEqual(self.cache.stats['misses'], 16000)
+
+
+class TestMmapStore(TestCase):
+    """Ensure our Stormpath cache store works."""
+
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    def test_store(self):
+        path = join(self.dir, 'cache')
+        store = MmapStore(path, slots=64, slot_size=1024)
+        self.assertEqual(store['a'], None)
+
+        store['a'] = CacheEntry({'href': 'a', 'email': 'r@rdegges.com'})
+        self.assertEqual(MmapStore(path, slots=64, slot_size=1024)['a'].value['email'], 'r@rdegges.com')
+        self.assertEqual(len(store), 1)
+
+        del store['a']
+        self.assertEqual(store['a'], None)
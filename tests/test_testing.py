@@ -0,0 +1,169 @@
+"""Run tests against our fake Stormpath API."""
+
+
+from base64 import b64encode
+from json import dumps, loads
+from time import time
+from unittest import TestCase
+
+from requests import get
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from flask_stormpath.testing import FakeStormpath
+
+
+class FakeStormpathTestCase(TestCase):
+    """Provision a fake Stormpath API, with an Application to test against."""
+
+    def setUp(self):
+        self.stormpath = FakeStormpath()
+        self.client = Client(self.stormpath, Response)
+
+        tenant = self.call('GET', '/v1/tenants/current')[1]
+        self.application = self.call('POST', tenant['applications']['href'], {'name': 'test'}, query_string={'createDirectory': 'true'})[1]
+
+    def call(self, method, href, body=None, **kwargs):
+        """
+        Call the fake API.
+
+        :rtype: tuple
+        :returns: The (status, body) of the response.
+        """
+        response = self.client.open(
+            href.replace('http://localhost', ''),
+            method = method,
+            data = dumps(body) if body is not None else None,
+            **kwargs
+        )
+
+        return response.status_code, loads(response.get_data(as_text=True)) if response.get_data() else None
+
+    def create_account(self, email='r@rdegges.com', password='woot1LoveCookies!'):
+        return self.call('POST', self.application['accounts']['href'], {
+            'email': email,
+            'password': password,
+            'givenName': 'Randall',
+            'surname': 'Degges',
+        })
+
+    def login(self, login, password, **kwargs):
+        value = b64encode(('%s:%s' % (login, password)).encode('utf-8')).decode('utf-8')
+
+        return self.call('POST', self.application['loginAttempts']['href'], {'type': 'basic', 'value': value}, **kwargs)
+
+
+class TestAccounts(FakeStormpathTestCase):
+    """Ensure accounts can be created, logged into, and updated."""
+
+    def test_creates_accounts(self):
+        status, account = self.create_account()
+        self.assertEqual(status, 201)
+        self.assertEqual(account['username'], 'r@rdegges.com')
+        self.assertEqual(account['fullName'], 'Randall Degges')
+        self.assertNotIn('password', account)
+
+        self.assertEqual(self.call('GET', account['href']), (200, account))
+
+    def test_validates_accounts(self):
+        self.create_account()
+        self.assertEqual(self.create_account()[1]['code'], 2001)
+        self.assertEqual(self.create_account(email='x@rdegges.com', password='weak')[1]['code'], 2007)
+
+    def test_login(self):
+        href = self.create_account()[1]['href']
+
+        self.assertEqual(self.login('r@rdegges.com', 'woot1LoveCookies!'), (200, {'account': {'href': href}}))
+        self.assertEqual(self.login('r@rdegges.com', 'woot1LoveCookies!', query_string={'expand': 'account'})[1]['account']['email'], 'r@rdegges.com')
+        self.assertEqual(self.login('r@rdegges.com', 'nope')[1]['code'], 7100)
+
+    def test_custom_data(self):
+        href = self.create_account()[1]['href']
+        self.call('POST', href + '/customData', {'favorite_color': 'blue'})
+        self.call('POST', href, {'surname': 'D', 'customData': {'age': 30}})
+
+        account = self.call('GET', href, query_string={'expand': 'customData'})[1]
+        self.assertEqual(account['surname'], 'D')
+        self.assertEqual(account['customData']['favorite_color'], 'blue')
+        self.assertEqual(account['customData']['age'], 30)
+
+        self.call('DELETE', href + '/customData/age')
+        self.assertNotIn('age', self.call('GET', href + '/customData')[1])
+
+    def test_password_reset(self):
+        href = self.create_account()[1]['href']
+        reset = self.call('POST', self.application['passwordResetTokens']['href'], {'email': 'r@rdegges.com'})[1]
+        self.assertEqual(reset['account']['href'], href)
+        self.assertEqual([token['email'] for token in self.stormpath.password_reset_tokens], ['r@rdegges.com'])
+
+        self.assertEqual(self.call('GET', reset['href']), (200, reset))
+        self.call('POST', reset['href'], {'password': 'n3wPassword'})
+        self.assertEqual(self.call('GET', reset['href'])[0], 404)
+        self.assertEqual(self.login('r@rdegges.com', 'n3wPassword')[0], 200)
+
+    def test_provider_accounts(self):
+        data = {'providerData': {'providerId': 'google', 'code': 'xxx'}}
+        self.assertEqual(self.call('POST', self.application['accounts']['href'], data)[1]['code'], 7200)
+
+        directory = self.call('POST', '/v1/directories', {'name': 'test-google', 'provider': {'providerId': 'google'}})[1]
+        self.call('POST', self.application['accountStoreMappings']['href'], {'accountStore': {'href': directory['href']}})
+        self.assertEqual(self.call('POST', self.application['accounts']['href'], data)[1]['code'], 7201)
+
+        self.stormpath.add_provider_account('google', 'xxx', email='r@rdegges.com', givenName='Randall')
+        status, account = self.call('POST', self.application['accounts']['href'], data)
+        self.assertEqual(status, 201)
+        self.assertEqual(account['directory']['href'], directory['href'])
+        self.assertEqual(self.call('POST', self.application['accounts']['href'], data), (200, account))
+
+
+class TestGroups(FakeStormpathTestCase):
+    """Ensure groups and group memberships work."""
+
+    def test_groups(self):
+        account = self.create_account()[1]
+        admins = self.call('POST', self.application['groups']['href'], {'name': 'admins'})[1]
+        self.call('POST', self.application['groups']['href'], {'name': 'developers'})
+        self.call('POST', '/v1/groupMemberships', {'account': {'href': account['href']}, 'group': {'href': admins['href']}})
+
+        groups = self.call('GET', self.application['groups']['href'], query_string={'name': 'admins'})[1]
+        self.assertEqual([group['href'] for group in groups['items']], [admins['href']])
+
+        account = self.call('GET', account['href'], query_string={'expand': 'groups(offset:0,limit:10)'})[1]
+        self.assertEqual([group['name'] for group in account['groups']['items']], ['admins'])
+
+        # Deleting the Application's directory deletes its accounts and groups.
+        directories = self.call('GET', '/v1/directories', query_string={'q': 'test'})[1]['items']
+        self.assertEqual(len(directories), 1)
+        self.call('DELETE', directories[0]['href'])
+        self.assertEqual(self.call('GET', account['href'])[0], 404)
+        self.assertEqual(self.call('GET', admins['href'])[0], 404)
+
+
+class TestFaults(FakeStormpathTestCase):
+    """Ensure errors and latency can be injected, and calls are counted."""
+
+    def test_injects_errors(self):
+        self.stormpath.reset_stats()
+        self.stormpath.fail(2)
+
+        self.assertEqual(self.call('GET', self.application['href'])[0], 503)
+        self.assertEqual(self.call('GET', self.application['href'])[0], 503)
+        self.assertEqual(self.call('GET', self.application['href'])[0], 200)
+
+        self.stormpath.error_rate = 1
+        self.stormpath.error_status = 500
+        self.assertEqual(self.call('GET', self.application['href'])[0], 500)
+
+        self.assertEqual(self.stormpath.stats, {'calls': 4, 'errors': 3, 'endpoints': {'GET /applications/*': 4}})
+
+    def test_serves_over_http(self):
+        self.stormpath.latency = 0.1
+        base_url = self.stormpath.start()
+
+        try:
+            start = time()
+            response = get(base_url + '/tenants/current')
+            self.assertTrue(time() - start >= 0.1)
+            self.assertEqual(response.json()['href'], base_url + '/tenants/fakeTenant')
+        finally:
+            self.stormpath.stop()
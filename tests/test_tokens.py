@@ -0,0 +1,100 @@
+"""Run tests against our access token support."""
+
+
+from time import time
+from unittest import TestCase
+from uuid import uuid4
+
+from flask_stormpath import User, current_user
+from flask_stormpath.decorators import token_required
+from flask_stormpath.tokens import verify_access_token
+from jwt import encode
+
+from .helpers import StormpathTestCase, get_api_key
+
+
+def make_token(secret, iss, sub, expires_in=3600, stt='access'):
+    """
+    Build a token shaped like the access tokens Stormpath issues.
+
+    :rtype: str
+    :returns: The encoded token.
+    """
+    now = int(time())
+    token = encode({
+        'jti': 'test',
+        'iat': now,
+        'iss': iss,
+        'sub': sub,
+        'exp': now + expires_in,
+    }, secret, algorithm='HS256', headers={'stt': stt})
+
+    return token.decode('utf-8') if isinstance(token, bytes) else token
+
+
+class TestVerifyAccessToken(TestCase):
+    """Ensure access tokens are verified properly."""
+
+    def setUp(self):
+        self.secret = uuid4().hex + uuid4().hex
+        self.iss = 'https://api.stormpath.com/v1/applications/xxx'
+        self.sub = 'https://api.stormpath.com/v1/accounts/xxx'
+
+    def test_valid_token(self):
+        claims = verify_access_token(make_token(self.secret, self.iss, self.sub), self.secret, self.iss)
+        self.assertEqual(claims['sub'], self.sub)
+
+    def test_invalid_signature(self):
+        token = make_token(uuid4().hex + uuid4().hex, self.iss, self.sub)
+        self.assertEqual(verify_access_token(token, self.secret, self.iss), None)
+
+    def test_expired_token(self):
+        token = make_token(self.secret, self.iss, self.sub, expires_in=-60)
+        self.assertEqual(verify_access_token(token, self.secret, self.iss), None)
+
+    def test_wrong_issuer(self):
+        token = make_token(self.secret, self.iss + 'yyy', self.sub)
+        self.assertEqual(verify_access_token(token, self.secret, self.iss), None)
+
+    def test_refresh_token(self):
+        token = make_token(self.secret, self.iss, self.sub, stt='refresh')
+        self.assertEqual(verify_access_token(token, self.secret, self.iss), None)
+
+    def test_garbage(self):
+        self.assertEqual(verify_access_token('garbage', self.secret, self.iss), None)
+
+
+class TestTokenRequired(StormpathTestCase):
+
+    def setUp(self):
+        """Provision a single user account for testing."""
+        super(TestTokenRequired, self).setUp()
+
+        with self.app.app_context():
+            self.user = User.create(
+                given_name = 'Randall',
+                surname = 'Degges',
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+            )
+
+        @self.app.route('/api')
+        @token_required
+        def api_view():
+            return current_user.email
+
+    def test_requires_token(self):
+        with self.app.test_client() as c:
+            resp = c.get('/api')
+            self.assertEqual(resp.status_code, 401)
+
+            resp = c.get('/api', headers={'Authorization': 'Bearer garbage'})
+            self.assertEqual(resp.status_code, 401)
+
+    def test_accepts_valid_token(self):
+        token = make_token(get_api_key()[1], self.application.href, self.user.href)
+
+        with self.app.test_client() as c:
+            resp = c.get('/api', headers={'Authorization': 'Bearer ' + token})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.data.decode('utf-8'), self.user.email)
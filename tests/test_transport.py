@@ -0,0 +1,94 @@
+"""Run tests against our pooled HTTP transport."""
+
+
+from datetime import timedelta
+from threading import Thread
+from unittest import TestCase
+
+from flask_stormpath.transport import PooledHTTPAdapter
+from requests import Session
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+
+from .helpers import StormpathTestCase
+
+
+class OKHandler(BaseHTTPRequestHandler):
+    """A tiny HTTP/1.1 handler which supports keep-alive connections."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    An HTTP server which handles each connection in its own thread, so
+    lingering keep-alive connections don't block shutdown.
+    """
+    daemon_threads = True
+
+
+class TestPooledHTTPAdapter(TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), OKHandler)
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_port
+
+        self.thread = Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_session(self, adapter):
+        session = Session()
+        session.mount('http://', adapter)
+        return session
+
+    def test_reuses_connections(self):
+        adapter = PooledHTTPAdapter(pool_size=2)
+        session = self.make_session(adapter)
+
+        for _ in range(3):
+            self.assertEqual(session.get(self.url).status_code, 200)
+
+        self.assertEqual(adapter.stats, {'connections_opened': 1, 'connections_reused': 2})
+
+    def test_keep_alive_can_be_disabled(self):
+        adapter = PooledHTTPAdapter(pool_size=2, keep_alive=False)
+        session = self.make_session(adapter)
+
+        for _ in range(3):
+            self.assertEqual(session.get(self.url).status_code, 200)
+
+        self.assertEqual(adapter.stats['connections_opened'], 3)
+
+    def test_default_timeouts(self):
+        adapter = PooledHTTPAdapter(
+            pool_size = 2,
+            connect_timeout = timedelta(seconds=1),
+            read_timeout = timedelta(seconds=2),
+        )
+        self.assertEqual(adapter.timeout, (1, 2))
+
+
+class TestClientTransport(StormpathTestCase):
+
+    def test_client_uses_pooled_transport(self):
+        with self.app.app_context():
+            manager = self.app.stormpath_manager
+            manager.application.name
+            manager.application.accounts.search({'email': 'nobody@example.com'}).size
+
+            stats = manager.http_stats
+            self.assertTrue(stats['connections_opened'] >= 1)
+            self.assertTrue(stats['connections_reused'] >= 1)
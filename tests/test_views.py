@@ -1,7 +1,8 @@
 """Run tests against our custom views."""
 
 
-from flask.ext.stormpath.models import User
+from flask_stormpath.decorators import groups_required
+from flask_stormpath.models import User
 
 from .helpers import StormpathTestCase
 
@@ -35,10 +36,12 @@ class TestRegister(StormpathTestCase):
     def test_disable_all_except_mandatory(self):
         # Here we'll disable all the fields except for the mandatory fields:
         # email and password.
-        self.app.config['STORMPATH_ENABLE_USERNAME'] = False
-        self.app.config['STORMPATH_ENABLE_GIVEN_NAME'] = False
-        self.app.config['STORMPATH_ENABLE_MIDDLE_NAME'] = False
-        self.app.config['STORMPATH_ENABLE_SURNAME'] = False
+        self.app.stormpath_manager.reload_settings(
+            STORMPATH_ENABLE_USERNAME = False,
+            STORMPATH_ENABLE_GIVEN_NAME = False,
+            STORMPATH_ENABLE_MIDDLE_NAME = False,
+            STORMPATH_ENABLE_SURNAME = False,
+        )
 
         with self.app.test_client() as c:
 
@@ -59,8 +62,10 @@ class TestRegister(StormpathTestCase):
         # Here we'll change our backend behavior such that users *can* enter a
         # first and last name, but they aren't required server side.
         # email and password.
-        self.app.config['STORMPATH_REQUIRE_GIVEN_NAME'] = False
-        self.app.config['STORMPATH_REQUIRE_SURNAME'] = False
+        self.app.stormpath_manager.reload_settings(
+            STORMPATH_REQUIRE_GIVEN_NAME = False,
+            STORMPATH_REQUIRE_SURNAME = False,
+        )
 
         with self.app.test_client() as c:
 
@@ -119,7 +124,7 @@ class TestRegister(StormpathTestCase):
     def test_redirect_to_login_and_register_url(self):
         # Setting redirect URL to something that is easy to check
         stormpath_redirect_url = '/redirect_for_login_and_registration'
-        self.app.config['STORMPATH_REDIRECT_URL'] = stormpath_redirect_url
+        self.app.stormpath_manager.reload_settings(STORMPATH_REDIRECT_URL = stormpath_redirect_url)
 
         with self.app.test_client() as c:
             # Ensure that valid registration will redirect to
@@ -143,9 +148,10 @@ class TestRegister(StormpathTestCase):
         # Setting redirect URLs to something that is easy to check
         stormpath_redirect_url = '/redirect_for_login'
         stormpath_registration_redirect_url = '/redirect_for_registration'
-        self.app.config['STORMPATH_REDIRECT_URL'] = stormpath_redirect_url
-        self.app.config['STORMPATH_REGISTRATION_REDIRECT_URL'] = \
-            stormpath_registration_redirect_url
+        self.app.stormpath_manager.reload_settings(
+            STORMPATH_REDIRECT_URL = stormpath_redirect_url,
+            STORMPATH_REGISTRATION_REDIRECT_URL = stormpath_registration_redirect_url,
+        )
 
         with self.app.test_client() as c:
             # Ensure that valid registration will redirect to
@@ -244,7 +250,7 @@ class TestLogin(StormpathTestCase):
 
         # Setting redirect URL to something that is easy to check
         stormpath_redirect_url = '/redirect_for_login_and_registration'
-        self.app.config['STORMPATH_REDIRECT_URL'] = stormpath_redirect_url
+        self.app.stormpath_manager.reload_settings(STORMPATH_REDIRECT_URL = stormpath_redirect_url)
 
         with self.app.test_client() as c:
             # Attempt a login using username and password.
@@ -270,9 +276,10 @@ class TestLogin(StormpathTestCase):
         # Setting redirect URLs to something that is easy to check
         stormpath_redirect_url = '/redirect_for_login'
         stormpath_registration_redirect_url = '/redirect_for_registration'
-        self.app.config['STORMPATH_REDIRECT_URL'] = stormpath_redirect_url
-        self.app.config['STORMPATH_REGISTRATION_REDIRECT_URL'] = \
-            stormpath_registration_redirect_url
+        self.app.stormpath_manager.reload_settings(
+            STORMPATH_REDIRECT_URL = stormpath_redirect_url,
+            STORMPATH_REGISTRATION_REDIRECT_URL = stormpath_registration_redirect_url,
+        )
 
         with self.app.test_client() as c:
             # Attempt a login using username and password.
@@ -315,3 +322,53 @@ class TestLogout(StormpathTestCase):
             # Log this user out.
             resp = c.get('/logout')
             self.assertEqual(resp.status_code, 302)
+
+
+class TestLoginSeedsCache(StormpathTestCase):
+    """Ensure users are cached as they log in."""
+
+    def test_login_seeds_user_cache(self):
+        self.app.config['STORMPATH_USER_CACHE_ENABLED'] = True
+        self.app.config['STORMPATH_GROUP_CACHE_ENABLED'] = True
+        self.app.stormpath_manager.reload_settings(STORMPATH_REDIRECT_URL = '/admin')
+        self.app.stormpath_manager.init_cache(self.app)
+
+        @self.app.route('/admin')
+        @groups_required(['admins'])
+        def admin():
+            return 'hello, admin'
+
+        with self.app.app_context():
+            user = User.create(
+                given_name = 'Randall',
+                surname = 'Degges',
+                email = 'r@rdegges.com',
+                password = 'woot1LoveCookies!',
+            )
+            admins = self.application.groups.create({'name': 'admins'})
+            user.add_group(admins)
+
+        manager = self.app.stormpath_manager
+
+        # The group name was already resolved by earlier requests.
+        manager.group_hrefs_by_name['admins'] = frozenset([admins.href])
+
+        with self.app.app_context():
+            with self.app.test_client() as c:
+                resp = c.post('/login', data={
+                    'login': 'r@rdegges.com',
+                    'password': 'woot1LoveCookies!',
+                })
+                self.assertEqual(resp.status_code, 302)
+                self.assertTrue(resp.location.endswith('/admin'))
+
+                # The page we're redirected to (which checks our group
+                # memberships) is served without any Stormpath API calls.
+                before = sum(manager.http_stats.values())
+                resp = c.get('/admin')
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(sum(manager.http_stats.values()), before)
+
+        self.assertTrue(user.href in manager.user_cache)
+        self.assertEqual(manager.user_cache.misses, 0)
+        self.assertEqual(manager.group_cache.get(user.href), frozenset([admins.href]))